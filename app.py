@@ -4,83 +4,651 @@ Real-Time Network Monitoring Tool with Live Dashboard Updates
 Updates browser within 25 seconds of any CSV changes
 """
 
-import subprocess
 import time
-import platform
 import csv
+import io
 import os
+import shutil
+import signal
+import atexit
+import hashlib
+import socket
 import threading
 from datetime import datetime
-from flask import Flask, jsonify, request
+from html import escape
+from flask import Flask, Response, g, jsonify, request, send_file, url_for
+import console
+import metrics
+import serving
+from probe_engine import echo_series, get_default_backend
+import service_probe
+from service_probe import probe_series
+from scheduler import Scheduler
+from sharding import ShardedProbing
+from inventory import Inventory, Target
+from event_log import EVENT_HEADERS, TransitionLog, event_state_values, outages, read_runs
+from cadence import ADAPTIVE, AdaptiveCadence, CadencePolicy
+from log_writer import LogWriter
+from live_state import (LOG_HEADERS, DeviceStateTable, RecentRows, is_header, read_records_from,
+                        read_tail_records, result_state_values)
+from binary_store import BinaryStore
+from rolling_stats import RollingStatsTable, SummaryCache
+from log_index import LogIndex
+
+try:
+    from history import HistoryIndex
+except ImportError:  # NumPy not installed; /history is unavailable
+    HistoryIndex = None
+from event_stream import Broadcaster
+
+# Echo requests per check; more than one enables loss and jitter measurement
+ECHOES_PER_CHECK = int(os.environ.get("MONITOR_ECHOES", "1"))
+
+# Worker processes for sharded probing; 0 probes inside this process
+PROBE_PROCESSES = int(os.environ.get("MONITOR_PROBE_PROCESSES", "0"))
+
+# Web server: MONITOR_WEB_WORKERS processes serve from a shared-memory snapshot
+# of live state; 0 serves from this process. MONITOR_GZIP=off disables gzip
+HTTP_HOST = os.environ.get("MONITOR_HOST", "127.0.0.1")
+HTTP_PORT = int(os.environ.get("MONITOR_PORT", "5000"))
+WEB_WORKERS = int(os.environ.get("MONITOR_WEB_WORKERS", "0"))
+GZIP = os.environ.get("MONITOR_GZIP", "on").lower() not in ("0", "off", "false", "no")
+
+# Device inventory (JSON, YAML or CSV); watched and applied live when present
+INVENTORY_FILE = os.environ.get("MONITOR_INVENTORY") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'inventory.json')
+
+# Probe log shared by the monitor and the dashboard (MONITOR_LOG_FILE overrides)
+LOG_FILE = os.environ.get("MONITOR_LOG_FILE") or os.path.join(
+    os.path.dirname(os.path.abspath(__file__)), 'network_log.csv')
+
+# Storage backend for LOG_FILE results: "csv" or "binary" (segmented store)
+STORAGE = os.environ.get("MONITOR_STORAGE", "csv")
+STORE_DIR = os.environ.get("MONITOR_STORE_DIR", os.path.splitext(LOG_FILE)[0] + ".d")
+
+# "full" logs every probe to LOG_FILE; "transitions" only writes EVENT_LOG,
+# which gets status changes and heartbeat checkpoints in either mode
+LOG_MODE = os.environ.get("MONITOR_LOG_MODE", "full")
+EVENT_LOG = os.environ.get("MONITOR_EVENT_LOG") or os.path.splitext(LOG_FILE)[0] + "_events.csv"
+# Log behind the dashboard, /rows, /stream, /history and /log: in
+# transitions mode its event rows stand in for results
+RESULTS_LOG = LOG_FILE if LOG_MODE == "full" else EVENT_LOG
+# The binary store only holds full-mode results
+USE_BINARY_STORE = STORAGE == "binary" and LOG_MODE == "full"
+DASHBOARD_ROWS = 20
 
 # Global variable to track CSV file changes
 csv_last_modified = 0
 
+# Most recent rows of RESULTS_LOG, fed by its log writer
+recent_rows = RecentRows(capacity=1000)
+
+# Latest state of every device, updated as results arrive
+device_states = DeviceStateTable()
+
+# Status changes and heartbeats per device, written to EVENT_LOG
+transition_log = TransitionLog(lambda row: append_event(row))
+
+# Rolling 1m/1h/24h/30d uptime and RTT per device
+rolling_stats = RollingStatsTable()
+SLA_TABLE_ROWS = 50
+
+# Columnar copy of the log for /history queries (needs NumPy)
+history_index = HistoryIndex() if HistoryIndex is not None else None
+HISTORY_MAX_DEVICES = 100
+
+# Per-device and time index over the main log for /log searches, covering
+# the last MONITOR_LOG_INDEX_DAYS (0 for the whole log) and, with the binary
+# store, only what its retention keeps
+LOG_INDEX_DAYS = float(os.environ.get("MONITOR_LOG_INDEX_DAYS", "7"))
+log_index = LogIndex(max_age_seconds=LOG_INDEX_DAYS * 86400 if LOG_INDEX_DAYS > 0 else None,
+                     first_position=(lambda: get_binary_store().first_cursor()) if USE_BINARY_STORE else None)
+LOG_PAGE_MAX = 1000
+
+# Shared fan-out of new rows and state transitions to /stream subscribers
+broadcaster = Broadcaster()
+
+# One group-commit writer per log file, created on first use
+log_writers = {}
+log_writers_lock = threading.Lock()
+
+binary_store = None
+binary_store_lock = threading.Lock()
+
+# Active check runner (a Scheduler, or ShardedProbing) and the inventory feeding it
+prober = None
+inventory = None
+
+# Live state published to web workers, or in a web worker, the view read from it
+snapshot_writer = None
+snapshot_view = None
+# What the last published changes covered: state version, row cursor, event version, inventory
+snapshot_marks = None
+UPTIME_SNAPSHOT_SECONDS = 5
+uptime_cache = SummaryCache(rolling_stats, UPTIME_SNAPSHOT_SECONDS)
+SNAPSHOT_EVENTS = 1000
+
+# Adaptive cadence for in-process checks (MONITOR_ADAPTIVE); sharded workers run their own
+cadence = AdaptiveCadence(
+    CadencePolicy.from_environment(),
+    lambda target, count, spacing: probe_series(target, count, spacing)
+) if ADAPTIVE and PROBE_PROCESSES == 0 else None
+
+# ============================================================================
+# INSTRUMENTATION (MONITOR_METRICS=off turns every metric into a no-op)
+# ============================================================================
+
+PROBE_DURATION = metrics.histogram(
+    "monitor_probe_duration_seconds", "Time to run one device check", ("result",))
+SCHEDULER_LATENESS = metrics.histogram(
+    "monitor_scheduler_lateness_seconds", "How late checks start relative to their deadline")
+LOG_FLUSH_DURATION = metrics.histogram(
+    "monitor_log_flush_seconds", "Time to write, flush and fsync one batch of log rows")
+DASHBOARD_RENDER = metrics.histogram(
+    "monitor_dashboard_render_seconds", "Time to render the dashboard when the cached page is stale")
+REQUEST_DURATION = metrics.histogram(
+    "monitor_http_request_duration_seconds", "Time to produce a response", ("route", "method", "status"))
+SERVICE_CONNECT = metrics.histogram(
+    "monitor_service_connect_seconds", "TCP connect time of service checks on new connections", ("check",))
+SERVICE_FIRST_BYTE = metrics.histogram(
+    "monitor_service_first_byte_seconds", "Time from the start of an HTTP check to the first response byte",
+    ("check",))
+REQUEST_CSV_BYTES = metrics.histogram(
+    "monitor_http_request_csv_read_bytes", "CSV bytes read while handling one request", ("route",),
+    buckets=metrics.BYTE_BUCKETS)
+
+def writer_values(attribute):
+    with log_writers_lock:
+        writers = list(log_writers.items())
+    return {(os.path.basename(filename),): getattr(writer, attribute) for filename, writer in writers}
+
+metrics.gauge_callback("monitor_log_queue_depth", "Rows waiting for the log writer",
+                       lambda: {labels: depth() for labels, depth in writer_values("queue_depth").items()}, ("log",))
+metrics.counter_callback("monitor_log_rows_written_total", "Rows written by the log writer",
+                         lambda: writer_values("rows_written"), ("log",))
+metrics.counter_callback("monitor_log_backpressure_total", "Appends that found the write queue full",
+                         lambda: writer_values("backpressure_events"), ("log",))
+metrics.counter_callback("monitor_log_rows_dropped_total", "Rows dropped because the write queue was full",
+                         lambda: writer_values("rows_dropped"), ("log",))
+metrics.counter_callback("monitor_log_write_errors_total", "Failed log writes, flushes and fsyncs",
+                         lambda: writer_values("write_errors"), ("log",))
+metrics.gauge_callback("monitor_sse_subscribers", "Connected /stream clients",
+                       lambda: broadcaster.subscriber_count())
+metrics.counter_callback("monitor_sse_subscribers_dropped_total", "/stream clients dropped for falling behind",
+                         lambda: broadcaster.subscribers_dropped)
+metrics.counter_callback("monitor_console_messages_total", "Console messages by outcome",
+                         lambda: {(outcome,): count for outcome, count in console.CONSOLE.stats().items()
+                                  if outcome in ("written", "suppressed", "rate_limited", "queue_full")},
+                         ("outcome",))
+metrics.counter_callback("monitor_service_connections_total", "Service check connections, new or reused",
+                         lambda: {(outcome,): (service_probe.engine_stats() or {}).get(f"connections_{outcome}", 0)
+                                  for outcome in ("opened", "reused")}, ("outcome",))
+metrics.gauge_callback("monitor_devices", "Devices by current status",
+                       lambda: {(status,): count for status, count in device_states.summary().items()
+                                if status != "devices"}, ("status",))
+
+if cadence is not None:
+    metrics.gauge_callback("monitor_cadence_flapping_devices", "Devices currently marked flapping",
+                           lambda: cadence.stats()["flapping"])
+    metrics.gauge_callback("monitor_cadence_mean_interval_seconds", "Mean adaptive check interval",
+                           lambda: cadence.stats()["mean_interval"] or 0.0)
+    metrics.counter_callback("monitor_cadence_bursts_total", "Confirmation bursts after a disagreeing check",
+                             lambda: cadence.bursts)
+    metrics.counter_callback("monitor_cadence_unconfirmed_total", "Confirmation bursts that kept the previous state",
+                             lambda: cadence.unconfirmed)
+
+if USE_BINARY_STORE:
+    metrics.counter_callback("monitor_store_out_of_order_rows_total",
+                             "Rows the binary store rejected for a timestamp before their segment",
+                             lambda: get_binary_store().out_of_order)
+
+# Served by each web worker itself; everything else comes from the probe process
+WEB_METRICS = ("monitor_http_request_duration_seconds", "monitor_http_request_csv_read_bytes",
+               "monitor_dashboard_render_seconds", "monitor_sse_subscribers",
+               "monitor_sse_subscribers_dropped_total")
+
+def observe_lateness(key, lateness):
+    SCHEDULER_LATENESS.observe(lateness)
+
+def observe_flush(seconds, rows):
+    LOG_FLUSH_DURATION.observe(seconds)
+
+def instrument_scheduler(scheduler):
+    """
+    Export a scheduler's lateness and job counts on /metrics
+    """
+    if not metrics.ENABLED:
+        return
+    scheduler.add_listener(observe_lateness)
+    metrics.gauge_callback("monitor_scheduler_jobs", "Scheduled device checks",
+                           lambda: len(scheduler.jobs()))
+    metrics.counter_callback("monitor_scheduler_checks_skipped_total",
+                             "Checks skipped because the previous run was still going",
+                             lambda: scheduler.checks_skipped)
+
+def instrument_shards(probes):
+    """
+    Export sharded probing health; lateness is reported by each worker
+    """
+    if not metrics.ENABLED:
+        return
+    metrics.gauge_callback("monitor_probe_workers_alive", "Probe worker processes running",
+                           lambda: sum(1 for shard in probes.stats()["shards"] if shard["alive"]))
+    metrics.counter_callback("monitor_probe_worker_restarts_total", "Probe worker processes restarted",
+                             lambda: probes.stats()["restarts"])
+    metrics.counter_callback("monitor_probe_results_received_total", "Results collected from probe workers",
+                             lambda: probes.results_received)
+    metrics.counter_callback("monitor_probe_results_discarded_total", "Results for devices removed while in flight",
+                             lambda: probes.results_discarded)
+    metrics.gauge_callback("monitor_scheduler_max_lateness_seconds", "Worst check lateness reported by each worker",
+                           lambda: {(str(shard["index"]),): shard["scheduler"].get("max_lateness", 0.0)
+                                    for shard in probes.stats()["shards"]}, ("worker",))
+
 # ============================================================================
 # MONITORING FUNCTIONS
 # ============================================================================
 
+def probe_device(ip_address):
+    """
+    Ping a device and return the round-trip time in seconds, or None if it
+    doesn't respond. Uses the shared ICMP probe engine, or the subprocess
+    backend as fallback
+    """
+    return get_default_backend().ping(ip_address)
+
 def ping_device(ip_address):
     """
     Ping a device and return True if it responds, False if it doesn't
     """
-    param = "-n" if platform.system().lower() == "windows" else "-c"
-    command = ["ping", param, "1", ip_address]
-    
-    result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
-    return result.returncode == 0
+    return probe_device(ip_address) is not None
 
-def initialize_log(filename):
+def measure_device(ip_address, echoes=None, check=None):
     """
-    Initialize CSV log file with headers if it doesn't exist
+    Send ECHOES_PER_CHECK echo requests (MONITOR_ECHOES) and return a
+    ProbeResult with RTT samples, loss and jitter. With a service check
+    (a CheckSpec), run it once instead and return its ServiceResult
     """
-    if not os.path.exists(filename):
+    if check is not None:
+        return service_probe.check_series(check)
+    return echo_series(ip_address, echoes or ECHOES_PER_CHECK)
+
+def initialize_log(filename, headers=LOG_HEADERS):
+    """
+    Initialize CSV log file with headers if it doesn't exist, and upgrade
+    the header of a log written by an older version with fewer columns
+    """
+    if not os.path.exists(filename) or os.path.getsize(filename) == 0:
         with open(filename, mode='w', newline='') as file:
             writer = csv.writer(file)
-            writer.writerow(["Timestamp", "Device Name", "IP Address", "Status"])
+            writer.writerow(headers)
+        return
+
+    with open(filename, newline='', encoding='utf-8', errors='replace') as file:
+        current = next(csv.reader(file), [])
+    if not is_header(current) or current == list(headers):
+        return
+    if len(current) < len(headers) and current == list(headers[:len(current)]):
+        upgrade_log_header(filename, headers)
+    else:
+        console.warning(f"⚠️  {filename} has an unexpected header ({len(current)} columns); leaving it as is",
+                        "log_header", log=filename)
+
+def upgrade_log_header(filename, headers):
+    """
+    Rewrite the log with a new header line; rows are copied unchanged
+    (older rows simply lack the new columns). Runs before any writer
+    opens the file, since every byte offset after the header moves.
+    """
+    temporary = filename + ".tmp"
+    header = io.StringIO()
+    csv.writer(header).writerow(headers)
+    with open(filename, 'rb') as source, open(temporary, 'wb') as target:
+        source.readline()
+        target.write(header.getvalue().encode('utf-8'))
+        shutil.copyfileobj(source, target, 1024 * 1024)
+    os.replace(temporary, filename)
+    console.emit("startup", f"🔧 Upgraded the header of {filename} to {len(headers)} columns")
+
+def get_binary_store():
+    """
+    Return the segmented binary store used when MONITOR_STORAGE=binary
+    """
+    global binary_store
+    with binary_store_lock:
+        if binary_store is None:
+            binary_store = BinaryStore(STORE_DIR)
+        return binary_store
+
+def event_result_row(row):
+    """
+    Main-log columns for an event row: its status and the mean RTT since
+    the device's previous event row
+    """
+    return row[:4] + [row[8] if len(row) > 8 else "", "", ""]
+
+def tail_records(count):
+    """
+    Last `count` results of the main log as (cursor, row) pairs
+    """
+    if LOG_MODE != "full":
+        return [(cursor, event_result_row(row)) for cursor, row in event_tail_records(count)]
+    if STORAGE == "binary":
+        return get_binary_store().tail_records(count)
+    return read_tail_records(LOG_FILE, count)
+
+def event_tail_records(count):
+    """
+    Last `count` rows of the event log as (cursor, row) pairs
+    """
+    return read_tail_records(EVENT_LOG, count)
+
+def state_tail_records(count):
+    """
+    Rows that restore live device state: the full log, or in transitions
+    mode the event log, whose first four columns match it
+    """
+    return tail_records(count) if LOG_MODE == "full" else event_tail_records(count)
+
+def load_device_states():
+    """
+    Restore the live state table once, mapping event rows in transitions mode
+    """
+    device_states.load(state_tail_records,
+                       values=result_state_values if LOG_MODE == "full" else event_state_values)
+
+def records_from(cursor, limit):
+    """
+    Up to `limit` results of the main log after `cursor`
+    """
+    if LOG_MODE != "full":
+        return [(cursor, event_result_row(row)) for cursor, row in read_records_from(EVENT_LOG, cursor, limit)]
+    if STORAGE == "binary":
+        return get_binary_store().records_from(cursor, limit)
+    return read_records_from(LOG_FILE, cursor, limit)
+
+def records_between(cursor, stop):
+    """
+    Results of the main log after `cursor` and before `stop`
+    """
+    records = []
+    while True:
+        batch = records_from(cursor, 10000)
+        records += [record for record in batch if record[0] < stop]
+        if len(batch) < 10000 or batch[-1][0] >= stop:
+            return records
+        cursor = batch[-1][0]
+
+def log_exists():
+    if snapshot_view is not None:
+        return snapshot_view.get("log_exists", False)
+    if USE_BINARY_STORE:
+        return get_binary_store().total_records() > 0
+    return os.path.exists(RESULTS_LOG)
+
+def log_modified():
+    """
+    Time the main log last changed
+    """
+    if snapshot_view is not None:
+        return snapshot_view.get("log_modified", time.time())
+    if USE_BINARY_STORE:
+        return get_binary_store().last_modified
+    return os.path.getmtime(RESULTS_LOG) if os.path.exists(RESULTS_LOG) else time.time()
+
+def log_cursor():
+    """
+    Cursor just past the last result currently in the main log; in a web
+    worker, the cursor its first snapshot was taken at
+    """
+    if snapshot_view is not None:
+        return snapshot_view.initial_cursor
+    if USE_BINARY_STORE:
+        return get_binary_store().total_records()
+    return os.path.getsize(RESULTS_LOG) if os.path.exists(RESULTS_LOG) else 0
+
+def start_history(end_cursor=None):
+    """
+    Load the main log into the history index in the background, up to
+    end_cursor; later rows arrive through the log writer listener
+    """
+    if history_index is None:
+        return
+    if LOG_MODE != "full":
+        # Event logs stay small; their rows are mapped before indexing
+        history_index.start_loading(
+            lambda index: index.append_rows([row for _, row in records_between(0, end_cursor)]))
+    elif STORAGE == "binary":
+        history_index.start_loading(lambda index: index.load_binary(get_binary_store(), end_cursor))
+    elif os.path.exists(LOG_FILE):
+        history_index.start_loading(lambda index: index.load_csv(LOG_FILE, end_cursor))
+    else:
+        history_index.start_loading(lambda index: None)
+
+def start_log_index(end_cursor):
+    """
+    Index the main log in the background up to end_cursor; later rows
+    arrive through the log writer listener
+    """
+    log_index.start_loading(records_from, end_cursor)
+
+def get_log_writer(filename):
+    """
+    Return the single writer thread that owns appends to this log file
+    Durability is chosen with MONITOR_FSYNC (never / batch / interval)
+    """
+    with log_writers_lock:
+        writer = log_writers.get(filename)
+        if writer is None:
+            is_results_log = filename == RESULTS_LOG
+            if is_results_log:
+                start_history(log_cursor())
+                start_log_index(log_cursor())
+            writer = LogWriter(
+                filename,
+                fsync_policy=os.environ.get("MONITOR_FSYNC", "never"),
+                fsync_interval_ms=int(os.environ.get("MONITOR_FSYNC_INTERVAL_MS", "1000")),
+                sink=get_binary_store() if filename == LOG_FILE and USE_BINARY_STORE else None
+            )
+            log_writers[filename] = writer
+            if metrics.ENABLED:
+                writer.add_flush_listener(observe_flush)
+            if is_results_log:
+                # Load the tail before the first batch so no rows are missed
+                recent_rows.load(tail_records)
+                writer.add_listener(results_listener(recent_rows.extend))
+                writer.add_listener(results_listener(publish_rows))
+                writer.add_listener(bump_generation)
+                if history_index is not None:
+                    writer.add_listener(results_listener(history_index.append_rows))
+                writer.add_listener(results_listener(log_index.append_rows))
+        return writer
+
+def results_listener(listener):
+    """
+    Wrap a listener of the results log; in transitions mode it gets event
+    rows mapped to main-log columns
+    """
+    if LOG_MODE == "full":
+        return listener
+    return lambda rows, cursors: listener([event_result_row(row) for row in rows], cursors)
+
+def publish_rows(rows, offsets):
+    """
+    Push a freshly written batch of rows to live dashboards, with the cursor
+    a client can pass to /rows to resume after a disconnect
+    """
+    broadcaster.publish("rows", {"rows": rows, "cursor": offsets[-1]})
+
+def close_log_writers():
+    """
+    Flush and close every log writer
+    """
+    with log_writers_lock:
+        for writer in log_writers.values():
+            writer.close()
+
+atexit.register(close_log_writers)
 
-def log_status(filename, timestamp, device_name, ip_address, status):
+def append_event(row):
+    """
+    Queue one transition log row for the event log writer
     """
-    Log ping result to CSV file with device name
+    if not get_log_writer(EVENT_LOG).append(row, timeout=5):
+        console.warning(f"⚠️  Log queue full, dropped event for {row[1]}", "log_queue_full", device=row[1])
+
+def format_measurement(value, scale=1.0, digits=3):
+    return "" if value is None else f"{value * scale:.{digits}f}"
+
+def log_status(filename, timestamp, device_name, ip_address, status, rtt=None, loss_percent=None, jitter=None):
+    """
+    Queue ping result for the CSV log writer (rtt and jitter in seconds)
     """
     global csv_last_modified
     
-    with open(filename, mode='a', newline='') as file:
-        writer = csv.writer(file)
-        writer.writerow([timestamp, device_name, ip_address, status])
+    writer = get_log_writer(filename)
+    row = [timestamp, device_name, ip_address, status,
+           format_measurement(rtt, 1000), format_measurement(loss_percent, digits=1),
+           format_measurement(jitter, 1000)]
+    if not writer.append(row, timeout=5):
+        console.warning(f"⚠️  Log queue full, dropped result for {device_name}", "log_queue_full",
+                        device=device_name)
     
     # Update the modification time tracker
     csv_last_modified = time.time()
 
-def monitor_device_background(device_name, ip_address, check_interval=30, log_file="network_log.csv"):
+def monitor_device_background(device_name, ip_address, log_file=LOG_FILE, check=None):
     """
-    Background monitoring function for a single device
+    Run a single check for one device; called by the scheduler every interval
     """
-    print(f"🔍 Starting monitoring of {device_name} ({ip_address}) every {check_interval} seconds...")
+    started = time.perf_counter()
+    result = measure_device(ip_address, check=check)
+    is_up, flapping, interval = result.is_up, None, None
+    if cadence is not None:
+        # A disagreeing result is confirmed by a burst before the state changes
+        decision = cadence.observe(device_name, check or ip_address, result)
+        result, is_up = decision.result, decision.is_up
+        flapping, interval = decision.flapping, decision.interval
+    PROBE_DURATION.observe(time.perf_counter() - started, ("up" if is_up else "down",))
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    record_result(device_name, ip_address, timestamp, is_up, result.rtt,
+                  result.loss_percent if result.sent > 1 else None, result.jitter,
+                  result.samples, log_file, flapping, interval, result.detail() if check is not None else None)
 
-    try:
-        while True:
-            is_up = ping_device(ip_address)
-            timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-            status = "UP" if is_up else "DOWN"
-            
-            # Log to console
-            status_emoji = "✅" if is_up else "❌"
-            print(f"[{timestamp}] {status_emoji} {device_name} ({ip_address}) is {status}")
-            
-            # Log to CSV
-            log_status(log_file, timestamp, device_name, ip_address, status)
-            
-            time.sleep(check_interval)
-            
-    except Exception as e:
-        print(f"⚠️  Monitoring error for {device_name}: {e}")
+def record_shard_result(device_name, ip_address, epoch, is_up, rtt, loss_percent, jitter,
+                        flapping=None, interval=None, detail=None):
+    """
+    Collector callback for results streamed from probe worker processes
+    """
+    timestamp = datetime.fromtimestamp(epoch).strftime('%Y-%m-%d %H:%M:%S')
+    record_result(device_name, ip_address, timestamp, is_up, rtt, loss_percent, jitter,
+                  flapping=flapping, interval=interval, detail=detail)
+
+def observe_service_detail(detail):
+    label = detail["check"].split(":", 1)[0]
+    if detail["connect_ms"] is not None:
+        SERVICE_CONNECT.observe(detail["connect_ms"] / 1000, (label,))
+    if detail["first_byte_ms"] is not None:
+        SERVICE_FIRST_BYTE.observe(detail["first_byte_ms"] / 1000, (label,))
+
+def record_result(device_name, ip_address, timestamp, is_up, rtt, loss_percent=None, jitter=None,
+                  samples=None, log_file=LOG_FILE, flapping=None, interval=None, detail=None):
+    """
+    Apply one check result to the live state, rolling stats and the log;
+    detail is the timing breakdown of a service check
+    """
+    status = "UP" if is_up else "DOWN"
+    previous = None
+    
+    # Update live state table
+    if log_file == LOG_FILE:
+        current = device_states.get(device_name) if flapping is not None else None
+        was_flapping = bool(current and current["flapping"])
+        previous = device_states.record(device_name, ip_address, timestamp, status, rtt, loss_percent, jitter,
+                                        flapping, interval, detail)
+        if previous is not None:
+            broadcaster.publish("transition", {
+                "device": device_name, "ip": ip_address, "timestamp": timestamp,
+                "previous": previous, "status": status, "flapping": bool(flapping)
+            })
+        if flapping is not None and flapping != was_flapping:
+            console.emit("flapping", f"{'🔀' if flapping else '🔁'} {device_name} ({ip_address}) "
+                                     f"{'is flapping' if flapping else 'stopped flapping'}",
+                         device=device_name, ip=ip_address, flapping=flapping)
+            broadcaster.publish("flapping", {
+                "device": device_name, "ip": ip_address, "timestamp": timestamp, "flapping": flapping
+            })
+        rolling_stats.record(device_name, is_up, rtt, samples=samples)
+        transition_log.record(device_name, ip_address, timestamp, status, rtt)
+        if detail is not None:
+            observe_service_detail(detail)
+    
+    # Log to console; only state changes get past MONITOR_CONSOLE_VERBOSITY=changes
+    # and the rate limit never drops them
+    status_emoji = "✅" if is_up else "❌"
+    line = f"[{timestamp}] {status_emoji} {device_name} ({ip_address}) is {status}"
+    fields = {"timestamp": timestamp, "device": device_name, "ip": ip_address, "status": status,
+              "rtt_ms": round(rtt * 1000, 3) if rtt is not None else None}
+    if detail is not None:
+        fields.update(detail)
+        if detail["error"]:
+            line += f": {detail['error']}"
+    if previous is not None:
+        console.emit("transition", f"{line} (was {previous})", previous=previous, **fields)
+    else:
+        console.emit("result", line, limited=True, **fields)
+    
+    # Log to CSV; in transitions mode the event log above is the only record
+    if LOG_MODE == "full" or log_file != LOG_FILE:
+        log_status(log_file, timestamp, device_name, ip_address, status, rtt, loss_percent, jitter)
 
 # ============================================================================
 # FLASK WEB DASHBOARD WITH REAL-TIME UPDATES
 # ============================================================================
 
 app = Flask(__name__)
+# Static assets are versioned by content hash, so cache them for a year
+app.config['SEND_FILE_MAX_AGE_DEFAULT'] = 365 * 86400
+
+# Rendered dashboard as (key, body, etag); reused until new results arrive
+dashboard_cache = None
+data_generation = 0
+data_changed_at = time.time()
+static_versions = {}
+
+if metrics.ENABLED:
+    @app.before_request
+    def start_request_timer():
+        g.request_started = time.perf_counter()
+        metrics.take_bytes_read()
+
+    @app.after_request
+    def record_request_metrics(response):
+        started = g.get('request_started')
+        if started is not None:
+            route = request.url_rule.rule if request.url_rule is not None else "unmatched"
+            REQUEST_DURATION.observe(time.perf_counter() - started,
+                                     (route, request.method, str(response.status_code)))
+            REQUEST_CSV_BYTES.observe(metrics.take_bytes_read(), (route,))
+        return response
+
+if GZIP:
+    @app.after_request
+    def compress_response(response):
+        return serving.compress(response, request.headers.get('Accept-Encoding', ''))
+
+@app.route('/metrics')
+def api_metrics():
+    """
+    The monitor's own counters and histograms in Prometheus text format
+    In a web worker, probe metrics come from the latest snapshot and HTTP
+    metrics are this worker's own
+    """
+    if not metrics.ENABLED:
+        return jsonify({"error": "Metrics are disabled (MONITOR_METRICS=off)"}), 404
+    if snapshot_view is not None:
+        return Response(snapshot_view.get("metrics", "") + metrics.render(include=WEB_METRICS),
+                        content_type=metrics.CONTENT_TYPE)
+    return Response(metrics.render(), content_type=metrics.CONTENT_TYPE)
 
 @app.route('/check_updates')
 def check_updates():
@@ -88,10 +656,8 @@ def check_updates():
     API endpoint to check if CSV has been updated since last check
     Returns JSON indicating if browser should refresh
     """
-    csv_path = os.path.join(os.path.dirname(__file__), 'network_log.csv')
-    
-    if os.path.exists(csv_path):
-        current_modified = os.path.getmtime(csv_path)
+    if log_exists():
+        current_modified = log_modified()
         
         # Check if file was modified since last request
         last_check = float(request.args.get('last_check', 0))
@@ -109,20 +675,81 @@ def check_updates():
         "message": "No updates"
     })
 
+@app.route('/stream')
+def stream():
+    """
+    Server-Sent Events stream of new log rows and device state transitions
+    """
+    subscriber = broadcaster.subscribe()
+    return Response(
+        broadcaster.stream(subscriber),
+        mimetype='text/event-stream',
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+def static_url(filename):
+    """
+    URL of a static asset, versioned by content hash so it can be cached
+    for a year and still change on upgrade
+    """
+    version = static_versions.get(filename)
+    if version is None:
+        with open(os.path.join(app.static_folder, filename), 'rb') as file:
+            version = hashlib.md5(file.read()).hexdigest()[:10]
+        static_versions[filename] = version
+    return url_for('static', filename=filename, v=version)
+
+def bump_generation(rows, cursors):
+    """
+    Log writer listener: new results invalidate the cached dashboard
+    """
+    global data_generation, data_changed_at
+    data_generation += 1
+    data_changed_at = time.time()
+
+def data_version():
+    """
+    (generation, changed_at) of the data behind the dashboard; a web worker
+    takes them from the probe process's snapshot
+    """
+    if snapshot_view is not None:
+        return snapshot_view.get("generation", 0), snapshot_view.get("changed_at", 0.0)
+    return data_generation, data_changed_at
+
 @app.route('/')
 def dashboard():
     """
-    Main dashboard page with real-time update capability
+    Main dashboard page, rendered once per data generation and revalidated
+    by browsers with ETag / Last-Modified
     """
-    data = []
+    global dashboard_cache
+    generation, changed_at = data_version()
+    key = (generation, log_modified())
+    cached = dashboard_cache
+    if cached is None or cached[0] != key:
+        started = time.perf_counter()
+        body = render_dashboard()
+        DASHBOARD_RENDER.observe(time.perf_counter() - started)
+        cached = (key, body, hashlib.md5(body.encode('utf-8')).hexdigest())
+        dashboard_cache = cached
 
-    # Check if file exists
-    csv_path = os.path.join(os.path.dirname(__file__), 'network_log.csv')
-    if os.path.exists(csv_path):
-        with open(csv_path, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            for row in reader:
-                data.append(row)
+    response = Response(cached[1], mimetype='text/html')
+    response.set_etag(cached[2])
+    response.last_modified = datetime.fromtimestamp(max(key[1], changed_at))
+    response.cache_control.no_cache = True
+    return response.make_conditional(request)
+
+def render_dashboard():
+    """
+    Build the dashboard HTML from the ring buffer and live state
+    """
+    # Check if any results have been logged
+    if log_exists():
+        # Served from the ring buffer; only cold start touches the log tail
+        recent_rows.load(tail_records)
+        records = recent_rows.latest_records(DASHBOARD_ROWS)
+        data_rows = [row for _, row in records]
+        rows_cursor = records[-1][0] if records else 0
     else:
         return """
         <html>
@@ -138,13 +765,9 @@ def dashboard():
         </html>
         """
 
-    # Show only last 20 entries, newest first
-    recent_data = data[-20:] if len(data) > 20 else data
-    if len(recent_data) > 1:  # Keep headers at top
-        headers = recent_data[0]  # Save headers
-        data_rows = recent_data[1:]  # Get data rows
-        data_rows.reverse()  # Reverse the order (newest first)
-        recent_data = [headers] + data_rows  # Combine back together
+    # Show only last 20 entries, newest first, headers at top
+    data_rows.reverse()
+    recent_data = [LOG_HEADERS] + data_rows
 
     # Get current status from most recent entry (now it's the first data row!)
     current_status = "Starting..."
@@ -169,177 +792,38 @@ def dashboard():
     # Determine status color
     status_color = "green" if current_status.upper() == "UP" else "red" if current_status.upper() == "DOWN" else "orange"
 
+    # Per-device rolling uptime, worst 24h uptime first
+    rolling_stats.load(tail_records)
+    sla_rows = ""
+    for device in rolling_stats.worst(SLA_TABLE_ROWS):
+        summary = rolling_stats.summary(device)
+        cells = "".join(
+            f"<td style='text-align: center;'>{summary[window]['uptime_percent']}%</td>"
+            if summary[window]['uptime_percent'] is not None else "<td style='text-align: center;'>–</td>"
+            for window in ("1h", "24h", "30d")
+        )
+        latency_cells = "".join(
+            f"<td style='text-align: center;'>{value if value is not None else '–'}</td>"
+            for value in (summary["1h"][key] for key in ("mean_rtt_ms", "p50_rtt_ms", "p95_rtt_ms", "p99_rtt_ms"))
+        )
+        sla_rows += (
+            f"<tr><td style='font-weight: bold; color: #007bff;'>{escape(device)}</td>{cells}"
+            f"{latency_cells}</tr>"
+        )
+
     # Get current time and file modification time
     last_updated = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-    file_modified = os.path.getmtime(csv_path) if os.path.exists(csv_path) else time.time()
+    file_modified = log_modified()
 
-    # HTML with real-time JavaScript and enhanced styling
-    html = f"""
+    # HTML page; styling and real-time JavaScript are served from /static
+    parts = [f"""
     <html>
     <head>
         <title>Real-Time Network Monitor</title>
         <meta name="viewport" content="width=device-width, initial-scale=1">
-        <style>
-            body {{ 
-                font-family: 'Segoe UI', Tahoma, Geneva, Verdana, sans-serif; 
-                margin: 0;
-                padding: 20px;
-                background: linear-gradient(135deg, #667eea 0%, #764ba2 100%);
-                min-height: 100vh;
-            }}
-            .container {{
-                max-width: 1200px;
-                margin: 0 auto;
-                background: rgba(255, 255, 255, 0.95);
-                padding: 30px;
-                border-radius: 15px;
-                box-shadow: 0 8px 32px rgba(0,0,0,0.1);
-                backdrop-filter: blur(10px);
-            }}
-            h1 {{ 
-                color: #333; 
-                text-align: center;
-                margin-bottom: 30px;
-                font-size: 2.5em;
-                text-shadow: 2px 2px 4px rgba(0,0,0,0.1);
-            }}
-            .realtime-indicator {{
-                position: fixed;
-                top: 10px;
-                right: 10px;
-                background: #28a745;
-                color: white;
-                padding: 8px 15px;
-                border-radius: 20px;
-                font-size: 12px;
-                z-index: 1000;
-                animation: pulse 2s infinite;
-            }}
-            @keyframes pulse {{
-                0% {{ opacity: 1; }}
-                50% {{ opacity: 0.7; }}
-                100% {{ opacity: 1; }}
-            }}
-            .summary {{ 
-                margin: 20px 0; 
-                background: linear-gradient(135deg, #f8f9fa, #e9ecef);
-                padding: 25px;
-                border-radius: 12px;
-                border-left: 5px solid #007bff;
-                box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            }}
-            .current-status {{
-                font-size: 24px;
-                margin-bottom: 20px;
-                text-align: center;
-                padding: 15px;
-                background: rgba(255,255,255,0.8);
-                border-radius: 8px;
-            }}
-            .stats-row {{
-                display: grid;
-                grid-template-columns: repeat(auto-fit, minmax(150px, 1fr));
-                gap: 20px;
-                margin: 20px 0;
-            }}
-            .stat-item {{
-                text-align: center;
-                padding: 15px;
-                background: rgba(255,255,255,0.9);
-                border-radius: 8px;
-                box-shadow: 0 2px 8px rgba(0,0,0,0.1);
-            }}
-            .stat-value {{
-                font-size: 28px;
-                font-weight: bold;
-                margin-top: 8px;
-            }}
-            .controls {{
-                text-align: center;
-                margin: 20px 0;
-            }}
-            .refresh-btn {{
-                background: linear-gradient(135deg, #007bff, #0056b3);
-                color: white;
-                border: none;
-                padding: 12px 25px;
-                border-radius: 25px;
-                cursor: pointer;
-                font-size: 16px;
-                margin: 0 10px;
-                transition: all 0.3s ease;
-                box-shadow: 0 4px 15px rgba(0,123,255,0.3);
-            }}
-            .refresh-btn:hover {{
-                transform: translateY(-2px);
-                box-shadow: 0 6px 20px rgba(0,123,255,0.4);
-            }}
-            .auto-refresh-status {{
-                display: inline-block;
-                margin-left: 15px;
-                padding: 8px 15px;
-                background: #28a745;
-                color: white;
-                border-radius: 15px;
-                font-size: 14px;
-            }}
-            table {{ 
-                border-collapse: collapse; 
-                width: 100%; 
-                margin-top: 25px;
-                background: white;
-                border-radius: 8px;
-                overflow: hidden;
-                box-shadow: 0 4px 15px rgba(0,0,0,0.1);
-            }}
-            th, td {{ 
-                padding: 15px; 
-                text-align: left; 
-                border-bottom: 1px solid #eee;
-            }}
-            th {{ 
-                background: linear-gradient(135deg, #495057, #6c757d);
-                color: white;
-                font-weight: bold;
-                text-align: center;
-                font-size: 16px;
-            }}
-            .status-up {{ 
-                color: #28a745; 
-                font-weight: bold; 
-                font-size: 16px;
-            }}
-            .status-down {{ 
-                color: #dc3545; 
-                font-weight: bold; 
-                font-size: 16px;
-            }}
-            tr:nth-child(even) {{ 
-                background-color: #f8f9fa; 
-            }}
-            tr:hover {{
-                background-color: #e3f2fd;
-                transition: background-color 0.3s ease;
-            }}
-            .footer {{
-                text-align: center;
-                margin-top: 30px;
-                color: #666;
-                font-size: 14px;
-                padding: 20px;
-                background: rgba(248,249,250,0.8);
-                border-radius: 8px;
-            }}
-            .new-entry {{
-                animation: highlightNew 3s ease-in-out;
-            }}
-            @keyframes highlightNew {{
-                0% {{ background-color: #fff3cd; }}
-                100% {{ background-color: transparent; }}
-            }}
-        </style>
+        <link rel="stylesheet" href="{static_url('dashboard.css')}">
     </head>
-    <body>
+    <body data-max-rows="{DASHBOARD_ROWS}" data-last-modified="{file_modified}" data-cursor="{rows_cursor}">
         <div class="realtime-indicator" id="realtimeStatus">
             🔴 Real-Time Updates
         </div>
@@ -350,179 +834,631 @@ def dashboard():
             <div class="summary">
                 <div class="current-status">
                     <strong>Network Status:</strong> 
-                    <span style="color: {status_color}; font-weight: bold; font-size: 28px;">
-                        {current_status}
+                    <span id="currentStatus" style="color: {status_color}; font-weight: bold; font-size: 28px;">
+                        {escape(current_status)}
                     </span>
                 </div>
                 
                 <div class="stats-row">
                     <div class="stat-item">
                         <div><strong>Successful Pings</strong></div>
-                        <div class="stat-value" style="color: #28a745;">{up_count}</div>
+                        <div class="stat-value" id="upCount" style="color: #28a745;">{up_count}</div>
                     </div>
                     <div class="stat-item">
                         <div><strong>Failed Pings</strong></div>
-                        <div class="stat-value" style="color: #dc3545;">{down_count}</div>
+                        <div class="stat-value" id="downCount" style="color: #dc3545;">{down_count}</div>
                     </div>
                     <div class="stat-item">
                         <div><strong>Uptime</strong></div>
-                        <div class="stat-value" style="color: #007bff;">{uptime_percent}%</div>
+                        <div class="stat-value" id="uptimePercent" style="color: #007bff;">{uptime_percent}%</div>
                     </div>
                     <div class="stat-item">
                         <div><strong>Total Checks</strong></div>
-                        <div class="stat-value">{total}</div>
+                        <div class="stat-value" id="totalChecks">{total}</div>
                     </div>
                 </div>
                 
                 <div style="text-align: center; margin-top: 15px; font-size: 14px; color: #666;">
-                    <strong>Dashboard Updated:</strong> {last_updated}
+                    <strong>Dashboard Updated:</strong> <span id="dashboardUpdated">{last_updated}</span>
                 </div>
             </div>
             
             <div class="controls">
                 <button class="refresh-btn" onclick="location.reload()">🔄 Manual Refresh</button>
+                <a class="refresh-btn" href="{url_for('search_log_page')}">🔎 Search Log</a>
                 <span class="auto-refresh-status" id="autoStatus">🟢 Live Updates Active</span>
             </div>
             
-            <table>
-    """
+            <table id="logTable">
+    """]
 
     # Build table rows
     for i, row in enumerate(recent_data):
         if i == 0:  # Header row
-            html += "<tr>" + "".join([f"<th>{cell}</th>" for cell in row]) + "</tr>"
+            parts.append("<tr>" + "".join([f"<th>{escape(cell)}</th>" for cell in row]) + "</tr>")
         else:
             # Add class for potential new entry animation
             row_class = "new-entry" if i == 1 else ""  # First data row is newest
-            html += f"<tr class='{row_class}'>"
+            parts.append(f"<tr class='{row_class}'>")
             for j, cell in enumerate(row):
                 if j == 3 and cell.upper() == "UP":  # Status is column 3
-                    html += f"<td class='status-up' style='text-align: center;'>✅ {cell}</td>"
+                    parts.append(f"<td class='status-up' style='text-align: center;'>✅ {escape(cell)}</td>")
                 elif j == 3 and cell.upper() == "DOWN":  # Status is column 3
-                    html += f"<td class='status-down' style='text-align: center;'>❌ {cell}</td>"
+                    parts.append(f"<td class='status-down' style='text-align: center;'>❌ {escape(cell)}</td>")
                 elif j == 1:  # Device Name column - make it bold
-                    html += f"<td style='font-weight: bold; color: #007bff;'>{cell}</td>"
+                    parts.append(f"<td style='font-weight: bold; color: #007bff;'>{escape(cell)}</td>")
                 else:
-                    html += f"<td>{cell}</td>"
-            html += "</tr>"
+                    parts.append(f"<td>{escape(cell)}</td>")
+            parts.append("</tr>")
 
-    html += f"""
+    parts.append(f"""
+            </table>
+
+            <h2 style="margin-top: 40px; color: #333; text-align: center;">📈 Per-Device Uptime</h2>
+            <table id="slaTable">
+                <tr><th>Device</th><th>1 h</th><th>24 h</th><th>30 d</th><th>Mean RTT (ms, 1 h)</th><th>p50</th><th>p95</th><th>p99</th></tr>
+                {sla_rows}
             </table>
             
             <div class="footer">
                 <p>🚀 Multi-Device Network Monitoring System</p>
                 <p>⚡ Monitoring: Home Router, Google DNS, Cloudflare DNS, OpenDNS</p>
-                <p>🔄 Updates automatically within 25 seconds of network changes</p>
-                <p>📊 Showing last 20 monitoring results (newest first)</p>
+                <p>🔄 Updates pushed live as each check completes</p>
+                <p>📊 Showing last 20 monitoring results (newest first) and the {SLA_TABLE_ROWS} devices with the lowest 24 h uptime</p>
             </div>
         </div>
 
-        <script>
-            let lastModified = {file_modified};
-            let checkInterval;
-            
-            function startRealTimeUpdates() {{
-                // Check for updates every 25 seconds
-                checkInterval = setInterval(function() {{
-                    fetch('/check_updates?last_check=' + lastModified)
-                        .then(response => response.json())
-                        .then(data => {{
-                            if (data.updated) {{
-                                console.log('New data detected - refreshing dashboard');
-                                
-                                // Update status indicator
-                                const indicator = document.getElementById('realtimeStatus');
-                                indicator.style.backgroundColor = '#ffc107';
-                                indicator.innerHTML = '🔄 Updating...';
-                                
-                                // Refresh the page
-                                setTimeout(() => {{
-                                    location.reload();
-                                }}, 500);
-                            }}
-                            lastModified = data.last_modified;
-                        }})
-                        .catch(error => {{
-                            console.log('Update check failed:', error);
-                            const indicator = document.getElementById('realtimeStatus');
-                            indicator.style.backgroundColor = '#dc3545';
-                            indicator.innerHTML = '🔴 Connection Error';
-                        }});
-                }}, 25000);
-            }}
-            
-            // Start real-time updates when page loads
-            window.onload = function() {{
-                startRealTimeUpdates();
-                console.log('Real-time monitoring started');
-                
-                // Update the status indicator
-                const indicator = document.getElementById('realtimeStatus');
-                indicator.style.backgroundColor = '#28a745';
-                indicator.innerHTML = '🟢 Live Updates';
-            }};
-            
-            // Stop checking when page unloads
-            window.onbeforeunload = function() {{
-                if (checkInterval) {{
-                    clearInterval(checkInterval);
-                }}
-            }};
-        </script>
+        <script src="{static_url('dashboard.js')}"></script>
     </body>
     </html>
-    """
+    """)
     
-    return html
+    return "".join(parts)
+
+@app.route('/rows')
+def api_rows():
+    """
+    Incremental delta API: rows logged after `since`, oldest first
+    The cursor is a byte offset into the CSV log (a record number with the
+    binary store); pass back `next` to continue
+    """
+    try:
+        since = max(0, int(request.args.get('since', 0)))
+        limit = min(max(1, int(request.args.get('limit', 100))), 10000)
+    except ValueError:
+        return jsonify({"error": "since and limit must be integers"}), 400
+
+    recent_rows.load(tail_records)
+    records = recent_rows.since(since, limit)
+    source = "memory"
+    if records is None:
+        # Cursor is older than the ring buffer; seek straight to it on disk
+        records = records_from(since, limit)
+        source = "disk"
+
+    next_cursor = records[-1][0] if records else max(since, recent_rows.cursor())
+    return jsonify({
+        "rows": [row for _, row in records],
+        "next": next_cursor,
+        "more": len(records) == limit,
+        "source": source
+    })
+
+@app.route('/export.csv')
+def export_csv():
+    """
+    Download the log as CSV; with the binary store, optionally limited to
+    ?start=&end= epoch seconds
+    """
+    if not USE_BINARY_STORE:
+        if not os.path.exists(RESULTS_LOG):
+            return jsonify({"error": "No data"}), 404
+        return send_file(RESULTS_LOG, mimetype='text/csv', as_attachment=True,
+                         download_name=os.path.basename(RESULTS_LOG))
+
+    try:
+        start = int(request.args.get('start', 0))
+        end = int(request.args.get('end', 2 ** 32))
+    except ValueError:
+        return jsonify({"error": "start and end must be epoch seconds"}), 400
+
+    return Response(get_binary_store().iter_csv(start, end), mimetype='text/csv',
+                    headers={"Content-Disposition": "attachment; filename=network_log.csv"})
 
 @app.route('/status')
 def api_status():
     """
-    API endpoint for current status
-    """
-    csv_path = os.path.join(os.path.dirname(__file__), 'network_log.csv')
-    if os.path.exists(csv_path):
-        with open(csv_path, newline='') as csvfile:
-            reader = csv.reader(csvfile)
-            data = list(reader)
-            if len(data) > 1:
-                last_row = data[-1]
-                return jsonify({
-                    "status": last_row[3] if len(last_row) > 3 else "Unknown",
-                    "timestamp": last_row[0] if len(last_row) > 0 else "Unknown",
-                    "device": last_row[1] if len(last_row) > 1 else "Unknown",
-                    "ip": last_row[2] if len(last_row) > 2 else "Unknown",
-                    "realtime": True
-                })
+    API endpoint for current status, answered from the live state table
+    Bulk form: /status?device=A&device=B, /status?group=core for the
+    devices of inventory groups, or /status?all=1 for every device
+    """
+    load_device_states()
+
+    devices = request.args.getlist('device')
+    groups = request.args.getlist('group')
+    if groups:
+        members = inventory.groups() if inventory is not None else {}
+        devices += [name for name, group in members.items() if group in groups]
+        if not devices:
+            return jsonify({"devices": {}, "summary": device_states.summary(), "realtime": True})
+    if devices or request.args.get('all'):
+        return jsonify({
+            "devices": device_states.snapshot(devices or None),
+            "summary": device_states.summary(),
+            "realtime": True
+        })
+
+    latest = device_states.latest()
+    if latest is not None:
+        return jsonify({
+            "status": latest["status"],
+            "timestamp": latest["timestamp"],
+            "device": latest["device"],
+            "ip": latest["ip"],
+            "summary": device_states.summary(),
+            "realtime": True
+        })
     return jsonify({"status": "No data", "timestamp": "Unknown", "device": "Unknown", "ip": "Unknown", "realtime": False})
 
+@app.route('/status/<path:device>')
+def api_device_status(device):
+    """
+    API endpoint for the current state of a single device
+    """
+    load_device_states()
+
+    state = device_states.get(device)
+    if state is None:
+        return jsonify({"error": f"Unknown device: {device}"}), 404
+    return jsonify(state)
+
+@app.route('/uptime')
+def api_uptime():
+    """
+    Rolling uptime and RTT windows per device
+    Use ?device=A&device=B to limit the response to specific devices
+    """
+    rolling_stats.load(tail_records)
+    devices = request.args.getlist('device') or None
+    return jsonify({"windows": [name for name, _, _ in rolling_stats.windows],
+                    "devices": rolling_stats.snapshot(devices)})
+
+@app.route('/uptime/<path:device>')
+def api_device_uptime(device):
+    """
+    Rolling uptime and RTT windows for a single device
+    """
+    rolling_stats.load(tail_records)
+    summary = rolling_stats.summary(device)
+    if summary is None:
+        return jsonify({"error": f"Unknown device: {device}"}), 404
+    return jsonify(summary)
+
+@app.route('/events')
+def api_events():
+    """
+    Recent UP/DOWN transitions, newest first, from the transition log
+    Query: device (repeatable), limit (default 100). ?view=runs returns
+    every status run in the event log instead, and ?view=outages only the
+    DOWN runs, oldest first
+    """
+    transition_log.load(event_tail_records)
+    devices = request.args.getlist('device')
+    try:
+        limit = min(max(1, int(request.args.get('limit', 100))), 1000)
+    except ValueError:
+        return jsonify({"error": "limit must be an integer"}), 400
+
+    view = request.args.get('view', 'transitions')
+    if view == 'transitions':
+        return jsonify({"events": transition_log.recent(devices, limit), "stats": transition_log.stats()})
+    if view not in ('runs', 'outages'):
+        return jsonify({"error": "view must be transitions, runs or outages"}), 400
+
+    if not os.path.exists(EVENT_LOG):
+        return jsonify({view: []})
+    metrics.count_bytes_read(os.path.getsize(EVENT_LOG))
+    with open(EVENT_LOG, newline='', encoding='utf-8') as file:
+        runs = read_runs(csv.reader(file), devices or None)
+    if view == 'outages':
+        runs = outages(runs)
+    return jsonify({view: runs[-limit:]})
+
+def parse_time_arg(value, default):
+    """
+    Parse epoch seconds or 'YYYY-MM-DD[ HH:MM:SS]' from a query argument
+    """
+    if value is None:
+        return default
+    try:
+        return int(float(value))
+    except ValueError:
+        pass
+    for fmt in ('%Y-%m-%d %H:%M:%S', '%Y-%m-%dT%H:%M:%S', '%Y-%m-%d'):
+        try:
+            return int(time.mktime(time.strptime(value, fmt)))
+        except ValueError:
+            continue
+    raise ValueError(f"Unrecognised time: {value}")
+
+def parse_duration_arg(value, default):
+    """
+    Parse a bucket size such as 300, '5m', '1h' or '1d' into seconds
+    """
+    if value is None:
+        return default
+    units = {"s": 1, "m": 60, "h": 3600, "d": 86400}
+    if value[-1:] in units:
+        return int(float(value[:-1]) * units[value[-1]])
+    return int(value)
+
+@app.route('/history')
+def api_history():
+    """
+    Downsampled history per device: uptime ratio, probe count and RTT
+    min/avg/max per bucket
+    Query: device (repeatable), start, end (epoch or YYYY-MM-DD HH:MM:SS),
+    bucket (seconds or 5m / 1h / 1d); defaults to the last 24 h by hour
+    """
+    if history_index is None:
+        return jsonify({"error": "History queries require NumPy"}), 501
+    start_history(log_cursor())
+    if history_index.state == "loading":
+        return jsonify({"status": "loading", "message": "History index is still loading"}), 503
+    if history_index.state == "failed":
+        return jsonify({"error": history_index.error}), 500
+
+    try:
+        bucket = parse_duration_arg(request.args.get('bucket'), 3600)
+        end = parse_time_arg(request.args.get('end'), int(time.time()))
+        start = parse_time_arg(request.args.get('start'), end - 86400)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    if bucket <= 0:
+        return jsonify({"error": "bucket must be positive"}), 400
+
+    # Align to bucket boundaries so repeated chart loads share cache entries
+    start -= start % bucket
+    end += -end % bucket
+
+    devices = request.args.getlist('device') or history_index.device_names()
+    if len(devices) > HISTORY_MAX_DEVICES:
+        return jsonify({"error": f"At most {HISTORY_MAX_DEVICES} devices per query"}), 400
+
+    try:
+        return jsonify(history_index.query(devices, start, end, bucket))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+def parse_log_query(args):
+    """
+    Filters and page position for /log and /search from query arguments
+    """
+    limit = min(max(1, int(args.get('limit', 100))), LOG_PAGE_MAX)
+    cursor = args.get('cursor')
+    return {
+        "devices": [value for value in args.getlist('device') if value] or None,
+        "ips": [value for value in args.getlist('ip') if value] or None,
+        "statuses": [value.upper() for value in args.getlist('status') if value] or None,
+        "start": parse_time_arg(args.get('start') or None, None),
+        "end": parse_time_arg(args.get('end') or None, None),
+        "before": int(cursor) if cursor else None,
+        "limit": limit,
+    }
+
+def search_log(args):
+    """
+    Run a /log query; returns (rows, next cursor or None, rows read), or
+    raises ValueError for bad arguments and LookupError while the index
+    is not ready
+    """
+    start_log_index(log_cursor())
+    if log_index.state == "loading":
+        raise LookupError("Log index is still loading")
+    if log_index.state == "failed":
+        raise LookupError(log_index.error)
+    records, more, rows_read = log_index.query(records_from, **parse_log_query(args))
+    return [row for _, row in records], records[-1][0] if more else None, rows_read
+
+@app.route('/log')
+def api_log():
+    """
+    Search the probe log, newest first
+    Query: device, ip, status (each repeatable), start, end (epoch or
+    YYYY-MM-DD HH:MM:SS), limit (default 100); pass `next` back as
+    `cursor` for the following page
+    """
+    try:
+        rows, next_cursor, rows_read = search_log(request.args)
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+    except LookupError as e:
+        return jsonify({"status": log_index.state, "message": str(e)}), 503
+    return jsonify({"rows": rows, "next": next_cursor, "more": next_cursor is not None,
+                    "rows_read": rows_read, "indexed_since": log_index.stats()["oldest"]})
+
+@app.route('/search')
+def search_log_page():
+    """
+    Dashboard view of /log: a filter form and one page of results
+    """
+    error = None
+    rows, next_cursor = [], None
+    try:
+        rows, next_cursor, _ = search_log(request.args)
+    except (ValueError, LookupError) as e:
+        error = str(e)
+
+    def field(name, placeholder):
+        value = escape(request.args.get(name, ''))
+        return f"<input name='{name}' value='{value}' placeholder='{placeholder}'>"
+
+    status = request.args.get('status', '').upper()
+    options = "".join(f"<option value='{value}'{' selected' if value == status else ''}>{label}</option>"
+                      for value, label in (("", "Any status"), ("UP", "UP"), ("DOWN", "DOWN")))
+    parts = [f"""
+    <html>
+    <head>
+        <title>Search Log - Network Monitor</title>
+        <meta name="viewport" content="width=device-width, initial-scale=1">
+        <link rel="stylesheet" href="{static_url('dashboard.css')}">
+    </head>
+    <body>
+        <div class="container">
+            <h1>🔎 Search Probe Log</h1>
+            <form class="controls" method="get">
+                {field('device', 'Device')} {field('ip', 'IP address')}
+                <select name="status">{options}</select>
+                {field('start', 'From YYYY-MM-DD HH:MM:SS')} {field('end', 'To YYYY-MM-DD HH:MM:SS')}
+                <button class="refresh-btn" type="submit">Search</button>
+                <a href="{url_for('dashboard')}">Back to dashboard</a>
+            </form>
+    """]
+    if error:
+        parts.append(f"<p style='text-align: center; color: #dc3545;'>⚠️ {escape(error)}</p>")
+    parts.append("<table id='logTable'><tr>" + "".join(f"<th>{escape(cell)}</th>" for cell in LOG_HEADERS) + "</tr>")
+    for row in rows:
+        parts.append("<tr>")
+        for j, cell in enumerate(row):
+            if j == 3 and cell.upper() == "UP":
+                parts.append(f"<td class='status-up' style='text-align: center;'>✅ {escape(cell)}</td>")
+            elif j == 3 and cell.upper() == "DOWN":
+                parts.append(f"<td class='status-down' style='text-align: center;'>❌ {escape(cell)}</td>")
+            elif j == 1:
+                parts.append(f"<td style='font-weight: bold; color: #007bff;'>{escape(cell)}</td>")
+            else:
+                parts.append(f"<td>{escape(cell)}</td>")
+        parts.append("</tr>")
+    parts.append("</table>")
+    if not rows and not error:
+        parts.append("<p style='text-align: center;'>No matching rows.</p>")
+    if next_cursor is not None:
+        args = request.args.to_dict(flat=False)
+        args['cursor'] = [str(next_cursor)]
+        parts.append(f"<div class='controls'><a class='refresh-btn' "
+                     f"href='{escape(url_for('search_log_page', **args))}'>Older results →</a></div>")
+    parts.append("""
+        </div>
+    </body>
+    </html>
+    """)
+    return Response("".join(parts), mimetype='text/html')
+
 # ============================================================================
-# THREADING AND MAIN FUNCTIONS
+# WEB WORKER PROCESSES
 # ============================================================================
 
-def start_monitoring_thread(device_name, ip_address, interval=30):
+def snapshot_version():
+    return device_states.version, data_generation
+
+def snapshot_scalars():
     """
-    Start monitoring in background thread for a single device
+    Small fields sent with every snapshot and every set of changes
     """
-    monitor_thread = threading.Thread(
-        target=monitor_device_background, 
-        args=(device_name, ip_address, interval),
-        daemon=True
-    )
-    monitor_thread.start()
-    print(f"✅ Monitoring thread started for {device_name} ({ip_address})")
-    return monitor_thread
+    latest = device_states.latest()
+    return {
+        "generation": data_generation,
+        "changed_at": data_changed_at,
+        "log_exists": log_exists(),
+        "log_modified": log_modified(),
+        "summary": device_states.summary(),
+        "latest": latest["device"] if latest is not None else None,
+        "event_stats": transition_log.stats(),
+        "metrics": metrics.render(exclude=WEB_METRICS) if metrics.ENABLED else "",
+    }
+
+def build_snapshot():
+    """
+    Full live state, for a web worker that is starting or fell behind;
+    rolling uptime summaries come from uptime_cache
+    """
+    uptime_cache.refresh()
+    recent_rows.load(tail_records)
+    rows = recent_rows.latest_records(recent_rows.capacity)
+    data = snapshot_scalars()
+    data.update({
+        "cursor": rows[-1][0] if rows else 0,
+        "rows": rows,
+        "states": device_states.snapshot(),
+        "windows": rolling_stats.windows,
+        "uptime": dict(uptime_cache.summaries),
+        "worst": uptime_cache.ranked,
+        "events": transition_log.recent(limit=SNAPSHOT_EVENTS),
+        "groups": inventory.groups() if inventory is not None else {},
+    })
+    return data
+
+def snapshot_changes():
+    """
+    What changed since the previous call: states recorded or forgotten,
+    new rows and status changes, re-summarized uptime and inventory groups.
+    The first call only sets the marks; build_snapshot() covers it.
+    """
+    global snapshot_marks
+    uptime_cache.refresh()
+    recent_rows.load(tail_records)
+    targets = inventory.targets if inventory is not None else None
+    if snapshot_marks is None:
+        uptime_cache.take_pending()
+        snapshot_marks = {"states": device_states.version, "cursor": recent_rows.cursor(),
+                          "events": transition_log.version, "targets": targets}
+        return {}
+    marks = snapshot_marks
+
+    version, states, removed = device_states.changes(marks["states"])
+    data = snapshot_scalars()
+    data.update({"states": states, "removed": removed})
+    rows = recent_rows.since(marks["cursor"], recent_rows.capacity)
+    # None when rows were evicted before this call; the worker reads the gap from the log
+    data["after"] = marks["cursor"] if rows is not None else None
+    if rows is None:
+        rows = recent_rows.latest_records(recent_rows.capacity)
+    data["rows"] = rows
+    data["cursor"] = rows[-1][0] if rows else marks["cursor"]
+
+    events = transition_log.version
+    if events != marks["events"]:
+        data["events"] = transition_log.recent(limit=min(events - marks["events"], SNAPSHOT_EVENTS))
+    uptime, ranked = uptime_cache.take_pending()
+    if uptime:
+        data["uptime"] = uptime
+    if ranked is not None:
+        data["worst"] = ranked
+    if targets is not marks["targets"]:
+        data["groups"] = inventory.groups()
+
+    snapshot_marks = {"states": version, "cursor": data["cursor"], "events": events, "targets": targets}
+    return data
+
+def worker_rows(rows, cursors):
+    """
+    Snapshot listener in a web worker; the same fan-out the log writer
+    drives in the probe process
+    """
+    recent_rows.extend(rows, cursors)
+    publish_rows(rows, cursors)
+    if history_index is not None:
+        history_index.append_rows(rows, cursors)
+    log_index.append_rows(rows, cursors)
+
+def worker_removed(names):
+    """
+    Snapshot listener in a web worker: devices the probe process stopped
+    monitoring
+    """
+    if history_index is not None:
+        for name in names:
+            history_index.forget(name)
+
+def run_web_worker(index, sock, snapshot_name):
+    """
+    Entry point of one web worker process: serve the dashboard and APIs
+    from the probe process's snapshot on the shared listening socket
+    """
+    global snapshot_view, device_states, rolling_stats, transition_log, inventory
+    view = serving.SnapshotView(snapshot_name, on_rows=worker_rows, on_event=broadcaster.publish,
+                                backfill=records_between, on_removed=worker_removed)
+    while not view.load(timeout=5):
+        console.emit("startup", f"⏳ Web worker {index} waiting for the first snapshot...")
+
+    # Handlers read these globals; point them at the snapshot
+    device_states, rolling_stats, transition_log = view.states, view.uptime, view.events
+    inventory = view
+    recent_rows.loaded = True
+    recent_rows.extend([row for _, row in view.initial_rows], [cursor for cursor, _ in view.initial_rows])
+    snapshot_view = view
+    # Rows after the first snapshot reach the index from the follower
+    start_log_index(view.initial_cursor)
+    view.start()
+
+    server = serving.make_server(app, HTTP_HOST, HTTP_PORT, fd=sock.fileno())
+    server.serve_forever()
+
+def start_web_workers():
+    """
+    Bind the listening socket here and start WEB_WORKERS processes on it,
+    fed by a snapshot publisher thread
+    """
+    global snapshot_writer
+    sock = socket.create_server((HTTP_HOST, HTTP_PORT), backlog=1024)
+    snapshot_writer = serving.SnapshotWriter()
+    publisher = serving.SnapshotPublisher(snapshot_writer, build_snapshot, snapshot_changes, snapshot_version)
+    workers = serving.WebWorkers(WEB_WORKERS, run_web_worker, sock, snapshot_writer.name)
+    if metrics.ENABLED:
+        metrics.gauge_callback("monitor_web_workers_alive", "Web worker processes running", workers.alive)
+        metrics.counter_callback("monitor_web_worker_restarts_total", "Web worker processes restarted",
+                                 lambda: workers.restarts)
+        metrics.gauge_callback("monitor_snapshot_build_seconds", "Time to build and publish the last snapshot",
+                               lambda: publisher.build_seconds)
+        metrics.counter_callback("monitor_snapshots_published_total", "Snapshots published to web workers",
+                                 lambda: snapshot_writer.published)
+        metrics.counter_callback("monitor_snapshot_full_builds_total",
+                                 "Full snapshots built for web workers that started or fell behind",
+                                 lambda: publisher.full_builds)
+    publisher.start()
+    workers.start()
+    return publisher, workers
+
+# ============================================================================
+# SCHEDULING AND MAIN FUNCTIONS
+# ============================================================================
+
+def start_monitoring(scheduler, device_name, ip_address, interval=30):
+    """
+    Schedule fixed-rate checks for a single device on the shared scheduler
+    """
+    scheduler.add(device_name, interval, monitor_device_background, device_name, ip_address)
+    if cadence is not None:
+        cadence.register(device_name, interval, lambda interval: scheduler.reschedule(device_name, interval))
+    console.emit("startup", f"✅ Monitoring scheduled for {device_name} ({ip_address}) every {interval} seconds")
+
+def add_target(target):
+    """
+    Inventory callback: start checking a target, replacing any previous
+    schedule under the same name
+    """
+    if isinstance(prober, ShardedProbing):
+        prober.add(target.name, target.ip, target.interval, target.check)
+    else:
+        prober.add(target.name, target.interval, monitor_device_background, target.name, target.ip,
+                   LOG_FILE, target.check)
+        if cadence is not None:
+            cadence.register(target.name, target.interval,
+                             lambda interval, name=target.name: prober.reschedule(name, interval))
+
+def remove_target(target):
+    """
+    Inventory callback: stop checking a target and drop its live state and
+    rolling stats
+    """
+    prober.remove(target.name)
+    if cadence is not None:
+        cadence.forget(target.name)
+    device_states.forget(target.name)
+    transition_log.forget(target.name)
+    rolling_stats.forget(target.name)
+    if history_index is not None:
+        history_index.forget(target.name)
+
+def stop_on_sigterm(signum, frame):
+    """
+    SIGTERM (a service manager stopping the monitor) takes the same
+    shutdown path as Ctrl+C, so the snapshot segment is unlinked and the
+    logs are flushed
+    """
+    raise KeyboardInterrupt
 
 def main():
     """
     Main function - starts both monitoring and web dashboard
     """
-    print("🚀 Multi-Device Network Monitoring System")
-    print("=" * 55)
-    print("⚡ Features: Real-time monitoring of multiple devices")
-    print("🔧 Starting up...")
+    global prober, inventory
+    console.emit("startup", "🚀 Multi-Device Network Monitoring System")
+    console.emit("startup", "=" * 55)
+    console.emit("startup", "⚡ Features: Real-time monitoring of multiple devices")
+    console.emit("startup", "🔧 Starting up...")
     
-    # Configuration - Multiple Devices
+    # Configuration - Multiple Devices (used when there is no inventory file)
     monitored_devices = {
         "Home Router": "10.0.0.1",
         "Google DNS": "8.8.8.8", 
@@ -530,43 +1466,93 @@ def main():
         "OpenDNS": "208.67.222.222"
     }
     ping_interval = 30
+    worker_threads = 32
     
     # Initialize CSV log file
-    initialize_log("network_log.csv")
+    if LOG_MODE != "full":
+        console.emit("startup", f"💾 Storage: transitions and heartbeats only, in {EVENT_LOG}")
+    elif STORAGE == "binary":
+        console.emit("startup", f"💾 Storage: segmented binary store in {STORE_DIR}")
+    else:
+        initialize_log(LOG_FILE)
+    initialize_log(EVENT_LOG, EVENT_HEADERS)
+    transition_log.load(event_tail_records)
+    load_device_states()
+    rolling_stats.load(tail_records)
     
     # Start background monitoring for all devices
-    print(f"🔍 Initializing monitoring for {len(monitored_devices)} devices...")
-    monitoring_threads = []
+    if PROBE_PROCESSES > 0:
+        # Each worker process runs its own scheduler; this process collects
+        prober = ShardedProbing(PROBE_PROCESSES, record_shard_result,
+                                threads_per_process=worker_threads, echoes=ECHOES_PER_CHECK)
+        instrument_shards(prober)
+    else:
+        prober = Scheduler(workers=worker_threads)
+        instrument_scheduler(prober)
 
-    for device_name, ip_address in monitored_devices.items():
-        thread = start_monitoring_thread(device_name, ip_address, ping_interval)
-        monitoring_threads.append(thread)
-        time.sleep(1)  # Small delay between starting threads
+    # Start times are jittered across the first interval by the scheduler
+    inventory = Inventory(INVENTORY_FILE, add_target, remove_target)
+    if os.path.exists(INVENTORY_FILE):
+        console.emit("startup", f"📋 Loading inventory from {INVENTORY_FILE}...")
+        inventory.load()
+        inventory.watch()
+    else:
+        inventory.apply([Target(device_name, ip_address, ping_interval)
+                         for device_name, ip_address in monitored_devices.items()])
+    # The restored tail may hold devices removed from the inventory while stopped
+    for device in set(rolling_stats.devices()) - inventory.targets.keys():
+        rolling_stats.forget(device)
+    console.emit("startup", f"🔍 Initializing monitoring for {len(inventory.targets)} devices...")
 
-    print(f"✅ All {len(monitored_devices)} monitoring threads started")
+    prober.start()
+    if PROBE_PROCESSES > 0:
+        console.emit("startup",
+                     f"✅ All {len(inventory.targets)} devices sharded across {PROBE_PROCESSES} probe processes")
+    else:
+        console.emit("startup", f"✅ All {len(inventory.targets)} devices scheduled on {worker_threads} worker threads")
     
     # Give monitoring a moment to start
     time.sleep(2)
     
     # Start web dashboard
-    print("🌐 Starting real-time web dashboard...")
-    print(f"📊 Dashboard: http://127.0.0.1:5000")
-    print(f"⚡ Real-time updates: 25-second polling")
-    print(f"🔄 Auto-refresh: When CSV changes detected")
-    print(f"⏹️  Press Ctrl+C to stop all monitoring")
-    print("=" * 55)
+    serve_in_workers = WEB_WORKERS > 0
+    if serve_in_workers and USE_BINARY_STORE:
+        console.warning("⚠️  Web workers need MONITOR_STORAGE=csv; serving from this process")
+        serve_in_workers = False
+    console.emit("startup", "🌐 Starting real-time web dashboard...")
+    console.emit("startup", f"📊 Dashboard: http://{HTTP_HOST}:{HTTP_PORT}")
+    console.emit("startup", f"⚡ Real-time updates: Server-Sent Events at /stream")
+    console.emit("startup", f"🔄 Live patching: Rows and counters update in place")
+    if serve_in_workers:
+        console.emit("startup", f"🧵 Serving from {WEB_WORKERS} web worker processes")
+    console.emit("startup", f"⏹️  Press Ctrl+C to stop all monitoring")
+    console.emit("startup", "=" * 55)
     
+    web_workers = None
+    signal.signal(signal.SIGTERM, stop_on_sigterm)
     try:
-        app.run(
-            debug=False,
-            host='127.0.0.1', 
-            port=5000,
-            use_reloader=False
-        )
+        if serve_in_workers:
+            publisher, web_workers = start_web_workers()
+            while True:
+                time.sleep(3600)
+        else:
+            serving.make_server(app, HTTP_HOST, HTTP_PORT).serve_forever()
     except KeyboardInterrupt:
-        print("\n🛑 Shutdown signal received...")
-        print("💾 Monitoring data saved to network_log.csv")
-        print("👋 Multi-device monitoring system stopped")
+        console.emit("shutdown", "\n🛑 Shutdown signal received...")
+    finally:
+        # A second SIGTERM must not cut the cleanup short
+        signal.signal(signal.SIGTERM, signal.SIG_IGN)
+        if web_workers is not None:
+            web_workers.stop()
+            publisher.stop()
+            snapshot_writer.close()
+        inventory.stop()
+        if PROBE_PROCESSES > 0:
+            prober.stop()
+        else:
+            prober.stop(wait=False)
+        console.emit("shutdown", "💾 Monitoring data saved to network_log.csv")
+        console.emit("shutdown", "👋 Multi-device monitoring system stopped")
 
 if __name__ == "__main__":
     main()
\ No newline at end of file
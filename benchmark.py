@@ -0,0 +1,519 @@
+#!/usr/bin/env python3
+"""
+Offline benchmark suite
+Drives probing, logging and dashboard serving against a fake probe backend
+and synthetic logs, and reports throughput, scheduling lag, page latency
+and peak memory as JSON so runs can be compared between versions
+"""
+
+import argparse
+import contextlib
+import http.client
+import io
+import json
+import logging
+import multiprocessing
+import os
+import platform
+import random
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+
+SCENARIOS = ("probe", "append", "serve")
+SERVE_PATHS = ("/", "/status", "/status/{device}", "/uptime/{device}", "/rows?limit=100")
+
+# Metrics where a larger value is an improvement; everything else numeric
+# (latency, lag, memory, load time) is better when smaller
+HIGHER_IS_BETTER = ("per_sec", "coverage_percent")
+
+# Descriptive values (sizes, configuration) that are not compared
+NOT_COMPARED = {"count", "requests", "rows", "log_rows", "log_bytes", "devices", "clients", "workers", "probe_processes",
+                "bytes_written", "interval_seconds", "elapsed_seconds", "checks_run", "rows_logged"}
+
+# ============================================================================
+# HELPERS
+# ============================================================================
+
+def peak_rss_mb():
+    """
+    Peak resident set size of this process in MiB, or None where unsupported
+    """
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    scale = 1 if sys.platform == "darwin" else 1024
+    return round(peak * scale / (1024 * 1024), 1)
+
+def percentile(sorted_values, fraction):
+    if not sorted_values:
+        return None
+    index = min(len(sorted_values) - 1, max(0, int(round(fraction * (len(sorted_values) - 1)))))
+    return sorted_values[index]
+
+def latency_summary(samples):
+    """
+    p50/p99/max/mean of latencies given in seconds, reported in ms
+    """
+    values = sorted(samples)
+    if not values:
+        return {"count": 0}
+
+    def ms(value):
+        return round(value * 1000, 3)
+
+    return {
+        "count": len(values),
+        "p50_ms": ms(percentile(values, 0.5)),
+        "p99_ms": ms(percentile(values, 0.99)),
+        "max_ms": ms(values[-1]),
+        "mean_ms": ms(sum(values) / len(values)),
+    }
+
+def device_names(count):
+    return [f"Device {i:06d}" for i in range(count)]
+
+def device_ip(index):
+    n = index + 1
+    return f"10.{(n >> 16) & 0xFF}.{(n >> 8) & 0xFF}.{n & 0xFF}"
+
+def configure_environment(options, log_file):
+    """
+    Point the app at a scratch log and the fake probe backend; must run
+    before app is imported in the scenario process
+    """
+    os.environ["MONITOR_LOG_FILE"] = log_file
+    os.environ["MONITOR_STORAGE"] = "csv"
+    os.environ["MONITOR_PROBE_BACKEND"] = "fake"
+    os.environ["MONITOR_FAKE_LATENCY_MS"] = str(options["latency_ms"])
+    os.environ["MONITOR_FAKE_JITTER_MS"] = str(options["jitter_ms"])
+    os.environ["MONITOR_FAKE_FAILURE_RATE"] = str(options["failure_rate"])
+    os.environ["MONITOR_FAKE_SEED"] = str(options["seed"])
+
+# ============================================================================
+# SYNTHETIC LOGS
+# ============================================================================
+
+def generate_log(path, rows, devices=1000, interval=30, failure_rate=0.05, seed=1, chunk_rows=200000):
+    """
+    Write a CSV log of `rows` results for `devices` devices probed every
+    `interval` seconds, ending now. Rows for one timestamp are emitted
+    together, like a fleet checked on a shared schedule.
+    """
+    from live_state import LOG_HEADERS
+
+    generator = random.Random(seed)
+    names = device_names(devices)
+    ips = [device_ip(i) for i in range(devices)]
+    # Pre-rendered tails keep generation fast enough for 100M-row logs
+    up_tails = [f"UP,{rtt:.3f},0.0,{generator.uniform(0.1, 3):.3f}"
+                for rtt in (max(0.2, generator.gauss(20, 5)) for _ in range(997))]
+    down_tail = "DOWN,,100.0,"
+
+    steps = -(-rows // devices)
+    start = int(time.time()) - steps * interval
+    written = 0
+    with open(path, "w", encoding="utf-8", newline="") as file:
+        file.write(",".join(LOG_HEADERS) + "\n")
+        lines = []
+        for step in range(steps):
+            stamp = datetime.fromtimestamp(start + step * interval).strftime('%Y-%m-%d %H:%M:%S')
+            count = min(devices, rows - written)
+            for index in range(count):
+                if generator.random() < failure_rate:
+                    tail = down_tail
+                else:
+                    tail = up_tails[(step * 31 + index) % len(up_tails)]
+                lines.append(f"{stamp},{names[index]},{ips[index]},{tail}\n")
+            written += count
+            if len(lines) >= chunk_rows:
+                file.write("".join(lines))
+                lines = []
+        file.write("".join(lines))
+    return path
+
+def synthetic_log(workdir, rows, devices, seed):
+    """
+    Path of a cached synthetic log, generated on first use
+    """
+    path = os.path.join(workdir, f"synthetic_{rows}_{devices}_{seed}.csv")
+    if not os.path.exists(path):
+        started = time.perf_counter()
+        generate_log(path + ".tmp", rows, devices, seed=seed)
+        os.replace(path + ".tmp", path)
+        print(f"📝 Generated {rows:,} rows in {time.perf_counter() - started:.1f}s: {path}", file=sys.stderr)
+    return path
+
+# ============================================================================
+# SCENARIOS (each runs in a fresh process)
+# ============================================================================
+
+def run_probe(options):
+    """
+    Schedule fake-probed devices on the real scheduler and monitor path
+    """
+    log_file = os.path.join(options["workdir"], "probe.csv")
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    configure_environment(options, log_file)
+
+    processes = options["probe_processes"]
+    with contextlib.redirect_stdout(io.StringIO()):
+        import app
+        from scheduler import Scheduler
+        from sharding import ShardedProbing
+
+        app.initialize_log(app.LOG_FILE)
+        if processes:
+            scheduler = ShardedProbing(processes, app.record_shard_result, threads_per_process=options["workers"])
+            for index, name in enumerate(device_names(options["devices"])):
+                scheduler.add(name, device_ip(index), options["interval"])
+        else:
+            scheduler = Scheduler(workers=options["workers"])
+            for index, name in enumerate(device_names(options["devices"])):
+                app.start_monitoring(scheduler, name, device_ip(index), options["interval"])
+
+        started = time.perf_counter()
+        scheduler.start()
+        time.sleep(options["duration"])
+        elapsed = time.perf_counter() - started
+        if processes:
+            # Workers report their scheduler stats as they stop
+            scheduler.stop()
+            stats = sharded_scheduler_stats(scheduler.stats())
+        else:
+            stats = scheduler.stats()
+            scheduler.stop(wait=True)
+        writer_stats = app.get_log_writer(app.LOG_FILE).stats()
+        app.close_log_writers()
+        # Drain queued console lines into the captured stdout
+        app.console.CONSOLE.close()
+
+    expected = options["devices"] / options["interval"] * elapsed
+    return {
+        "devices": options["devices"],
+        "interval_seconds": options["interval"],
+        "probe_processes": processes,
+        "workers": options["workers"],
+        "elapsed_seconds": round(elapsed, 3),
+        "checks_run": stats["checks_run"],
+        "checks_skipped": stats["checks_skipped"],
+        "probes_per_sec": round(stats["checks_run"] / elapsed, 1),
+        "schedule_coverage_percent": round(min(100.0, stats["checks_run"] / expected * 100), 2) if expected else None,
+        "mean_lag_ms": round(stats["mean_lateness"] * 1000, 3),
+        "max_lag_ms": round(stats["max_lateness"] * 1000, 3),
+        "rows_logged": writer_stats["rows_written"],
+        "backpressure_events": writer_stats["backpressure_events"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def sharded_scheduler_stats(stats):
+    """
+    Combine the scheduler stats reported by each probe worker process
+    """
+    shards = [shard["scheduler"] for shard in stats["shards"] if shard["scheduler"]]
+    checks = sum(shard["checks_run"] for shard in shards)
+    return {
+        "checks_run": checks,
+        "checks_skipped": sum(shard["checks_skipped"] for shard in shards),
+        "mean_lateness": sum(shard["mean_lateness"] * shard["checks_run"] for shard in shards) / checks if checks else 0.0,
+        "max_lateness": max((shard["max_lateness"] for shard in shards), default=0.0),
+    }
+
+def run_append(options):
+    """
+    Push rows through log_status, including every writer listener
+    """
+    log_file = os.path.join(options["workdir"], "append.csv")
+    if os.path.exists(log_file):
+        os.remove(log_file)
+    configure_environment(options, log_file)
+
+    import app
+
+    app.initialize_log(app.LOG_FILE)
+    names = device_names(options["devices"])
+    timestamp = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
+    rows = options["append_rows"]
+
+    started = time.perf_counter()
+    for i in range(rows):
+        index = i % len(names)
+        app.log_status(app.LOG_FILE, timestamp, names[index], device_ip(index), "UP", 0.02, 0.0, 0.001)
+    queued = time.perf_counter() - started
+    writer_stats = app.get_log_writer(app.LOG_FILE).stats()
+    app.close_log_writers()
+    elapsed = time.perf_counter() - started
+
+    return {
+        "rows": rows,
+        "append_per_sec": round(rows / queued, 1),
+        "durable_rows_per_sec": round(rows / elapsed, 1),
+        "bytes_written": os.path.getsize(log_file),
+        "backpressure_events": writer_stats["backpressure_events"],
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+def _client(port, paths, requests, latencies, errors, barrier):
+    connection = http.client.HTTPConnection("127.0.0.1", port, timeout=30)
+    barrier.wait()
+    for i in range(requests):
+        path = paths[i % len(paths)]
+        started = time.perf_counter()
+        try:
+            connection.request("GET", path)
+            response = connection.getresponse()
+            response.read()
+            if response.status >= 400:
+                errors[path] = errors.get(path, 0) + 1
+        except (OSError, http.client.HTTPException):
+            errors[path] = errors.get(path, 0) + 1
+            connection.close()
+            continue
+        latencies[path].append(time.perf_counter() - started)
+    connection.close()
+
+def run_serve(options):
+    """
+    Serve the app over real HTTP from a synthetic log and hit it with
+    concurrent keep-alive clients
+    """
+    log_file = options["log_file"]
+    configure_environment(options, log_file)
+
+    with contextlib.redirect_stdout(io.StringIO()):
+        import serving
+
+        # Per-request access logging would dominate the measurement
+        logging.getLogger("werkzeug").setLevel(logging.ERROR)
+
+        started = time.perf_counter()
+        import app
+
+        app.device_states.load(app.tail_records)
+        app.rolling_stats.load(app.tail_records)
+        app.get_log_writer(app.LOG_FILE)
+        startup = time.perf_counter() - started
+
+        history_seconds = None
+        if app.history_index is not None:
+            while app.history_index.state == "loading":
+                time.sleep(0.05)
+            history_seconds = round(time.perf_counter() - started, 3)
+
+    device = app.device_states.snapshot()
+    device = next(iter(device)) if device else "Device 000000"
+    paths = [path.format(device=device.replace(" ", "%20")) for path in SERVE_PATHS]
+
+    server = serving.make_server(app.app, "127.0.0.1", 0)
+    server_thread = threading.Thread(target=server.serve_forever, daemon=True)
+    server_thread.start()
+
+    clients = options["clients"]
+    per_client = max(1, options["requests"] // clients)
+    latencies = {path: [] for path in paths}
+    errors = {}
+    barrier = threading.Barrier(clients + 1)
+    threads = [threading.Thread(target=_client, args=(server.port, paths, per_client, latencies, errors, barrier))
+               for _ in range(clients)]
+    for thread in threads:
+        thread.start()
+    barrier.wait()
+    began = time.perf_counter()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - began
+    server.shutdown()
+
+    total = sum(len(values) for values in latencies.values())
+    templates = dict(zip(paths, SERVE_PATHS))
+    return {
+        "log_rows": options["log_rows"],
+        "log_bytes": os.path.getsize(log_file),
+        "startup_seconds": round(startup, 3),
+        "history_ready_seconds": history_seconds,
+        "clients": clients,
+        "requests": total,
+        "errors": sum(errors.values()),
+        "requests_per_sec": round(total / elapsed, 1) if elapsed else None,
+        "all": latency_summary([value for values in latencies.values() for value in values]),
+        "routes": {templates[path]: latency_summary(values) for path, values in latencies.items()},
+        "peak_rss_mb": peak_rss_mb(),
+    }
+
+SCENARIO_RUNNERS = {"probe": run_probe, "append": run_append, "serve": run_serve}
+
+def run_isolated(name, options):
+    """
+    Run one scenario in a fresh interpreter so module state and peak RSS
+    never leak between scenarios
+    """
+    context = multiprocessing.get_context("spawn")
+    with ProcessPoolExecutor(max_workers=1, mp_context=context) as executor:
+        return executor.submit(SCENARIO_RUNNERS[name], options).result()
+
+# ============================================================================
+# REPORTING
+# ============================================================================
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+def flatten(results, prefix=""):
+    """
+    Map "serve.10000.all.p99_ms"-style keys to numeric values
+    """
+    flat = {}
+    for key, value in results.items():
+        name = f"{prefix}{key}"
+        if isinstance(value, dict):
+            flat.update(flatten(value, name + "."))
+        elif isinstance(value, (int, float)) and not isinstance(value, bool):
+            flat[name] = value
+    return flat
+
+def compare(current, baseline, threshold, out=sys.stdout):
+    """
+    Print metric changes against a baseline report; returns the regressions
+    """
+    now = flatten(current["results"])
+    before = flatten(baseline["results"])
+    regressions = []
+    for name in sorted(now.keys() & before.keys()):
+        old, new = before[name], now[name]
+        if not old or name.rsplit(".", 1)[-1] in NOT_COMPARED:
+            continue
+        change = (new - old) / abs(old)
+        worse = -change if name.endswith(HIGHER_IS_BETTER) else change
+        marker = "  "
+        if worse > threshold:
+            marker = "❌"
+            regressions.append(name)
+        elif worse < -threshold:
+            marker = "✅"
+        print(f"{marker} {name:<55} {old:>12,.3f} → {new:>12,.3f} ({change * 100:+.1f}%)", file=out)
+    return regressions
+
+def print_summary(results):
+    probe = results.get("probe")
+    if probe:
+        print(f"🔍 probe: {probe['probes_per_sec']:,.0f} probes/sec over {probe['devices']} devices, "
+              f"lag mean {probe['mean_lag_ms']} ms / max {probe['max_lag_ms']} ms, "
+              f"{probe['schedule_coverage_percent']}% of schedule, peak RSS {probe['peak_rss_mb']} MiB")
+    append = results.get("append")
+    if append:
+        print(f"💾 append: {append['append_per_sec']:,.0f} rows/sec queued, "
+              f"{append['durable_rows_per_sec']:,.0f} rows/sec written, peak RSS {append['peak_rss_mb']} MiB")
+    for rows, serve in results.get("serve", {}).items():
+        print(f"🌐 serve {int(rows):,} rows: {serve['requests_per_sec']:,.0f} req/sec, "
+              f"p50 {serve['all'].get('p50_ms')} ms / p99 {serve['all'].get('p99_ms')} ms, "
+              f"startup {serve['startup_seconds']}s, {serve['errors']} errors, peak RSS {serve['peak_rss_mb']} MiB")
+        for route, summary in serve["routes"].items():
+            print(f"     {route:<20} p50 {summary.get('p50_ms')} ms / p99 {summary.get('p99_ms')} ms")
+
+# ============================================================================
+# COMMAND LINE
+# ============================================================================
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Offline benchmarks for the network monitor")
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help="comma-separated subset of: " + ", ".join(SCENARIOS))
+    parser.add_argument("--quick", action="store_true", help="small sizes for a fast smoke run")
+    parser.add_argument("--devices", type=int, default=1000)
+    parser.add_argument("--interval", type=float, default=1.0, help="probe interval in seconds")
+    parser.add_argument("--duration", type=float, default=10.0, help="seconds to run the probe scenario")
+    parser.add_argument("--workers", type=int, default=32, help="check threads (per process when sharded)")
+    parser.add_argument("--probe-processes", type=int, default=0,
+                        help="run the probe scenario with sharded worker processes")
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--jitter-ms", type=float, default=5.0)
+    parser.add_argument("--failure-rate", type=float, default=0.05)
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--append-rows", type=int, default=200000)
+    parser.add_argument("--log-rows", default="10000,1000000",
+                        help="comma-separated synthetic log sizes for the serve scenario (up to 100000000)")
+    parser.add_argument("--clients", type=int, default=16)
+    parser.add_argument("--requests", type=int, default=2000, help="total requests per log size")
+    parser.add_argument("--workdir", help="directory for logs; synthetic logs are cached here between runs")
+    parser.add_argument("--output", help="write the JSON report to this file")
+    parser.add_argument("--json", action="store_true", help="print only the JSON report")
+    parser.add_argument("--compare", help="baseline JSON report to compare against")
+    parser.add_argument("--threshold", type=float, default=0.1,
+                        help="relative change counted as a regression (default 0.1)")
+    args = parser.parse_args(argv)
+    if args.quick:
+        args.devices, args.duration, args.append_rows = 200, 3.0, 20000
+        args.log_rows, args.clients, args.requests = "10000", 8, 400
+    return args
+
+def main(argv=None):
+    args = parse_args(argv)
+    scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(scenarios) - set(SCENARIOS)
+    if unknown:
+        sys.exit(f"Unknown scenarios: {', '.join(sorted(unknown))}")
+
+    with contextlib.ExitStack() as stack:
+        workdir = args.workdir or stack.enter_context(tempfile.TemporaryDirectory(prefix="monitor-bench-"))
+        os.makedirs(workdir, exist_ok=True)
+        options = {
+            "workdir": workdir, "devices": args.devices, "interval": args.interval,
+            "duration": args.duration, "workers": args.workers, "probe_processes": args.probe_processes, "latency_ms": args.latency_ms,
+            "jitter_ms": args.jitter_ms, "failure_rate": args.failure_rate, "seed": args.seed,
+            "append_rows": args.append_rows, "clients": args.clients, "requests": args.requests,
+        }
+
+        results = {}
+        for name in scenarios:
+            if name == "serve":
+                results["serve"] = {}
+                for rows in (int(value) for value in args.log_rows.split(",") if value):
+                    log_file = synthetic_log(workdir, rows, min(args.devices, rows), args.seed)
+                    results["serve"][str(rows)] = run_isolated(
+                        "serve", dict(options, log_file=log_file, log_rows=rows))
+            else:
+                results[name] = run_isolated(name, options)
+
+    report = {
+        "version": 1,
+        "created": datetime.now().isoformat(timespec="seconds"),
+        "revision": git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "cpus": os.cpu_count(),
+        "options": {key: value for key, value in options.items() if key != "workdir"},
+        "results": results,
+    }
+
+    if args.json:
+        print(json.dumps(report, indent=2))
+    else:
+        print_summary(results)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as file:
+            json.dump(report, file, indent=2)
+
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as file:
+            baseline = json.load(file)
+        out = sys.stderr if args.json else sys.stdout
+        regressions = compare(report, baseline, args.threshold, out)
+        if regressions:
+            print(f"❌ {len(regressions)} metric(s) regressed by more than {args.threshold:.0%}", file=out)
+            return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
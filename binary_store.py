@@ -0,0 +1,494 @@
+#!/usr/bin/env python3
+"""
+Segmented binary result store
+An alternative to network_log.csv: fixed-width records in time-partitioned
+segment files, with device names and IPs interned into a dictionary
+
+Record layout (8 bytes, little-endian):
+    uint16  seconds since the segment's base time
+    uint32  device id << 1 | status bit (1 = UP)
+    uint16  RTT in units of 0.1 ms (0xFFFF = no reply)
+
+Active segments are read through mmap. Because records are fixed width,
+the sparse time index (one entry per INDEX_STRIDE records) is built by
+strided reads rather than a scan. Segments older than `compact_after` are
+zlib-compacted, and the oldest are removed past the size/age limits.
+"""
+
+import bisect
+import csv
+import io
+import json
+import mmap
+import os
+import struct
+import sys
+import threading
+import time
+import zlib
+from collections import OrderedDict
+from datetime import datetime
+
+MAGIC = b"NMS1"
+VERSION = 1
+HEADER = struct.Struct("<4sHHIIQ")     # magic, version, record size, base, count, first seq
+RECORD = struct.Struct("<HIH")
+INDEX_STRIDE = 1024
+NO_RTT = 0xFFFF
+MAX_SEGMENT_SECONDS = 0xFFFF
+ORDER_SLACK_SECONDS = 60
+# Compacted segments kept decompressed for repeated reads, least recently used dropped first
+CACHED_SEGMENTS = 4
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+EXPORT_HEADERS = ("Timestamp", "Device Name", "IP Address", "Status", "RTT (ms)")
+
+# ============================================================================
+# SEGMENTS
+# ============================================================================
+
+class Segment:
+    """
+    One segment file; raw (.bin, appendable, mmap-readable) or compacted (.binz)
+    """
+
+    def __init__(self, path, base, first_seq, count, compressed):
+        self.path = path
+        self.base = base
+        self.first_seq = first_seq
+        self.count = count
+        self.compressed = compressed
+        self.index = []
+
+    @classmethod
+    def open(cls, path):
+        with open(path, 'rb') as file:
+            magic, version, record_size, base, count, first_seq = HEADER.unpack(file.read(HEADER.size))
+            if magic != MAGIC or record_size != RECORD.size:
+                raise ValueError(f"Not a result segment: {path}")
+            compressed = path.endswith(".binz")
+            if not compressed:
+                file.seek(0, os.SEEK_END)
+                count = (file.tell() - HEADER.size) // RECORD.size
+        return cls(path, base, first_seq, count, compressed)
+
+    def data(self):
+        """
+        Record bytes for this segment: an mmap for raw segments, the
+        decompressed payload for compacted ones (not kept after the caller
+        drops it). Only whole records that have reached the file are included.
+        """
+        if self.compressed:
+            with open(self.path, 'rb') as file:
+                file.seek(HEADER.size)
+                return memoryview(zlib.decompress(file.read()))
+        with open(self.path, 'rb') as file:
+            available = (os.fstat(file.fileno()).st_size - HEADER.size) // RECORD.size
+            records = min(self.count, available)
+            if records <= 0:
+                return memoryview(b"")
+            mapped = mmap.mmap(file.fileno(), HEADER.size + records * RECORD.size, access=mmap.ACCESS_READ)
+        return memoryview(mapped)[HEADER.size:]
+
+    def build_index(self, data):
+        """
+        Extend the sparse time index: one timestamp every INDEX_STRIDE records
+        """
+        for position in range(len(self.index) * INDEX_STRIDE, len(data) // RECORD.size, INDEX_STRIDE):
+            self.index.append(self.base + RECORD.unpack_from(data, position * RECORD.size)[0])
+
+    def size_bytes(self):
+        return os.path.getsize(self.path)
+
+# ============================================================================
+# STORE
+# ============================================================================
+
+class BinaryStore:
+    """
+    Directory of segments plus a device dictionary
+
+    Implements the log writer sink interface (write/flush/fsync/close), so
+    it can replace the CSV file behind the group-commit writer. Cursors are
+    record sequence numbers: a cursor is the number of records before it.
+    """
+
+    def __init__(self, directory, segment_seconds=3600, max_segment_bytes=64 * 1024 * 1024,
+                 compact_after=86400, retention_seconds=90 * 86400, max_total_bytes=None,
+                 cached_segments=CACHED_SEGMENTS):
+        self.directory = directory
+        self.segment_seconds = min(segment_seconds, MAX_SEGMENT_SECONDS)
+        self.max_segment_bytes = max_segment_bytes
+        self.compact_after = compact_after
+        self.retention_seconds = retention_seconds
+        self.max_total_bytes = max_total_bytes
+        self.cached_segments = cached_segments
+
+        os.makedirs(directory, exist_ok=True)
+        self._lock = threading.RLock()
+        self._devices = []
+        self._device_ids = {}
+        self._devices_path = os.path.join(directory, "devices.jsonl")
+        self._load_devices()
+        self._devices_file = open(self._devices_path, 'a', encoding='utf-8')
+
+        self.segments = []
+        for name in sorted(os.listdir(directory)):
+            if name.startswith("seg-") and name.endswith((".bin", ".binz")):
+                self.segments.append(Segment.open(os.path.join(directory, name)))
+        self.segments.sort(key=lambda segment: segment.first_seq)
+
+        self._active = None
+        self._active_file = None
+        if self.segments and not self.segments[-1].compressed:
+            self._active = self.segments[-1]
+            self._active_file = open(self._active.path, 'ab')
+            # Drop a partial record left by a crash mid-write
+            self._active_file.truncate(HEADER.size + self._active.count * RECORD.size)
+
+        self._epoch_cache = (None, 0)
+        self._decompressed = OrderedDict()
+        self._decompressed_lock = threading.Lock()
+        self.bytes_written = 0
+        self.out_of_order = 0
+        self.last_modified = os.path.getmtime(directory)
+
+    # ------------------------------------------------------------------
+    # Device dictionary
+    # ------------------------------------------------------------------
+
+    def _load_devices(self):
+        if not os.path.exists(self._devices_path):
+            return
+        with open(self._devices_path, encoding='utf-8') as file:
+            for line in file:
+                if line.strip():
+                    entry = json.loads(line)
+                    self._intern(entry["name"], entry["ip"], persist=False)
+
+    def _intern(self, name, ip, persist=True):
+        key = (name, ip)
+        device_id = self._device_ids.get(key)
+        if device_id is None:
+            device_id = len(self._devices)
+            self._devices.append(key)
+            self._device_ids[key] = device_id
+            if persist:
+                self._devices_file.write(json.dumps({"id": device_id, "name": name, "ip": ip}) + "\n")
+                self._devices_file.flush()
+        return device_id
+
+    def devices(self):
+        return list(self._devices)
+
+    # ------------------------------------------------------------------
+    # Writing (log writer sink interface)
+    # ------------------------------------------------------------------
+
+    def _to_epoch(self, timestamp):
+        # Rows from one flush window usually share a timestamp
+        cached, epoch = self._epoch_cache
+        if timestamp != cached:
+            epoch = int(time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT)))
+            self._epoch_cache = (timestamp, epoch)
+        return epoch
+
+    def _next_seq(self):
+        if not self.segments:
+            return 0
+        last = self.segments[-1]
+        return last.first_seq + last.count
+
+    def _rotate(self, epoch):
+        # Start the segment a little before its first row, so rows from the
+        # same flush window with slightly older timestamps still fit
+        base = epoch - min(ORDER_SLACK_SECONDS, self.segment_seconds // 2)
+        if self._active_file is not None:
+            self._active_file.close()
+        path = os.path.join(self.directory, f"seg-{base:010d}-{self._next_seq():012d}.bin")
+        self._active = Segment(path, base, self._next_seq(), 0, False)
+        self._active_file = open(path, 'wb')
+        self._active_file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, base, 0, self._active.first_seq))
+        self.segments.append(self._active)
+        self.maintain()
+
+    def write(self, rows):
+        """
+        Append rows of [timestamp, device, ip, status(, rtt_ms)]; returns the
+        cursor just past each row. A row timestamped before the active
+        segment's base cannot be stored: it is counted in out_of_order and
+        its cursor is None, so the log writer leaves it out of the batch it
+        hands to listeners.
+        """
+        cursors = []
+        with self._lock:
+            chunks = []
+            for row in rows:
+                epoch = self._to_epoch(row[0])
+                active = self._active
+                if (active is None or epoch - active.base >= self.segment_seconds
+                        or (active.count + 1) * RECORD.size >= self.max_segment_bytes):
+                    if chunks:
+                        self._active_file.write(b"".join(chunks))
+                        self.bytes_written += len(chunks) * RECORD.size
+                        chunks = []
+                    self._rotate(epoch)
+                    active = self._active
+                if epoch < active.base:
+                    self.out_of_order += 1
+                    cursors.append(None)
+                    continue
+
+                device_id = self._intern(row[1], row[2])
+                status = 1 if row[3].upper() == "UP" else 0
+                rtt = NO_RTT
+                if len(row) > 4 and row[4] not in ("", None):
+                    rtt = min(round(float(row[4]) * 10), NO_RTT - 1)
+                chunks.append(RECORD.pack(epoch - active.base, device_id << 1 | status, rtt))
+                active.count += 1
+                cursors.append(active.first_seq + active.count)
+            if chunks:
+                self._active_file.write(b"".join(chunks))
+                self.bytes_written += len(chunks) * RECORD.size
+        return cursors
+
+    def flush(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.flush()
+            self.last_modified = time.time()
+
+    def fsync(self):
+        with self._lock:
+            if self._active_file is not None:
+                os.fsync(self._active_file.fileno())
+            os.fsync(self._devices_file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._active_file is not None:
+                self._active_file.close()
+                self._active_file = None
+            self._devices_file.close()
+
+    # ------------------------------------------------------------------
+    # Rotation, compaction and retention
+    # ------------------------------------------------------------------
+
+    def maintain(self, now=None):
+        """
+        Compact closed segments older than compact_after and drop the oldest
+        segments beyond the retention age or total size limit
+        """
+        now = now or time.time()
+        with self._lock:
+            for segment in self.segments:
+                if segment is self._active or segment.compressed:
+                    continue
+                if now - segment.base >= self.compact_after:
+                    self._compact(segment)
+
+            while len(self.segments) > 1:
+                oldest = self.segments[0]
+                too_old = now - self.segments[1].base > self.retention_seconds
+                too_big = (self.max_total_bytes is not None
+                           and sum(segment.size_bytes() for segment in self.segments) > self.max_total_bytes)
+                if not (too_old or too_big):
+                    break
+                os.remove(oldest.path)
+                self.segments.pop(0)
+                with self._decompressed_lock:
+                    self._decompressed.pop(oldest.path, None)
+
+    def _compact(self, segment):
+        payload = zlib.compress(bytes(segment.data()), 6)
+        path = segment.path + "z"
+        with open(path + ".tmp", 'wb') as file:
+            file.write(HEADER.pack(MAGIC, VERSION, RECORD.size, segment.base, segment.count, segment.first_seq))
+            file.write(payload)
+        os.replace(path + ".tmp", path)
+        os.remove(segment.path)
+        segment.path = path
+        segment.compressed = True
+
+    # ------------------------------------------------------------------
+    # Reading
+    # ------------------------------------------------------------------
+
+    def _data(self, segment):
+        """
+        segment.data(), keeping the last `cached_segments` compacted
+        segments read decompressed
+        """
+        if not segment.compressed:
+            return segment.data()
+        with self._decompressed_lock:
+            data = self._decompressed.get(segment.path)
+            if data is not None:
+                self._decompressed.move_to_end(segment.path)
+                return data
+        data = segment.data()
+        with self._decompressed_lock:
+            self._decompressed[segment.path] = data
+            while len(self._decompressed) > self.cached_segments:
+                self._decompressed.popitem(last=False)
+        return data
+
+    def _row(self, segment, record):
+        offset, packed, rtt = record
+        name, ip = self._devices[packed >> 1]
+        timestamp = datetime.fromtimestamp(segment.base + offset).strftime(TIMESTAMP_FORMAT)
+        row = [timestamp, name, ip, "UP" if packed & 1 else "DOWN"]
+        if rtt != NO_RTT:
+            row.append(f"{rtt / 10:.1f}")
+        return row
+
+    def _segment_records(self, segment, start=0, stop=None):
+        data = self._data(segment)
+        available = len(data) // RECORD.size
+        stop = available if stop is None else min(stop, available)
+        if start >= stop:
+            return iter(())
+        return RECORD.iter_unpack(data[start * RECORD.size:stop * RECORD.size])
+
+    def records_from(self, cursor, limit):
+        """
+        Up to `limit` rows at or after record sequence `cursor`, as
+        (cursor_after, row) pairs
+        """
+        results = []
+        with self._lock:
+            segments = list(self.segments)
+        position = bisect.bisect_right([segment.first_seq for segment in segments], cursor) - 1
+        for segment in segments[max(position, 0):]:
+            start = max(0, cursor - segment.first_seq)
+            for index, record in enumerate(self._segment_records(segment, start, start + limit - len(results))):
+                results.append((segment.first_seq + start + index + 1, self._row(segment, record)))
+            if len(results) >= limit:
+                break
+        return results
+
+    def tail_records(self, count):
+        """
+        The last `count` rows, oldest first, as (cursor_after, row) pairs
+        """
+        return self.records_from(max(0, self._next_seq() - count), count)
+
+    def total_records(self):
+        return self._next_seq()
+
+    def first_cursor(self):
+        """
+        Cursor of the oldest record retention has kept
+        """
+        with self._lock:
+            return self.segments[0].first_seq if self.segments else self._next_seq()
+
+    def query(self, start, end, devices=None):
+        """
+        Yield (epoch, name, ip, status_up, rtt_ms) for records with
+        start <= epoch < end, using segment bases and the sparse index to
+        skip straight to the first candidate record
+        """
+        with self._lock:
+            segments = list(self.segments)
+        wanted = None
+        if devices is not None:
+            wanted = {device_id for device_id, (name, _) in enumerate(self._devices) if name in devices}
+
+        for position, segment in enumerate(segments):
+            # A segment's last rows may be up to ORDER_SLACK_SECONDS past the next one's base
+            segment_end = (segments[position + 1].base + ORDER_SLACK_SECONDS
+                           if position + 1 < len(segments) else float("inf"))
+            if segment_end <= start or segment.base >= end:
+                continue
+            data = self._data(segment)
+            if not data:
+                continue
+            segment.build_index(data)
+            # Step back one stride so slightly out-of-order records are kept
+            first = max(0, bisect.bisect_left(segment.index, start) - 1) * INDEX_STRIDE
+            for offset, packed, rtt in RECORD.iter_unpack(data[first * RECORD.size:]):
+                epoch = segment.base + offset
+                if epoch >= end + ORDER_SLACK_SECONDS:
+                    break
+                if epoch < start or epoch >= end:
+                    continue
+                device_id = packed >> 1
+                if wanted is not None and device_id not in wanted:
+                    continue
+                name, ip = self._devices[device_id]
+                yield epoch, name, ip, bool(packed & 1), None if rtt == NO_RTT else rtt / 10
+
+    def iter_csv(self, start=0, end=2 ** 32, headers=EXPORT_HEADERS, chunk_rows=5000):
+        """
+        Yield CSV text for records in [start, end) in chunks of rows
+        """
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        writer.writerow(headers)
+        pending = 0
+        for epoch, name, ip, up, rtt in self.query(start, end):
+            writer.writerow([datetime.fromtimestamp(epoch).strftime(TIMESTAMP_FORMAT), name, ip,
+                             "UP" if up else "DOWN", "" if rtt is None else f"{rtt:.1f}"])
+            pending += 1
+            if pending >= chunk_rows:
+                yield buffer.getvalue()
+                buffer.seek(0)
+                buffer.truncate()
+                pending = 0
+        yield buffer.getvalue()
+
+    def export_csv(self, out, start=0, end=2 ** 32):
+        """
+        Write records in [start, end) to a text stream as CSV
+        """
+        for chunk in self.iter_csv(start, end):
+            out.write(chunk)
+
+    def disk_usage(self):
+        total = sum(segment.size_bytes() for segment in self.segments)
+        return total + os.path.getsize(self._devices_path) if os.path.exists(self._devices_path) else total
+
+# ============================================================================
+# CSV IMPORT / EXPORT
+# ============================================================================
+
+def import_csv(csv_path, store):
+    """
+    Load an existing network_log.csv into a binary store
+    """
+    batch = []
+    with open(csv_path, newline='') as file:
+        for row in csv.reader(file):
+            if len(row) < 4 or row[0] == "Timestamp":
+                continue
+            batch.append(row)
+            if len(batch) >= 10000:
+                store.write(batch)
+                batch = []
+    if batch:
+        store.write(batch)
+    store.flush()
+
+if __name__ == "__main__":
+    if len(sys.argv) < 3 or sys.argv[1] not in ("import", "export"):
+        print("Usage: binary_store.py import <log.csv> <store_dir>")
+        print("       binary_store.py export <store_dir> [out.csv]")
+        sys.exit(1)
+
+    if sys.argv[1] == "import":
+        store = BinaryStore(sys.argv[3])
+        import_csv(sys.argv[2], store)
+        print(f"✅ Imported {store.total_records()} records "
+              f"({os.path.getsize(sys.argv[2])} → {store.disk_usage()} bytes)")
+        store.close()
+    else:
+        store = BinaryStore(sys.argv[2])
+        if len(sys.argv) > 3:
+            with open(sys.argv[3], 'w', newline='') as out:
+                store.export_csv(out)
+        else:
+            buffer = io.StringIO()
+            store.export_csv(buffer)
+            sys.stdout.write(buffer.getvalue())
+        store.close()
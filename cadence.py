@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""
+Adaptive probe cadence
+Stable devices back off toward a multiple of their own interval, or an
+explicit maximum. A result that disagrees with the current state triggers
+an immediate burst of confirmation probes before the state changes, so one
+lost packet is not an outage. Devices that change state too often are
+marked flapping (with hysteresis) and kept at the minimum interval.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+
+ADAPTIVE = os.environ.get("MONITOR_ADAPTIVE", "off").lower() in ("1", "on", "true", "yes")
+
+# ============================================================================
+# POLICY
+# ============================================================================
+
+class CadencePolicy:
+    """
+    Tuning for adaptive cadence
+
+    min_interval     - interval after a state change and while flapping
+    max_interval     - ceiling in seconds for stable devices, overriding
+                       max_backoff (never below a device's own interval)
+    max_backoff      - ceiling as a multiple of each device's own interval;
+                       1 keeps devices at their interval
+    backoff          - interval multiplier after `stable_checks` agreeing checks
+    confirm_probes   - probes in a confirmation burst; a majority must agree
+    confirm_spacing  - seconds between confirmation probes
+    flap_window      - seconds of state changes considered for flapping
+    flap_enter       - changes within the window that start flapping
+    flap_exit        - flapping ends once the window holds this many or fewer
+    """
+
+    def __init__(self, min_interval=5.0, max_interval=None, max_backoff=4.0, backoff=1.5, stable_checks=3,
+                 confirm_probes=3, confirm_spacing=0.5, flap_window=600.0, flap_enter=4, flap_exit=1):
+        if not 0 < min_interval or (max_interval is not None and max_interval < min_interval):
+            raise ValueError("Need 0 < min_interval <= max_interval")
+        if max_backoff < 1:
+            raise ValueError("max_backoff must be at least 1")
+        if flap_exit >= flap_enter:
+            raise ValueError("flap_exit must be below flap_enter")
+        self.min_interval = min_interval
+        self.max_interval = max_interval
+        self.max_backoff = max_backoff
+        self.backoff = backoff
+        self.stable_checks = stable_checks
+        self.confirm_probes = confirm_probes
+        self.confirm_spacing = confirm_spacing
+        self.flap_window = flap_window
+        self.flap_enter = flap_enter
+        self.flap_exit = flap_exit
+
+    @classmethod
+    def from_environment(cls):
+        max_interval = os.environ.get("MONITOR_MAX_INTERVAL")
+        return cls(min_interval=float(os.environ.get("MONITOR_MIN_INTERVAL", "5")),
+                   max_interval=float(max_interval) if max_interval else None,
+                   max_backoff=float(os.environ.get("MONITOR_MAX_BACKOFF", "4")),
+                   confirm_probes=int(os.environ.get("MONITOR_CONFIRM_PROBES", "3")))
+
+# ============================================================================
+# PER-DEVICE CADENCE
+# ============================================================================
+
+class DeviceCadence:
+    __slots__ = ("base_interval", "interval", "reschedule", "is_up", "stable", "changes", "flapping")
+
+    def __init__(self, interval, reschedule):
+        self.base_interval = interval
+        self.interval = interval
+        self.reschedule = reschedule
+        self.is_up = None
+        self.stable = 0
+        self.changes = deque()
+        self.flapping = False
+
+class Decision:
+    """
+    Outcome of one adaptive check: the status to report, the result to log
+    (the confirmation burst when one ran), flapping flag and interval
+    """
+
+    __slots__ = ("is_up", "result", "flapping", "interval", "confirmed")
+
+    def __init__(self, is_up, result, flapping, interval, confirmed=None):
+        self.is_up = is_up
+        self.result = result
+        self.flapping = flapping
+        self.interval = interval
+        self.confirmed = confirmed
+
+class AdaptiveCadence:
+    """
+    Adaptive cadence for every registered device. burst(target, count,
+    spacing) runs a confirmation burst against whatever target observe()
+    was given (an address, or a service check) and returns a ProbeResult.
+    """
+
+    def __init__(self, policy, burst):
+        self.policy = policy
+        self.burst = burst
+        self._states = {}
+        self._lock = threading.Lock()
+        self.bursts = 0
+        self.unconfirmed = 0
+
+    def register(self, key, interval, reschedule):
+        """
+        Track a device scheduled every `interval` seconds; reschedule(interval)
+        moves its next check
+        """
+        with self._lock:
+            self._states[key] = DeviceCadence(interval, reschedule)
+
+    def forget(self, key):
+        with self._lock:
+            self._states.pop(key, None)
+
+    def _set_interval(self, state, interval):
+        if self.policy.max_interval is not None:
+            ceiling = max(self.policy.max_interval, state.base_interval)
+        else:
+            ceiling = state.base_interval * self.policy.max_backoff
+        interval = min(max(interval, self.policy.min_interval), ceiling)
+        if interval != state.interval:
+            state.interval = interval
+            state.reschedule(interval)
+
+    def observe(self, key, target, result, now=None):
+        """
+        Apply one scheduled check result and decide what to report
+        """
+        state = self._states.get(key)
+        if state is None:
+            return Decision(result.is_up, result, False, None)
+        now = time.time() if now is None else now
+        policy = self.policy
+
+        if state.is_up is None:
+            state.is_up = result.is_up
+            return Decision(state.is_up, result, False, state.interval)
+
+        confirmed = None
+        if result.is_up != state.is_up:
+            # Disagreement: confirm with a burst before changing state
+            self.bursts += 1
+            result = self.burst(target, policy.confirm_probes, policy.confirm_spacing)
+            answered_up = len(result.samples) * 2 > result.sent
+            confirmed = answered_up != state.is_up
+            if confirmed:
+                state.is_up = answered_up
+                state.changes.append(now)
+                state.stable = 0
+            else:
+                self.unconfirmed += 1
+                state.stable = 0
+
+        # Flapping, with a lower exit threshold than entry
+        while state.changes and state.changes[0] < now - policy.flap_window:
+            state.changes.popleft()
+        if not state.flapping and len(state.changes) >= policy.flap_enter:
+            state.flapping = True
+        elif state.flapping and len(state.changes) <= policy.flap_exit:
+            state.flapping = False
+
+        if confirmed or state.flapping:
+            state.stable = 0
+            self._set_interval(state, policy.min_interval)
+        elif confirmed is None:
+            state.stable += 1
+            if state.stable >= policy.stable_checks:
+                state.stable = 0
+                self._set_interval(state, state.interval * policy.backoff)
+        return Decision(state.is_up, result, state.flapping, state.interval, confirmed)
+
+    def stats(self):
+        with self._lock:
+            states = list(self._states.values())
+        return {
+            "devices": len(states),
+            "flapping": sum(1 for state in states if state.flapping),
+            "mean_interval": sum(state.interval for state in states) / len(states) if states else None,
+            "bursts": self.bursts,
+            "unconfirmed": self.unconfirmed,
+        }
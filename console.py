@@ -0,0 +1,188 @@
+#!/usr/bin/env python3
+"""
+Non-blocking console output
+Messages are queued for a single writer thread, so a slow terminal or a
+journald pipe never stalls a probe. Per-probe result lines are rate
+limited, and anything that cannot be queued is counted and reported.
+
+MONITOR_CONSOLE_FORMAT     human (default) or json (one object per line)
+MONITOR_CONSOLE_VERBOSITY  all (default), changes (state changes and
+                           warnings only) or quiet (warnings only)
+MONITOR_CONSOLE_RATE       result lines per second, 0 for no limit
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+from datetime import datetime
+
+FORMAT = os.environ.get("MONITOR_CONSOLE_FORMAT", "human").lower()
+VERBOSITY = os.environ.get("MONITOR_CONSOLE_VERBOSITY", "all").lower()
+RATE = float(os.environ.get("MONITOR_CONSOLE_RATE", "100"))
+
+QUEUE_SIZE = 10000
+MAX_BATCH = 1000
+REPORT_SECONDS = 10
+
+class TokenBucket:
+    """
+    Allows `rate` events per second on average, in bursts of up to `burst`
+    """
+
+    def __init__(self, rate, burst=None):
+        self.rate = rate
+        self.burst = burst if burst is not None else max(1.0, rate)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            now = time.monotonic()
+            self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+            self.updated = now
+            if self.tokens < 1:
+                return False
+            self.tokens -= 1
+            return True
+
+class Console:
+    """
+    Queue of console messages drained by one writer thread, started on
+    first use. emit() never blocks: a message is written, suppressed by the
+    verbosity, dropped by the rate limit, or dropped because the queue is full.
+    """
+
+    def __init__(self, stream=None, format=FORMAT, verbosity=VERBOSITY, rate=RATE, max_queue=QUEUE_SIZE):
+        if format not in ("human", "json"):
+            raise ValueError(f"Unknown console format: {format}")
+        if verbosity not in ("all", "changes", "quiet"):
+            raise ValueError(f"Unknown console verbosity: {verbosity}")
+        # None writes to whatever sys.stdout is at the time
+        self.stream = stream
+        self.format = format
+        self.verbosity = verbosity
+        self.bucket = TokenBucket(rate) if rate > 0 else None
+        self._queue = queue.Queue(maxsize=max_queue)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = False
+        self.written = 0
+        self.suppressed = 0
+        self.rate_limited = 0
+        self.queue_full = 0
+        self.write_errors = 0
+
+    def emit(self, event, message, level="info", limited=False, **fields):
+        """
+        Queue one message. `limited` marks high-volume lines (one per probe)
+        that are shown only at full verbosity and are subject to the rate
+        limit; extra fields appear in JSON output. Returns True if queued.
+        """
+        if level != "warning" and (self.verbosity == "quiet" or (limited and self.verbosity != "all")):
+            self.suppressed += 1
+            return False
+        if limited and self.bucket is not None and not self.bucket.allow():
+            self.rate_limited += 1
+            return False
+        self._start()
+        try:
+            self._queue.put_nowait((time.time(), event, level, message, fields))
+        except queue.Full:
+            self.queue_full += 1
+            return False
+        return True
+
+    def warning(self, message, event="warning", **fields):
+        return self.emit(event, message, level="warning", **fields)
+
+    def dropped(self):
+        return self.rate_limited + self.queue_full
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None and not self._stopping:
+                self._thread = threading.Thread(target=self._run, name="console-writer", daemon=True)
+                self._thread.start()
+
+    def _format(self, record):
+        created, event, level, message, fields = record
+        if self.format == "human":
+            return message
+        document = {"time": datetime.fromtimestamp(created).isoformat(timespec="milliseconds"),
+                    "event": event, "level": level}
+        document.update(fields)
+        document["message"] = message
+        return json.dumps(document, ensure_ascii=False, default=str)
+
+    def _run(self):
+        reported = 0
+        last_report = time.monotonic()
+        while True:
+            try:
+                batch = [self._queue.get(timeout=1.0)]
+            except queue.Empty:
+                batch = []
+            while batch and len(batch) < MAX_BATCH:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            # None is the wake-up sent by close()
+            batch = [record for record in batch if record is not None]
+
+            if time.monotonic() - last_report >= REPORT_SECONDS and self.dropped() > reported:
+                dropped = self.dropped()
+                batch.append((time.time(), "console_dropped", "warning",
+                              f"⚠️  Console: dropped {dropped - reported} messages "
+                              f"({self.rate_limited} rate limited, {self.queue_full} queue full in total)",
+                              {"dropped": dropped - reported, "rate_limited_total": self.rate_limited,
+                               "queue_full_total": self.queue_full}))
+                reported = dropped
+                last_report = time.monotonic()
+            if batch:
+                self._write(batch)
+            if self._stopping and self._queue.empty():
+                return
+
+    def _write(self, batch):
+        stream = self.stream or sys.stdout
+        try:
+            stream.write("\n".join(self._format(record) for record in batch) + "\n")
+            stream.flush()
+            self.written += len(batch)
+        except (OSError, ValueError):
+            # Closed or broken stream; the messages are lost but probing goes on
+            self.write_errors += 1
+
+    def close(self, timeout=2.0):
+        """
+        Write what is queued, waiting at most `timeout` seconds
+        """
+        self._stopping = True
+        if self._thread is not None:
+            try:
+                self._queue.put_nowait(None)
+            except queue.Full:
+                pass  # the writer is busy and will see _stopping when the queue drains
+            self._thread.join(timeout)
+
+    def stats(self):
+        return {"written": self.written, "suppressed": self.suppressed, "rate_limited": self.rate_limited,
+                "queue_full": self.queue_full, "write_errors": self.write_errors,
+                "queued": self._queue.qsize()}
+
+CONSOLE = Console()
+atexit.register(CONSOLE.close)
+
+def emit(event, message, level="info", limited=False, **fields):
+    return CONSOLE.emit(event, message, level, limited, **fields)
+
+def warning(message, event="warning", **fields):
+    return CONSOLE.warning(message, event, **fields)
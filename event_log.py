@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+Transition-only event log
+Instead of one row per probe, each device gets a row when its status
+changes and a heartbeat checkpoint every HEARTBEAT_SECONDS while it holds.
+Rows carry run lengths (samples since the status last changed), so the
+sample history can still be summarized as runs and outage timelines come
+straight from the CHANGE rows.
+"""
+
+import os
+import threading
+import time
+from collections import deque
+from datetime import datetime
+
+EVENT_HEADERS = ["Timestamp", "Device Name", "IP Address", "Status", "Event",
+                 "Previous Status", "Previous Run Samples", "Run Samples", "Mean RTT (ms)"]
+
+EVENT_START = "START"
+EVENT_CHANGE = "CHANGE"
+EVENT_HEARTBEAT = "HEARTBEAT"
+
+HEARTBEAT_SECONDS = float(os.environ.get("MONITOR_HEARTBEAT_SECONDS", "3600"))
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+
+def _epoch(timestamp):
+    try:
+        return datetime.strptime(timestamp, TIMESTAMP_FORMAT).timestamp()
+    except (TypeError, ValueError):
+        return None
+
+def _optional_int(value):
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return None
+
+def event_state_values(row):
+    """
+    (rtt, loss_percent, jitter, failures) to restore live state from an
+    event row: the mean RTT since the previous row, no loss or jitter, and
+    the run length of a DOWN status as its consecutive failures, so
+    heartbeats are not counted as failed probes
+    """
+    try:
+        rtt = float(row[8]) / 1000 if len(row) > 8 and row[8] else None
+    except ValueError:
+        rtt = None
+    samples = _optional_int(row[7]) if len(row) > 7 else None
+    return rtt, None, None, (samples if row[3].upper() == "DOWN" else 0)
+
+# ============================================================================
+# RUNS
+# ============================================================================
+
+class Run:
+    """
+    Current status run of one device, and RTTs since its last logged row
+    """
+
+    __slots__ = ("ip", "status", "samples", "checkpoint", "rtt_total", "rtt_count")
+
+    def __init__(self, ip, status, samples, checkpoint):
+        self.ip = ip
+        self.status = status
+        self.samples = samples
+        self.checkpoint = checkpoint
+        self.rtt_total = 0.0
+        self.rtt_count = 0
+
+    def mean_rtt_ms(self):
+        if not self.rtt_count:
+            return ""
+        return f"{self.rtt_total / self.rtt_count * 1000:.3f}"
+
+class TransitionLog:
+    """
+    Turns a stream of probe results into START / CHANGE / HEARTBEAT rows,
+    handed to append(row), and keeps the most recent changes in memory
+    """
+
+    def __init__(self, append, heartbeat_seconds=HEARTBEAT_SECONDS, recent=1000):
+        self._append = append
+        self.heartbeat_seconds = heartbeat_seconds
+        self._runs = {}
+        self._recent = deque(maxlen=recent)
+        self._lock = threading.Lock()
+        self.loaded = False
+        self.samples_seen = 0
+        self.rows_logged = 0
+        # Bumped for every status change added to the recent list
+        self.version = 0
+
+    def record(self, device, ip, timestamp, status, rtt=None, now=None):
+        """
+        Apply one probe result (rtt in seconds); logs a row only on a status
+        change or when the device's heartbeat is due
+        """
+        now = time.time() if now is None else now
+        with self._lock:
+            self.samples_seen += 1
+            run = self._runs.get(device)
+            if run is None:
+                run = self._runs[device] = Run(ip, status, 1, now)
+                row = [timestamp, device, ip, status, EVENT_START, "", "", 1, ""]
+            elif run.status != status:
+                row = [timestamp, device, ip, status, EVENT_CHANGE, run.status, run.samples, 1, run.mean_rtt_ms()]
+                self._recent.append(self._change(row))
+                self.version += 1
+                run.status = status
+                run.samples = 1
+                run.checkpoint = now
+                run.rtt_total = 0.0
+                run.rtt_count = 0
+            else:
+                run.samples += 1
+                if rtt is not None:
+                    run.rtt_total += rtt
+                    run.rtt_count += 1
+                if now - run.checkpoint < self.heartbeat_seconds and ip == run.ip:
+                    return None
+                row = [timestamp, device, ip, status, EVENT_HEARTBEAT, "", "", run.samples, run.mean_rtt_ms()]
+                run.checkpoint = now
+                run.rtt_total = 0.0
+                run.rtt_count = 0
+            run.ip = ip
+            if rtt is not None and run.samples == 1:
+                run.rtt_total, run.rtt_count = rtt, 1
+            self.rows_logged += 1
+        self._append(row)
+        return row
+
+    @staticmethod
+    def _change(row):
+        return {"timestamp": row[0], "device": row[1], "ip": row[2], "status": row[3],
+                "previous": row[5], "previous_run_samples": _optional_int(row[6])}
+
+    def forget(self, device):
+        """
+        Drop a device that is no longer monitored
+        """
+        with self._lock:
+            return self._runs.pop(device, None) is not None
+
+    def load(self, tail_reader, max_rows=100000):
+        """
+        Replay the end of the event log once, so runs continue across a
+        restart instead of starting over
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        with self._lock:
+            for _, row in tail_reader(max_rows):
+                if len(row) < len(EVENT_HEADERS):
+                    continue
+                timestamp, device, ip, status, event = row[:5]
+                samples = _optional_int(row[7]) or 1
+                self._runs[device] = Run(ip, status, samples, _epoch(timestamp) or time.time())
+                if event == EVENT_CHANGE:
+                    self._recent.append(self._change(row))
+                    self.version += 1
+
+    def recent(self, devices=None, limit=100):
+        """
+        Most recent status changes, newest first, optionally for some devices
+        """
+        with self._lock:
+            changes = list(self._recent)
+        changes.reverse()
+        if devices:
+            wanted = set(devices)
+            changes = [change for change in changes if change["device"] in wanted]
+        return changes[:limit]
+
+    def stats(self):
+        with self._lock:
+            return {
+                "devices": len(self._runs),
+                "samples_seen": self.samples_seen,
+                "rows_logged": self.rows_logged,
+            }
+
+# ============================================================================
+# RECONSTRUCTION
+# ============================================================================
+
+def read_runs(rows, devices=None):
+    """
+    Status runs from event log rows, oldest first, as dicts with device, ip,
+    status, start, end (None while ongoing), samples and duration_seconds.
+    A run whose start precedes the log begins at its first row.
+    """
+    wanted = set(devices) if devices else None
+    open_runs = {}
+    runs = []
+
+    def close(run, end, samples):
+        run["end"] = end
+        run["samples"] = samples
+        start, finish = _epoch(run["start"]), _epoch(end)
+        run["duration_seconds"] = finish - start if start is not None and finish is not None else None
+        runs.append(run)
+
+    for row in rows:
+        if len(row) < len(EVENT_HEADERS) or row[0] == EVENT_HEADERS[0]:
+            continue
+        timestamp, device, ip, status, event = row[:5]
+        if wanted is not None and device not in wanted:
+            continue
+        run = open_runs.get(device)
+        if event == EVENT_CHANGE:
+            if run is not None:
+                close(run, timestamp, _optional_int(row[6]) or run["samples"])
+            run = None
+        elif event == EVENT_HEARTBEAT and run is not None and run["status"] == status:
+            run["samples"] = _optional_int(row[7]) or run["samples"]
+            continue
+        elif run is not None:
+            # START after a restart without history, or a heartbeat disagreeing with it
+            close(run, timestamp, run["samples"])
+            run = None
+        open_runs[device] = {"device": device, "ip": ip, "status": status, "start": timestamp,
+                             "samples": _optional_int(row[7]) or 1}
+
+    now = datetime.now().strftime(TIMESTAMP_FORMAT)
+    for run in open_runs.values():
+        close(run, now, run["samples"])
+        run["end"] = None
+    runs.sort(key=lambda run: run["start"])
+    return runs
+
+def outages(runs):
+    """
+    DOWN runs only, for outage timelines
+    """
+    return [run for run in runs if run["status"] == "DOWN"]
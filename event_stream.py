@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Server-Sent Events fan-out
+Each event is encoded once and copied to every subscriber's queue, so one
+probe result costs the same no matter how many dashboards are open
+"""
+
+import json
+import queue
+import threading
+
+KEEPALIVE_SECONDS = 15
+
+# ============================================================================
+# SUBSCRIBERS
+# ============================================================================
+
+class Subscriber:
+    """
+    One connected client; dropped if it falls too far behind
+    """
+
+    def __init__(self, max_queue):
+        self.queue = queue.Queue(maxsize=max_queue)
+        self.closed = False
+
+class Broadcaster:
+    """
+    Shared publish/subscribe hub for SSE clients
+    """
+
+    def __init__(self, max_queue=256):
+        self.max_queue = max_queue
+        self._subscribers = set()
+        self._lock = threading.Lock()
+        self.events_published = 0
+        self.subscribers_dropped = 0
+
+    def subscribe(self):
+        subscriber = Subscriber(self.max_queue)
+        with self._lock:
+            self._subscribers.add(subscriber)
+        return subscriber
+
+    def unsubscribe(self, subscriber):
+        with self._lock:
+            self._subscribers.discard(subscriber)
+
+    def subscriber_count(self):
+        return len(self._subscribers)
+
+    def publish(self, event, data):
+        """
+        Send an event to every subscriber. A subscriber whose queue is full is
+        disconnected rather than allowed to block the publisher; the browser's
+        EventSource reconnects on its own.
+        """
+        if not self._subscribers:
+            return
+        message = f"event: {event}\ndata: {json.dumps(data)}\n\n"
+        with self._lock:
+            subscribers = list(self._subscribers)
+        for subscriber in subscribers:
+            try:
+                subscriber.queue.put_nowait(message)
+            except queue.Full:
+                subscriber.closed = True
+                self.unsubscribe(subscriber)
+                self.subscribers_dropped += 1
+        self.events_published += 1
+
+    def stream(self, subscriber):
+        """
+        Generator of SSE frames for one subscriber, with keepalive comments
+        """
+        try:
+            yield "retry: 2000\n\n"
+            while not subscriber.closed:
+                try:
+                    yield subscriber.queue.get(timeout=KEEPALIVE_SECONDS)
+                except queue.Empty:
+                    yield ": keepalive\n\n"
+        finally:
+            self.unsubscribe(subscriber)
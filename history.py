@@ -0,0 +1,304 @@
+#!/usr/bin/env python3
+"""
+Historical query engine
+Keeps the probe log as columnar NumPy arrays and answers downsampled
+time-bucket queries (uptime ratio, probe count, RTT min/avg/max) with
+batched array operations instead of per-row loops
+"""
+
+import csv
+import threading
+import time
+from collections import OrderedDict
+
+import numpy as np
+
+import console
+from binary_store import NO_RTT, RECORD
+
+TIMESTAMP_FORMAT = '%Y-%m-%d %H:%M:%S'
+MAX_BUCKETS = 20000
+CACHE_SIZE = 128
+MAX_CHUNKS = 32
+
+# Matches binary_store.RECORD ("<HIH")
+RECORD_DTYPE = np.dtype([('offset', '<u2'), ('packed', '<u4'), ('rtt', '<u2')])
+assert RECORD_DTYPE.itemsize == RECORD.size
+
+# ============================================================================
+# COLUMNAR INDEX
+# ============================================================================
+
+class HistoryIndex:
+    """
+    Columnar copy of the log: epoch seconds, device id, up flag and RTT (ms,
+    NaN when there was no reply)
+
+    Data is held as a list of chunks, each sorted by time. New rows become
+    small chunks; the list is merged into one when it grows past MAX_CHUNKS,
+    so appends never re-sort the whole history.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._names = []
+        self._ids = {}
+        # Devices no longer monitored, left out of device_names() until they
+        # log again; their rows stay queryable by name
+        self._forgotten = set()
+        self._chunks = []
+        self._pending = ([], [], [], [])
+        self._cache = OrderedDict()
+        self._epoch_cache = (None, 0)
+        self.state = "empty"
+        self.error = None
+
+    # ------------------------------------------------------------------
+    # Loading
+    # ------------------------------------------------------------------
+
+    def start_loading(self, loader):
+        """
+        Run loader(self) on a background thread; queries wait for it
+        """
+        with self._lock:
+            if self.state != "empty":
+                return
+            self.state = "loading"
+
+        def run():
+            try:
+                loader(self)
+                self.state = "ready"
+            except Exception as e:
+                self.error = str(e)
+                self.state = "failed"
+                console.warning(f"⚠️  History load failed: {e}", "history_error")
+
+        threading.Thread(target=run, name="history-load", daemon=True).start()
+
+    def _device_id(self, name):
+        device_id = self._ids.get(name)
+        if device_id is None:
+            device_id = len(self._names)
+            self._names.append(name)
+            self._ids[name] = device_id
+        return device_id
+
+    def _to_epoch(self, timestamp):
+        cached, epoch = self._epoch_cache
+        if timestamp != cached:
+            epoch = int(time.mktime(time.strptime(timestamp, TIMESTAMP_FORMAT)))
+            self._epoch_cache = (timestamp, epoch)
+        return epoch
+
+    def _rows_to_chunk(self, rows):
+        epochs, devices, ups, rtts = [], [], [], []
+        for row in rows:
+            if len(row) < 4 or row[0] == "Timestamp":
+                continue
+            try:
+                epoch = self._to_epoch(row[0])
+            except ValueError:
+                continue
+            epochs.append(epoch)
+            devices.append(self._device_id(row[1]))
+            ups.append(row[3].upper() == "UP")
+            rtts.append(float(row[4]) if len(row) > 4 and row[4] else np.nan)
+        return (np.array(epochs, dtype=np.uint32), np.array(devices, dtype=np.int32),
+                np.array(ups, dtype=bool), np.array(rtts, dtype=np.float32))
+
+    def load_csv(self, path, end_offset=None, chunk_rows=500000):
+        """
+        Load a CSV log up to byte offset `end_offset` (the rest arrives
+        through append_rows)
+        """
+        with open(path, newline='', encoding='utf-8', errors='replace') as file:
+            rows = []
+            position = 0
+            for line in file:
+                position += len(line.encode('utf-8'))
+                if end_offset is not None and position > end_offset:
+                    break
+                rows.append(line)
+                if len(rows) >= chunk_rows:
+                    self._add_rows(csv.reader(rows))
+                    rows = []
+            if rows:
+                self._add_rows(csv.reader(rows))
+
+    def load_binary(self, store, end_seq=None):
+        """
+        Load a binary store up to record sequence `end_seq`, decoding each
+        segment's fixed-width records directly into arrays
+        """
+        names = [name for name, _ in store.devices()]
+        with self._lock:
+            mapping = np.array([self._device_id(name) for name in names] or [0], dtype=np.int32)
+        for segment in list(store.segments):
+            if end_seq is not None and segment.first_seq >= end_seq:
+                break
+            data = segment.data()
+            count = len(data) // RECORD.size
+            if end_seq is not None:
+                count = min(count, end_seq - segment.first_seq)
+            records = np.frombuffer(data, dtype=RECORD_DTYPE, count=count)
+            rtt = records['rtt'].astype(np.float32) / 10
+            rtt[records['rtt'] == NO_RTT] = np.nan
+            self._add_chunk((
+                (records['offset'].astype(np.uint32) + segment.base).astype(np.uint32),
+                mapping[records['packed'] >> 1],
+                (records['packed'] & 1).astype(bool),
+                rtt,
+            ))
+
+    def _add_rows(self, rows):
+        with self._lock:
+            chunk = self._rows_to_chunk(rows)
+        self._add_chunk(chunk)
+
+    def _add_chunk(self, chunk):
+        if len(chunk[0]) == 0:
+            return
+        order = np.argsort(chunk[0], kind='stable')
+        chunk = tuple(column[order] for column in chunk)
+        with self._lock:
+            self._chunks.append(chunk)
+            self._invalidate(int(chunk[0][0]))
+
+    def append_rows(self, rows, cursors=None):
+        """
+        Log writer listener: add newly written rows
+        """
+        with self._lock:
+            chunk = self._rows_to_chunk(rows)
+            if len(chunk[0]) == 0:
+                return
+            if self._forgotten:
+                self._forgotten.difference_update(row[1] for row in rows)
+            for column, values in zip(self._pending, chunk):
+                column.append(values)
+            self._invalidate(int(chunk[0].min()))
+
+    def _consolidate(self):
+        """
+        Turn pending appends into a sorted chunk and merge chunks when there
+        are too many; returns the chunk list
+        """
+        if self._pending[0]:
+            pending = tuple(np.concatenate(column) for column in self._pending)
+            self._pending = ([], [], [], [])
+            order = np.argsort(pending[0], kind='stable')
+            self._chunks.append(tuple(column[order] for column in pending))
+        if len(self._chunks) > MAX_CHUNKS:
+            columns = tuple(np.concatenate([chunk[i] for chunk in self._chunks]) for i in range(4))
+            order = np.argsort(columns[0], kind='stable')
+            self._chunks = [tuple(column[order] for column in columns)]
+        return list(self._chunks)
+
+    def _invalidate(self, earliest_epoch):
+        # Drop cached results whose range includes the new data
+        for key in [key for key in self._cache if key[2] > earliest_epoch]:
+            del self._cache[key]
+
+    def __len__(self):
+        with self._lock:
+            return sum(len(chunk[0]) for chunk in self._consolidate())
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, devices, start, end, bucket):
+        """
+        Downsample [start, end) into `bucket`-second buckets for each device
+        """
+        if bucket <= 0 or end <= start:
+            raise ValueError("bucket must be positive and end after start")
+        buckets = -(-(end - start) // bucket)
+        if buckets > MAX_BUCKETS:
+            raise ValueError(f"Too many buckets ({buckets}); use a larger bucket size")
+
+        key = (tuple(devices), start, end, bucket)
+        with self._lock:
+            cached = self._cache.get(key)
+            if cached is not None:
+                self._cache.move_to_end(key)
+                return cached
+            chunks = self._consolidate()
+            names = [name for name in devices if name in self._ids]
+            ids = [self._ids[name] for name in names]
+            lookup = np.full(max(len(self._names), 1), -1, dtype=np.int64)
+
+        # Each chunk is time-sorted, so its part of the range is two binary searches
+        parts = []
+        for chunk in chunks:
+            first, last = np.searchsorted(chunk[0], [start, end])
+            if last > first:
+                parts.append(tuple(column[first:last] for column in chunk))
+        if not parts:
+            parts = [tuple(column[:0] for column in chunks[0])] if chunks else [
+                (np.empty(0, np.uint32), np.empty(0, np.int32), np.empty(0, bool), np.empty(0, np.float32))]
+        epochs, device_ids, ups, rtts = (np.concatenate([part[i] for part in parts]) for i in range(4))
+
+        lookup[ids] = np.arange(len(ids))
+        local = lookup[device_ids]
+        keep = local >= 0
+        local, ups, rtts = local[keep], ups[keep], rtts[keep]
+        slots = local * buckets + (epochs[keep].astype(np.int64) - start) // bucket
+
+        size = len(ids) * buckets
+        count = np.bincount(slots, minlength=size)
+        up = np.bincount(slots, weights=ups, minlength=size)
+        has_rtt = ~np.isnan(rtts)
+        rtt_count = np.bincount(slots[has_rtt], minlength=size)
+        rtt_sum = np.bincount(slots[has_rtt], weights=rtts[has_rtt], minlength=size)
+        rtt_min = np.full(size, np.inf)
+        rtt_max = np.full(size, -np.inf)
+        np.minimum.at(rtt_min, slots[has_rtt], rtts[has_rtt])
+        np.maximum.at(rtt_max, slots[has_rtt], rtts[has_rtt])
+
+        with np.errstate(invalid='ignore', divide='ignore'):
+            uptime = np.where(count > 0, up / count, np.nan)
+            rtt_avg = np.where(rtt_count > 0, rtt_sum / rtt_count, np.nan)
+        rtt_min[rtt_count == 0] = np.nan
+        rtt_max[rtt_count == 0] = np.nan
+
+        def values(array, index):
+            row = array[index * buckets:(index + 1) * buckets]
+            return [None if np.isnan(value) else round(float(value), 4) for value in row]
+
+        series = {}
+        for index, name in enumerate(names):
+            series[name] = {
+                "count": count[index * buckets:(index + 1) * buckets].tolist(),
+                "uptime": values(uptime, index),
+                "rtt_min": values(rtt_min, index),
+                "rtt_avg": values(rtt_avg, index),
+                "rtt_max": values(rtt_max, index),
+            }
+        result = {
+            "start": start,
+            "end": end,
+            "bucket": bucket,
+            "timestamps": list(range(start, start + buckets * bucket, bucket)),
+            "series": series,
+        }
+
+        with self._lock:
+            self._cache[key] = result
+            while len(self._cache) > CACHE_SIZE:
+                self._cache.popitem(last=False)
+        return result
+
+    def forget(self, name):
+        """
+        Leave a device that is no longer monitored out of device_names()
+        """
+        with self._lock:
+            if name in self._ids:
+                self._forgotten.add(name)
+
+    def device_names(self):
+        with self._lock:
+            return [name for name in self._names if name not in self._forgotten]
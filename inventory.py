@@ -0,0 +1,220 @@
+#!/usr/bin/env python3
+"""
+Device inventory
+Loads monitored targets from a JSON, YAML or CSV file, expanding CIDR
+ranges and applying group and per-device intervals and checks, and watches the file
+so edits are applied as a diff: only added, removed or changed targets are
+rescheduled
+"""
+
+import csv
+import ipaddress
+import json
+import os
+import threading
+
+import console
+from service_probe import parse_check
+
+DEFAULT_INTERVAL = 30
+MAX_EXPANSION = 65536
+RELOAD_SECONDS = 2.0
+
+# ============================================================================
+# TARGETS
+# ============================================================================
+
+class Target:
+    """
+    One monitored address; check is a service_probe.CheckSpec, or None to ping
+    """
+
+    __slots__ = ("name", "ip", "interval", "group", "check")
+
+    def __init__(self, name, ip, interval=DEFAULT_INTERVAL, group=None, check=None):
+        self.name = name
+        self.ip = ip
+        self.interval = interval
+        self.group = group
+        self.check = check
+
+    def __eq__(self, other):
+        return (isinstance(other, Target) and self.name == other.name and self.ip == other.ip
+                and self.interval == other.interval and self.group == other.group and self.check == other.check)
+
+    def __repr__(self):
+        return f"Target({self.name!r}, {self.ip!r}, {self.interval}, {self.group!r}, {self.check!r})"
+
+def expand(entry, interval, group, check=None):
+    """
+    Targets for one inventory entry: {"name", "ip" | "cidr", "interval", "group",
+    "check", "expect", "timeout", "verify"}
+    A CIDR range yields one target per host, named "<name> <ip>"
+    """
+    interval = float(entry.get("interval", interval))
+    if interval <= 0:
+        raise ValueError(f"Interval must be positive: {entry}")
+    group = entry.get("group", group)
+    address = entry.get("cidr") or entry.get("ip") or entry.get("address")
+    if not address:
+        raise ValueError(f"Inventory entry needs an ip or cidr: {entry}")
+    address = str(address).strip()
+    name = entry.get("name")
+    check = entry.get("check", check)
+
+    def target(target_name, ip):
+        return Target(target_name, ip, interval, group, parse_check(
+            check, ip, entry.get("expect"), entry.get("timeout"), entry.get("verify")))
+
+    if "/" not in address:
+        return [target(name or address, address)]
+
+    network = ipaddress.ip_network(address, strict=False)
+    if network.num_addresses > MAX_EXPANSION:
+        raise ValueError(f"{address} expands to more than {MAX_EXPANSION} targets")
+    hosts = list(network.hosts()) or [network.network_address]
+    return [target(f"{name} {host}" if name else str(host), str(host)) for host in hosts]
+
+def parse_inventory(document):
+    """
+    Targets from a parsed JSON/YAML document:
+
+        {"interval": 30,
+         "groups": {"core": {"interval": 10, "devices": [{"name": "Router", "ip": "10.0.0.1"}]},
+                    "web": {"check": "https", "devices": [{"name": "Portal", "ip": "10.0.0.80"}]}},
+         "devices": [{"name": "Lab", "cidr": "10.1.0.0/28", "interval": 60, "check": "tcp:22"}]}
+
+    A bare list is treated as "devices". Later duplicates of a name are ignored.
+    """
+    if isinstance(document, list):
+        document = {"devices": document}
+    default_interval = float(document.get("interval", DEFAULT_INTERVAL))
+
+    targets = []
+    for group, settings in (document.get("groups") or {}).items():
+        settings = settings or {}
+        group_interval = settings.get("interval", default_interval)
+        for entry in settings.get("devices") or []:
+            targets.extend(expand(entry, group_interval, group, settings.get("check")))
+    for entry in document.get("devices") or []:
+        targets.extend(expand(entry, default_interval, None))
+    return unique(targets)
+
+def parse_csv(lines):
+    """
+    Targets from CSV with a header row: name, address (IP or CIDR),
+    and optional interval, group, check, expect, timeout and verify columns
+    """
+    targets = []
+    for row in csv.DictReader(lines):
+        row = {key.strip().lower(): (value or "").strip() for key, value in row.items() if key}
+        entry = {key: value for key, value in row.items() if value}
+        targets.extend(expand(entry, DEFAULT_INTERVAL, None))
+    return unique(targets)
+
+def unique(targets):
+    seen = {}
+    for target in targets:
+        if target.name in seen:
+            console.warning(f"⚠️  Duplicate inventory entry ignored: {target.name}", "inventory_duplicate",
+                            device=target.name)
+            continue
+        seen[target.name] = target
+    return list(seen.values())
+
+def load_inventory(path):
+    """
+    Read an inventory file; the format is chosen by extension
+    """
+    extension = os.path.splitext(path)[1].lower()
+    with open(path, newline='', encoding='utf-8') as file:
+        if extension == ".csv":
+            return parse_csv(file)
+        if extension in (".yaml", ".yml"):
+            try:
+                import yaml
+            except ImportError:
+                raise ValueError("YAML inventories need PyYAML (pip install PyYAML)")
+            return parse_inventory(yaml.safe_load(file) or {})
+        return parse_inventory(json.load(file))
+
+def diff(old, new):
+    """
+    (added, removed, changed) between two {name: Target} mappings
+    """
+    added = [target for name, target in new.items() if name not in old]
+    removed = [target for name, target in old.items() if name not in new]
+    changed = [target for name, target in new.items() if name in old and old[name] != target]
+    return added, removed, changed
+
+# ============================================================================
+# LIVE INVENTORY
+# ============================================================================
+
+class Inventory:
+    """
+    Current targets from one file. apply() diffs a newly loaded file against
+    the current targets and calls add(target) / remove(target) only for the
+    difference; watch() re-applies whenever the file's mtime changes.
+    """
+
+    def __init__(self, path, add, remove):
+        self.path = path
+        self._add = add
+        self._remove = remove
+        self.targets = {}
+        self._mtime = None
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self.reloads = 0
+
+    def apply(self, targets):
+        new = {target.name: target for target in targets}
+        with self._lock:
+            added, removed, changed = diff(self.targets, new)
+            for target in removed:
+                self._remove(target)
+            for target in changed + added:
+                # add() replaces an existing target with the same name
+                self._add(target)
+            self.targets = new
+        return added, removed, changed
+
+    def load(self):
+        """
+        Load the file and apply it; returns (added, removed, changed)
+        """
+        mtime = os.path.getmtime(self.path)
+        result = self.apply(load_inventory(self.path))
+        self._mtime = mtime
+        return result
+
+    def groups(self):
+        with self._lock:
+            return {name: target.group for name, target in self.targets.items()}
+
+    def watch(self, interval=RELOAD_SECONDS):
+        threading.Thread(target=self._watch_loop, args=(interval,), name="inventory-watch", daemon=True).start()
+
+    def stop(self):
+        self._stop.set()
+
+    def _watch_loop(self, interval):
+        while not self._stop.wait(interval):
+            try:
+                mtime = os.path.getmtime(self.path)
+            except OSError:
+                continue
+            if mtime == self._mtime:
+                continue
+            try:
+                added, removed, changed = self.load()
+            except Exception as e:
+                # Keep probing the previous inventory until the file is fixed
+                self._mtime = mtime
+                console.warning(f"⚠️  Inventory reload failed, keeping previous targets: {e}", "inventory_error")
+                continue
+            self.reloads += 1
+            console.emit("inventory_reload",
+                         f"🔄 Inventory reloaded: {len(added)} added, {len(removed)} removed, {len(changed)} changed",
+                         added=len(added), removed=len(removed), changed=len(changed))
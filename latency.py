@@ -0,0 +1,119 @@
+#!/usr/bin/env python3
+"""
+Fixed-memory latency histograms
+HDR-style layout: each power of two between the lowest and highest
+trackable value is split into 2**sub_bucket_bits linear sub-buckets, so
+relative error is bounded while memory never grows
+"""
+
+import math
+from array import array
+
+# ============================================================================
+# HISTOGRAM
+# ============================================================================
+
+class LatencyHistogram:
+    """
+    Log-bucketed histogram of latencies in milliseconds
+    """
+
+    __slots__ = ("lowest", "sub_buckets", "powers", "counts", "total")
+
+    def __init__(self, sub_bucket_bits=4, lowest_ms=0.01, highest_ms=60000.0):
+        self.lowest = lowest_ms
+        self.sub_buckets = 1 << sub_bucket_bits
+        self.powers = max(1, math.ceil(math.log2(highest_ms / lowest_ms)))
+        self.counts = array('I', [0] * (self.powers * self.sub_buckets))
+        self.total = 0
+
+    def index(self, value_ms):
+        """
+        Bucket index for a latency; values outside the range are clamped
+        """
+        if value_ms <= self.lowest:
+            return 0
+        scaled = value_ms / self.lowest
+        power = int(math.log2(scaled))
+        if power >= self.powers:
+            return len(self.counts) - 1
+        sub = int((scaled / (1 << power) - 1) * self.sub_buckets)
+        return power * self.sub_buckets + min(sub, self.sub_buckets - 1)
+
+    def value(self, index):
+        """
+        Midpoint latency of a bucket, in milliseconds
+        """
+        power, sub = divmod(index, self.sub_buckets)
+        return self.lowest * (1 << power) * (1 + (sub + 0.5) / self.sub_buckets)
+
+    def record(self, value_ms, count=1):
+        self.counts[self.index(value_ms)] += count
+        self.total += count
+
+    def add(self, other):
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] += count
+        self.total += other.total
+
+    def subtract(self, other):
+        for i, count in enumerate(other.counts):
+            if count:
+                self.counts[i] -= count
+        self.total -= other.total
+
+    def reset(self):
+        for i in range(len(self.counts)):
+            self.counts[i] = 0
+        self.total = 0
+
+    def percentile(self, fraction):
+        """
+        Latency at the given fraction (0.95 for p95), or None when empty
+        """
+        if not self.total:
+            return None
+        target = max(1, math.ceil(fraction * self.total))
+        seen = 0
+        for i, count in enumerate(self.counts):
+            seen += count
+            if seen >= target:
+                return self.value(i)
+        return self.value(len(self.counts) - 1)
+
+    def percentiles(self, fractions=(0.5, 0.95, 0.99)):
+        """
+        Several percentiles in one pass, as {fraction: ms}
+        """
+        result = {fraction: None for fraction in fractions}
+        if not self.total:
+            return result
+        targets = sorted((max(1, math.ceil(fraction * self.total)), fraction) for fraction in fractions)
+        seen = 0
+        position = 0
+        for i, count in enumerate(self.counts):
+            if not count:
+                continue
+            seen += count
+            while position < len(targets) and seen >= targets[position][0]:
+                result[targets[position][1]] = self.value(i)
+                position += 1
+            if position == len(targets):
+                break
+        return result
+
+    def memory_bytes(self):
+        return self.counts.itemsize * len(self.counts)
+
+# ============================================================================
+# MULTI-ECHO SUMMARY
+# ============================================================================
+
+def jitter(samples):
+    """
+    Mean absolute difference between consecutive RTTs (RFC 3550 style)
+    """
+    if len(samples) < 2:
+        return None
+    return sum(abs(b - a) for a, b in zip(samples, samples[1:])) / (len(samples) - 1)
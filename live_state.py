@@ -0,0 +1,371 @@
+#!/usr/bin/env python3
+"""
+In-memory views of the probe log
+Kept up to date by the log writer so web requests never rescan the CSV
+"""
+
+import csv
+import os
+import threading
+from collections import deque
+from itertools import islice
+
+from metrics import count_bytes_read
+
+LOG_HEADERS = ["Timestamp", "Device Name", "IP Address", "Status", "RTT (ms)", "Loss (%)", "Jitter (ms)"]
+
+def is_header(row):
+    """
+    True for the header row of any log version (older logs have 4 columns)
+    """
+    return bool(row) and row[0] == LOG_HEADERS[0]
+
+# ============================================================================
+# READING THE END OF THE LOG
+# ============================================================================
+
+def _parse_line(line):
+    rows = list(csv.reader([line.decode('utf-8', 'replace')]))
+    return rows[0] if rows else []
+
+def read_tail_records(filename, count, block_size=8192):
+    """
+    Return the last `count` data rows of a CSV log as (end_offset, row)
+    pairs by seeking backwards from the end of the file; the header row is
+    never included. end_offset is the byte offset just past the row.
+    """
+    if count <= 0 or not os.path.exists(filename):
+        return []
+
+    with open(filename, 'rb') as file:
+        file.seek(0, os.SEEK_END)
+        end = file.tell()
+        position = end
+        data = b""
+        # One extra line so a partially read first line can be discarded
+        while position > 0 and data.count(b"\n") <= count + 1:
+            step = min(block_size, position)
+            position -= step
+            file.seek(position)
+            data = file.read(step) + data
+
+    count_bytes_read(end - position)
+    records = []
+    offset = position
+    lines = data.split(b"\n")
+    for index, line in enumerate(lines):
+        last = index == len(lines) - 1
+        offset += len(line) + (0 if last else 1)
+        if index == 0 and position > 0:
+            continue
+        if last and line:
+            # Row still being written; leave it for the next read
+            break
+        row = _parse_line(line)
+        if not row or (offset == len(line) + 1 and is_header(row)):
+            continue
+        records.append((offset, row))
+    return records[-count:]
+
+def read_records_from(filename, offset, limit):
+    """
+    Read up to `limit` rows starting at byte offset `offset` by seeking
+    straight to it; an offset inside a row skips to the next one. Returns
+    (end_offset, row) pairs.
+    """
+    records = []
+    if not os.path.exists(filename):
+        return records
+
+    start = offset
+    with open(filename, 'rb') as file:
+        if offset > 0:
+            file.seek(offset - 1)
+            if file.read(1) != b"\n":
+                # Not a row boundary (a made-up cursor, or one from before the
+                # header was upgraded); resume at the next whole row
+                offset += len(file.readline())
+        else:
+            file.seek(offset)
+        while len(records) < limit:
+            line = file.readline()
+            if not line or not line.endswith(b"\n"):
+                break
+            offset += len(line)
+            row = _parse_line(line)
+            if not row or (offset == len(line) and is_header(row)):
+                continue
+            records.append((offset, row))
+    count_bytes_read(offset - start)
+    return records
+
+# ============================================================================
+# RECENT ROWS RING BUFFER
+# ============================================================================
+
+class RecentRows:
+    """
+    Fixed-size ring buffer of the most recent log rows, each stored with
+    the byte offset just past it in the log so it can serve cursor reads
+    """
+
+    def __init__(self, capacity=1000):
+        self.capacity = capacity
+        self._records = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def load(self, tail_reader):
+        """
+        Fill the buffer from the end of the log once, on cold start
+        tail_reader(count) returns the last rows as (cursor, row) pairs
+        """
+        with self._lock:
+            if self.loaded:
+                return
+            self._records.extend(tail_reader(self.capacity))
+            self.loaded = True
+
+    def extend(self, rows, offsets):
+        """
+        Append newly written rows; used as a log writer listener
+        """
+        with self._lock:
+            self._records.extend(zip(offsets, rows))
+
+    def latest(self, count):
+        """
+        Return up to `count` most recent rows, oldest first
+        """
+        return [row for _, row in self.latest_records(count)]
+
+    def latest_records(self, count):
+        """
+        Up to `count` most recent (end_offset, row) pairs, oldest first
+        """
+        with self._lock:
+            records = list(islice(reversed(self._records), count))
+        records.reverse()
+        return records
+
+    def since(self, cursor, limit):
+        """
+        Rows written after `cursor`, as (end_offset, row) pairs, or None if
+        the cursor is older than anything still held in memory
+        """
+        with self._lock:
+            if not self._records:
+                return None
+            if cursor < self._records[0][0]:
+                return None
+            newer = []
+            for record in reversed(self._records):
+                if record[0] <= cursor:
+                    break
+                newer.append(record)
+        newer.reverse()
+        return newer[:limit]
+
+    def cursor(self):
+        """
+        Offset just past the newest row held
+        """
+        with self._lock:
+            return self._records[-1][0] if self._records else 0
+
+    def __len__(self):
+        return len(self._records)
+
+# ============================================================================
+# PER-DEVICE LATEST STATE
+# ============================================================================
+
+def _optional_float(row, index):
+    """
+    Numeric column that is blank or missing in older rows
+    """
+    if len(row) > index and row[index]:
+        try:
+            return float(row[index])
+        except ValueError:
+            return None
+    return None
+
+def result_state_values(row):
+    """
+    (rtt, loss_percent, jitter, failures) to restore from a main-log row
+    (seconds); failures None counts each DOWN row as one failed probe
+    """
+    rtt, loss_percent, jitter = (_optional_float(row, i) for i in (4, 5, 6))
+    return (rtt / 1000 if rtt is not None else None, loss_percent,
+            jitter / 1000 if jitter is not None else None, None)
+
+class DeviceState:
+    """
+    Latest known state of one device
+    """
+
+    __slots__ = ("device", "ip", "status", "timestamp", "last_change",
+                 "consecutive_failures", "last_rtt", "loss_percent", "jitter", "flapping", "interval", "check",
+                 "changed")
+
+    def __init__(self, device, ip):
+        self.device = device
+        self.ip = ip
+        self.status = "Unknown"
+        self.timestamp = None
+        self.last_change = None
+        self.consecutive_failures = 0
+        self.last_rtt = None
+        self.loss_percent = None
+        self.jitter = None
+        self.flapping = False
+        self.interval = None
+        self.check = None
+        # Table version at this device's last change
+        self.changed = 0
+
+    def to_dict(self):
+        return {
+            "device": self.device,
+            "ip": self.ip,
+            "status": self.status,
+            "timestamp": self.timestamp,
+            "last_change": self.last_change,
+            "consecutive_failures": self.consecutive_failures,
+            "last_rtt_ms": round(self.last_rtt * 1000, 3) if self.last_rtt is not None else None,
+            "loss_percent": round(self.loss_percent, 1) if self.loss_percent is not None else None,
+            "jitter_ms": round(self.jitter * 1000, 3) if self.jitter is not None else None,
+            "flapping": self.flapping,
+            "interval": self.interval,
+            "check": self.check,
+        }
+
+class DeviceStateTable:
+    """
+    Live table of per-device state, updated as results arrive
+    """
+
+    def __init__(self):
+        self._states = {}
+        self._lock = threading.Lock()
+        self.last_updated = None
+        self.status_counts = {"UP": 0, "DOWN": 0}
+        self.loaded = False
+        # Bumped on every change, so readers can tell when to re-snapshot
+        self.version = 0
+        # {device: version} of devices forgotten, for changes()
+        self._forgotten = {}
+
+    def record(self, device, ip, timestamp, status, rtt=None, loss_percent=None, jitter=None,
+               flapping=None, interval=None, check=None):
+        """
+        Apply one probe result (rtt and jitter in seconds). Returns the
+        previous status if this result changed it, otherwise None.
+        flapping and interval come from adaptive cadence when it is enabled;
+        check is the timing breakdown of a service check
+        """
+        previous = None
+        with self._lock:
+            state = self._states.get(device)
+            if state is None:
+                state = DeviceState(device, ip)
+                self._states[device] = state
+                self._forgotten.pop(device, None)
+            state.ip = ip
+
+            if state.status != status:
+                if state.status in self.status_counts:
+                    self.status_counts[state.status] -= 1
+                if status in self.status_counts:
+                    self.status_counts[status] += 1
+                previous = state.status
+                state.status = status
+                state.last_change = timestamp
+
+            state.timestamp = timestamp
+            state.consecutive_failures = state.consecutive_failures + 1 if status == "DOWN" else 0
+            if rtt is not None:
+                state.last_rtt = rtt
+            state.loss_percent = loss_percent
+            state.jitter = jitter
+            if flapping is not None:
+                state.flapping = flapping
+            if interval is not None:
+                state.interval = interval
+            if check is not None:
+                state.check = check
+            self.last_updated = state
+            self.version += 1
+            state.changed = self.version
+        return previous
+
+    def forget(self, device):
+        """
+        Drop a device that is no longer monitored
+        """
+        with self._lock:
+            state = self._states.pop(device, None)
+            if state is not None and state.status in self.status_counts:
+                self.status_counts[state.status] -= 1
+            if state is not None and self.last_updated is state:
+                self.last_updated = None
+            self.version += 1
+            if state is not None:
+                self._forgotten[device] = self.version
+        return state is not None
+
+    def load(self, tail_reader, max_rows=100000, values=result_state_values):
+        """
+        Replay the end of the log once to restore state after a restart;
+        values(row) maps a row to (rtt, loss_percent, jitter, failures)
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        for _, row in tail_reader(max_rows):
+            if len(row) > 3:
+                rtt, loss_percent, jitter, failures = values(row)
+                self.record(row[1], row[2], row[0], row[3].upper(), rtt, loss_percent, jitter)
+                if failures is not None:
+                    with self._lock:
+                        self._states[row[1]].consecutive_failures = failures
+
+    def get(self, device):
+        with self._lock:
+            state = self._states.get(device)
+            return state.to_dict() if state is not None else None
+
+    def latest(self):
+        """
+        State of whichever device reported most recently
+        """
+        with self._lock:
+            return self.last_updated.to_dict() if self.last_updated is not None else None
+
+    def snapshot(self, devices=None):
+        """
+        {device: state} for the given devices, or for every device
+        """
+        with self._lock:
+            if devices is None:
+                return {name: state.to_dict() for name, state in self._states.items()}
+            return {name: self._states[name].to_dict() for name in devices if name in self._states}
+
+    def changes(self, since):
+        """
+        (version, {device: state} changed after version `since`, [devices
+        forgotten after it]), so a copy can catch up without a full snapshot
+        """
+        with self._lock:
+            changed = {name: state.to_dict() for name, state in self._states.items() if state.changed > since}
+            forgotten = [name for name, version in self._forgotten.items() if version > since]
+            return self.version, changed, forgotten
+
+    def summary(self):
+        with self._lock:
+            return {"devices": len(self._states), "up": self.status_counts["UP"],
+                    "down": self.status_counts["DOWN"]}
+
+    def __len__(self):
+        return len(self._states)
@@ -0,0 +1,333 @@
+#!/usr/bin/env python3
+"""
+Search index over the probe log
+Per-device arrays of row positions, epochs and status codes, plus a sparse
+time index over fixed-size blocks of rows, maintained as rows are appended.
+Filtered queries seek straight to candidate rows instead of scanning the log.
+
+A row's position is the log cursor just before it (a byte offset into the
+CSV, or a record number in the binary store), so rows are read back through
+the same records_from(cursor, limit) that serves /rows.
+"""
+
+import heapq
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+import console
+
+BLOCK_ROWS = 1024
+LOAD_CHUNK_ROWS = 50000
+# Expired blocks are dropped in batches, so postings are rewritten rarely
+TRIM_BLOCKS = 64
+STATUS_CODES = {"UP": 0, "DOWN": 1}
+OTHER_STATUS = 2
+
+def status_code(status):
+    return STATUS_CODES.get(status.upper(), OTHER_STATUS)
+
+class DevicePostings:
+    """
+    Every row of one device, oldest first; about 13 bytes per row
+    """
+
+    __slots__ = ("positions", "epochs", "statuses")
+
+    def __init__(self):
+        self.positions = array('q')
+        self.epochs = array('I')
+        self.statuses = bytearray()
+
+class LogIndex:
+    """
+    Per-device postings and a block time index over one log. Rows appended
+    while the initial load runs are held back and applied after it, so
+    every posting list stays in log order.
+
+    Blocks whose rows are all older than `max_age_seconds`, or that start
+    before first_position() (the oldest cursor a store with retention still
+    holds), are dropped with their postings, so the index covers a bounded
+    stretch of the log.
+    """
+
+    def __init__(self, block_rows=BLOCK_ROWS, max_age_seconds=None, first_position=None):
+        self.block_rows = block_rows
+        self.max_age_seconds = max_age_seconds
+        self.first_position = first_position
+        self._devices = {}
+        self._ip_devices = {}
+        # One entry per block: first row position, row count, min/max epoch,
+        # running max epoch (monotonic, for bisecting) and rows per status
+        self._block_positions = array('q')
+        self._block_counts = array('I')
+        self._block_min = array('I')
+        self._block_max = array('I')
+        self._block_running_max = array('I')
+        self._block_statuses = []
+        self._lock = threading.Lock()
+        self._pending = []
+        self._parsed = (None, 0)
+        self.cursor = 0
+        self.rows = 0
+        self.state = "empty"
+        self.error = None
+
+    # ------------------------------------------------------------------
+    # Building
+    # ------------------------------------------------------------------
+
+    def start_loading(self, read, end_cursor):
+        """
+        Index the log up to `end_cursor` on a background thread;
+        read(cursor, limit) returns (cursor_after, row) pairs
+        """
+        with self._lock:
+            if self.state != "empty":
+                return
+            self.state = "loading"
+
+        def run():
+            try:
+                self._load(read, end_cursor)
+                with self._lock:
+                    pending, self._pending = self._pending, []
+                    for rows, cursors in pending:
+                        fresh = [index for index, cursor in enumerate(cursors) if cursor > self.cursor]
+                        if fresh:
+                            self._add([rows[index] for index in fresh], [cursors[index] for index in fresh])
+                    self.state = "ready"
+            except Exception as e:
+                self.error = str(e)
+                self.state = "failed"
+                console.warning(f"⚠️  Log index load failed: {e}", "log_index_error")
+
+        threading.Thread(target=run, name="log-index-load", daemon=True).start()
+
+    def _load(self, read, end_cursor):
+        cursor = 0
+        while cursor < end_cursor:
+            records = [record for record in read(cursor, LOAD_CHUNK_ROWS) if record[0] <= end_cursor]
+            if not records:
+                break
+            with self._lock:
+                self._add([row for _, row in records], [end for end, _ in records])
+            cursor = records[-1][0]
+        with self._lock:
+            self.cursor = end_cursor
+
+    def append_rows(self, rows, cursors):
+        """
+        Log writer listener: index newly written rows. Before loading
+        starts they are skipped, since the load will read them from the log
+        """
+        with self._lock:
+            if self.state == "loading":
+                self._pending.append((rows, cursors))
+            elif self.state == "ready":
+                self._add(rows, cursors)
+
+    def _epoch(self, timestamp):
+        # Rows come in runs with the same timestamp; parse each run once
+        parsed = self._parsed
+        if timestamp != parsed[0]:
+            try:
+                parsed = (timestamp, int(time.mktime(time.strptime(timestamp, '%Y-%m-%d %H:%M:%S'))))
+            except ValueError:
+                return None
+            self._parsed = parsed
+        return parsed[1]
+
+    def _add(self, rows, cursors):
+        position = self.cursor
+        for row, end in zip(rows, cursors):
+            epoch = self._epoch(row[0]) if len(row) > 3 else None
+            # A row the sink did not store takes no space in the log
+            if epoch is not None and end > position:
+                self._add_row(position, epoch, row[1], row[2], status_code(row[3]))
+            position = end
+        self.cursor = position
+
+    def _add_row(self, position, epoch, device, ip, status):
+        postings = self._devices.get(device)
+        if postings is None:
+            postings = self._devices[device] = DevicePostings()
+        postings.positions.append(position)
+        postings.epochs.append(epoch)
+        postings.statuses.append(status)
+        devices = self._ip_devices.get(ip)
+        if devices is None:
+            devices = self._ip_devices[ip] = set()
+        devices.add(device)
+
+        blocks = len(self._block_positions)
+        if blocks == 0 or self._block_counts[-1] >= self.block_rows:
+            if blocks:
+                blocks -= self._trim(position, epoch)
+            self._block_positions.append(position)
+            self._block_counts.append(0)
+            self._block_min.append(epoch)
+            self._block_max.append(epoch)
+            self._block_running_max.append(max(epoch, self._block_running_max[-1]) if blocks else epoch)
+            self._block_statuses.append([0, 0, 0])
+        self._block_counts[-1] += 1
+        self._block_min[-1] = min(self._block_min[-1], epoch)
+        self._block_max[-1] = max(self._block_max[-1], epoch)
+        self._block_running_max[-1] = max(self._block_running_max[-1], epoch)
+        self._block_statuses[-1][status] += 1
+        self.rows += 1
+
+    def _trim(self, position, newest_epoch):
+        """
+        Before starting a block at `position`: drop leading blocks past the
+        age limit or before the store's oldest row, and every posting before
+        the first block kept; returns the number of blocks dropped
+        """
+        first = self.first_position() if self.first_position is not None else None
+        oldest = newest_epoch - self.max_age_seconds if self.max_age_seconds is not None else None
+        expired = 0
+        for index in range(len(self._block_positions)):
+            if not ((oldest is not None and self._block_running_max[index] < oldest)
+                    or (first is not None and self._block_positions[index] < first)):
+                break
+            expired = index + 1
+        # Rows the store no longer holds go at once; old ones wait for a batch
+        if expired < TRIM_BLOCKS and not (first is not None and expired and self._block_positions[0] < first):
+            return 0
+
+        # A block that starts before the store's oldest row is dropped whole,
+        # so reads never start at a position the store no longer has
+        cut = self._block_positions[expired] if expired < len(self._block_positions) else position
+        for blocks in (self._block_positions, self._block_counts, self._block_min, self._block_max,
+                       self._block_running_max, self._block_statuses):
+            del blocks[:expired]
+        emptied = set()
+        for device, postings in self._devices.items():
+            dropped = bisect_left(postings.positions, cut)
+            if dropped:
+                del postings.positions[:dropped]
+                del postings.epochs[:dropped]
+                del postings.statuses[:dropped]
+                self.rows -= dropped
+                if not postings.positions:
+                    emptied.add(device)
+        if emptied:
+            for device in emptied:
+                del self._devices[device]
+            for ip, devices in list(self._ip_devices.items()):
+                devices -= emptied
+                if not devices:
+                    del self._ip_devices[ip]
+        return expired
+
+    # ------------------------------------------------------------------
+    # Queries
+    # ------------------------------------------------------------------
+
+    def query(self, read, devices=None, ips=None, statuses=None, start=None, end=None, before=None, limit=100):
+        """
+        Matching rows, newest first, as (position, row) pairs; `before`
+        (a position) continues from the previous page. Returns
+        (records, more, rows_read).
+        """
+        codes = {status_code(status) for status in statuses} if statuses else None
+        start = 0 if start is None else start
+        end = 2 ** 32 - 1 if end is None else end
+        with self._lock:
+            before = self.cursor if before is None else before
+            if ips:
+                wanted = set(devices) if devices else None
+                devices = {device for ip in ips for device in self._ip_devices.get(ip, ())}
+                if wanted is not None:
+                    devices &= wanted
+            if devices or ips:
+                candidates = self._device_candidates(devices or (), codes, start, end, before)
+            else:
+                blocks = self._candidate_blocks(codes, start, end, before)
+        # Rows are read outside the lock so appends never wait on a query
+        if devices or ips:
+            return self._read_postings(read, candidates, set(ips) if ips else None, limit)
+        return self._scan_blocks(read, blocks, codes, start, end, before, limit)
+
+    def _device_candidates(self, devices, codes, start, end, before):
+        """
+        Positions of every indexed row that matches, newest first
+        """
+        streams = []
+        for device in devices:
+            postings = self._devices.get(device)
+            if postings is None:
+                continue
+            positions, epochs, statuses = postings.positions, postings.epochs, postings.statuses
+            high = min(bisect_left(positions, before), bisect_left(epochs, end))
+            low = bisect_left(epochs, start)
+
+            def matches(positions=positions, statuses=statuses, low=low, high=high, device=device):
+                for index in range(high - 1, low - 1, -1):
+                    if codes is None or statuses[index] in codes:
+                        yield positions[index], device
+
+            streams.append(matches())
+        return heapq.merge(*streams, reverse=True)
+
+    def _read_postings(self, read, candidates, ips, limit):
+        records = []
+        rows_read = 0
+        for position, device in candidates:
+            found = read(position, 1)
+            rows_read += 1
+            if not found or found[0][1][1] != device:
+                continue  # row no longer in the log (binary store retention)
+            if ips is not None and found[0][1][2] not in ips:
+                continue
+            if len(records) == limit:
+                return records, True, rows_read
+            records.append((position, found[0][1]))
+        return records, False, rows_read
+
+    def _candidate_blocks(self, codes, start, end, before):
+        """
+        (position, count) of blocks that may hold matching rows, newest first
+        """
+        first = bisect_left(self._block_running_max, start)
+        last = bisect_left(self._block_positions, before) - 1
+        blocks = []
+        for index in range(last, first - 1, -1):
+            if self._block_min[index] >= end or self._block_max[index] < start:
+                continue
+            if codes is not None and not any(self._block_statuses[index][code] for code in codes):
+                continue
+            blocks.append((self._block_positions[index], self._block_counts[index]))
+        return blocks
+
+    def _scan_blocks(self, read, blocks, codes, start, end, before, limit):
+        records = []
+        rows_read = 0
+        for position, count in blocks:
+            block = read(position, count)
+            rows_read += len(block)
+            matched = []
+            for cursor, row in block:
+                if position >= before:
+                    break
+                if len(row) > 3 and (codes is None or status_code(row[3]) in codes):
+                    epoch = self._epoch(row[0])
+                    if epoch is not None and start <= epoch < end:
+                        matched.append((position, row))
+                position = cursor
+            for record in reversed(matched):
+                if len(records) == limit:
+                    return records, True, rows_read
+                records.append(record)
+        return records, False, rows_read
+
+    def devices(self):
+        with self._lock:
+            return sorted(self._devices)
+
+    def stats(self):
+        with self._lock:
+            return {"state": self.state, "rows": self.rows, "devices": len(self._devices),
+                    "blocks": len(self._block_positions),
+                    "oldest": self._block_min[0] if self._block_min else None}
@@ -0,0 +1,313 @@
+#!/usr/bin/env python3
+"""
+Group-commit CSV log writer
+Probe results go onto a bounded queue and a single writer thread appends
+them in batches, one buffered write per flush window
+"""
+
+import csv
+import io
+import os
+import queue
+import threading
+import time
+
+import console
+
+# Repeated sink errors (a full disk fails every batch) are reported at most this often
+ERROR_REPORT_SECONDS = 10.0
+
+FSYNC_NEVER = "never"
+FSYNC_BATCH = "batch"
+FSYNC_INTERVAL = "interval"
+
+# ============================================================================
+# SINKS
+# ============================================================================
+
+class CsvSink:
+    """
+    Appends rows to a CSV file; cursors are byte offsets just past each row
+    """
+
+    def __init__(self, filename):
+        self.filename = filename
+        self._file = open(filename, mode='ab')
+        self._file.seek(0, os.SEEK_END)
+        self.offset = self._file.tell()
+        self.bytes_written = 0
+
+    def write(self, rows):
+        buffer = io.StringIO()
+        writer = csv.writer(buffer)
+        chunks = []
+        offsets = []
+        offset = self.offset
+        for row in rows:
+            writer.writerow(row)
+            chunk = buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+            offset += len(chunk)
+            chunks.append(chunk)
+            offsets.append(offset)
+
+        self._file.write(b"".join(chunks))
+        self.bytes_written += offset - self.offset
+        self.offset = offset
+        return offsets
+
+    def flush(self):
+        self._file.flush()
+
+    def fsync(self):
+        os.fsync(self._file.fileno())
+
+    def close(self):
+        self._file.close()
+
+# ============================================================================
+# WRITER
+# ============================================================================
+
+class LogWriter:
+    """
+    Single-writer appender for one log file, or for any sink providing
+    write(rows) -> cursors, bytes_written, flush(), fsync() and close();
+    a sink returns a None cursor for a row it did not store
+
+    fsync_policy:
+        "never"    - leave durability to the OS page cache
+        "batch"    - fsync after every batch
+        "interval" - fsync at most once every fsync_interval_ms
+    """
+
+    def __init__(self, filename, queue_size=65536, flush_interval=0.05, max_batch=16384,
+                 fsync_policy=FSYNC_NEVER, fsync_interval_ms=1000, sink=None):
+        if fsync_policy not in (FSYNC_NEVER, FSYNC_BATCH, FSYNC_INTERVAL):
+            raise ValueError(f"Unknown fsync policy: {fsync_policy}")
+
+        self.filename = filename
+        self.flush_interval = flush_interval
+        self.max_batch = max_batch
+        self.fsync_policy = fsync_policy
+        self.fsync_interval = fsync_interval_ms / 1000.0
+
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._sink = sink if sink is not None else CsvSink(filename)
+        self._last_fsync = time.monotonic()
+        self._listeners = []
+        self._flush_listeners = []
+        self._closed = False
+
+        self.rows_written = 0
+        self.batches_written = 0
+        self.bytes_written = 0
+        self.backpressure_events = 0
+        self.rows_dropped = 0
+        self.write_errors = 0
+        self.last_flush_seconds = 0.0
+        self._error_reported = 0.0
+
+        self._thread = threading.Thread(target=self._write_loop, name="log-writer", daemon=True)
+        self._thread.start()
+
+    def add_listener(self, callback):
+        """
+        Register callback(rows, cursors) to be called after each batch hits
+        the sink; cursors[i] is the position just past rows[i] (a byte
+        offset for CSV files)
+        """
+        self._listeners.append(callback)
+
+    def add_flush_listener(self, callback):
+        """
+        Register callback(seconds, rows) to be called with the time each
+        batch took to write, flush and (per policy) fsync
+        """
+        self._flush_listeners.append(callback)
+
+    def append(self, row, block=True, timeout=None):
+        """
+        Queue a row for writing. When the queue is full the event is counted
+        as backpressure; the call then blocks, or drops the row and returns
+        False if block is False.
+        """
+        try:
+            self._queue.put_nowait(row)
+            return True
+        except queue.Full:
+            self.backpressure_events += 1
+        if not block:
+            self.rows_dropped += 1
+            return False
+        try:
+            self._queue.put(row, timeout=timeout)
+            return True
+        except queue.Full:
+            self.rows_dropped += 1
+            return False
+
+    def queue_depth(self):
+        return self._queue.qsize()
+
+    def _collect_batch(self):
+        """
+        Wait for the first row, let the flush window fill unless a full
+        batch is already queued, then drain
+        """
+        try:
+            first = self._queue.get(timeout=0.5)
+        except queue.Empty:
+            return []
+        if first is None:
+            return None
+        if self.flush_interval and self._queue.qsize() + 1 < self.max_batch:
+            time.sleep(self.flush_interval)
+
+        batch = [first]
+        while len(batch) < self.max_batch:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is None:
+                self._closed = True
+                break
+            batch.append(row)
+        return batch
+
+    def _write_loop(self):
+        while True:
+            batch = self._collect_batch()
+            if batch is None:
+                break
+            if batch:
+                self._write_batch(batch)
+            elif self.fsync_policy == FSYNC_INTERVAL:
+                self._sink_call(self._maybe_fsync)
+            if self._closed:
+                break
+
+        # Drain anything queued behind the close marker
+        remaining = []
+        while True:
+            try:
+                row = self._queue.get_nowait()
+            except queue.Empty:
+                break
+            if row is not None:
+                remaining.append(row)
+        if remaining:
+            self._write_batch(remaining)
+        self._sink_call(self._sink.flush)
+        if self.fsync_policy != FSYNC_NEVER:
+            self._sink_call(self._sink.fsync)
+        self._sink_call(self._sink.close)
+
+    def _sink_call(self, call, *args):
+        """
+        Run one sink operation; an error (a full disk, say) is counted and
+        reported instead of ending the writer thread. Returns (ok, result)
+        """
+        try:
+            return True, call(*args)
+        except Exception as e:
+            self.write_errors += 1
+            now = time.monotonic()
+            if now - self._error_reported >= ERROR_REPORT_SECONDS:
+                self._error_reported = now
+                console.warning(f"⚠️  Log write to {self.filename} failed ({self.write_errors} errors so far): {e}",
+                                "log_write_error", log=self.filename, errors=self.write_errors)
+            return False, None
+
+    def _write_batch(self, batch):
+        started = time.perf_counter()
+        bytes_before = self._sink.bytes_written
+        ok, cursors = self._sink_call(self._sink.write, batch)
+        if not ok:
+            self.rows_dropped += len(batch)
+            return
+        self._sink_call(self._sink.flush)
+        if self.fsync_policy == FSYNC_BATCH:
+            self._sink_call(self._sink.fsync)
+            self._last_fsync = time.monotonic()
+        elif self.fsync_policy == FSYNC_INTERVAL:
+            self._sink_call(self._maybe_fsync)
+
+        if None in cursors:
+            stored = [(row, cursor) for row, cursor in zip(batch, cursors) if cursor is not None]
+            self.rows_dropped += len(batch) - len(stored)
+            batch = [row for row, _ in stored]
+            cursors = [cursor for _, cursor in stored]
+
+        self.rows_written += len(batch)
+        self.batches_written += 1
+        self.bytes_written += self._sink.bytes_written - bytes_before
+        self.last_flush_seconds = time.perf_counter() - started
+        for callback in self._flush_listeners:
+            try:
+                callback(self.last_flush_seconds, len(batch))
+            except Exception as e:
+                console.warning(f"⚠️  Log flush listener error: {e}", "log_listener_error")
+
+        if not batch:
+            return
+        for callback in self._listeners:
+            try:
+                callback(batch, cursors)
+            except Exception as e:
+                console.warning(f"⚠️  Log listener error: {e}", "log_listener_error")
+
+    def _maybe_fsync(self):
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            self._sink.fsync()
+            self._last_fsync = now
+
+    def close(self):
+        """
+        Flush queued rows and close the file
+        """
+        if not self._thread.is_alive():
+            return
+        self._queue.put(None)
+        self._thread.join()
+
+    def stats(self):
+        return {
+            "queue_depth": self.queue_depth(),
+            "rows_written": self.rows_written,
+            "batches_written": self.batches_written,
+            "bytes_written": self.bytes_written,
+            "backpressure_events": self.backpressure_events,
+            "rows_dropped": self.rows_dropped,
+            "write_errors": self.write_errors,
+            "last_flush_seconds": self.last_flush_seconds,
+        }
+
+# ============================================================================
+# APPEND THROUGHPUT BENCHMARK
+# ============================================================================
+
+def benchmark(rows=500000, fsync_policy=FSYNC_NEVER):
+    """
+    Measure sustained append throughput into a temporary file
+    """
+    import tempfile
+
+    with tempfile.TemporaryDirectory() as directory:
+        writer = LogWriter(os.path.join(directory, "bench.csv"), fsync_policy=fsync_policy)
+        row = ["2025-05-27 16:07:16", "Benchmark Device", "127.0.0.1", "UP"]
+        started = time.perf_counter()
+        for _ in range(rows):
+            writer.append(row)
+        writer.close()
+        elapsed = time.perf_counter() - started
+    print(f"{fsync_policy:>8}: {rows / elapsed:,.0f} rows/sec "
+          f"({writer.batches_written} batches, {writer.backpressure_events} backpressure events)")
+    return rows / elapsed
+
+if __name__ == "__main__":
+    for policy in (FSYNC_NEVER, FSYNC_INTERVAL, FSYNC_BATCH):
+        benchmark(fsync_policy=policy)
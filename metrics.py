@@ -0,0 +1,217 @@
+#!/usr/bin/env python3
+"""
+Self-instrumentation in Prometheus text format
+Counters and fixed-bucket histograms cost a lock and a few additions per
+observation; values owned by other components (queue depth, subscriber
+count) are read through callbacks only when /metrics is scraped.
+Set MONITOR_METRICS=off to replace every metric with a no-op.
+"""
+
+import bisect
+import os
+import threading
+
+import console
+
+ENABLED = os.environ.get("MONITOR_METRICS", "on").lower() not in ("0", "off", "false", "no")
+
+# Seconds; spans sub-millisecond renders up to probe timeouts
+DEFAULT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+BYTE_BUCKETS = (0, 1024, 8192, 65536, 262144, 1048576, 8388608, 67108864)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+# ============================================================================
+# METRIC TYPES
+# ============================================================================
+
+def _format_labels(names, values, extra=""):
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+def _escape(value):
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+def _format_value(value):
+    if value == float("inf"):
+        return "+Inf"
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return repr(value) if isinstance(value, float) else str(value)
+
+class Counter:
+    """
+    Monotonic count, optionally split by label values
+    """
+
+    kind = "counter"
+
+    def __init__(self, name, documentation, labels=()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def inc(self, amount=1, labels=()):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def samples(self):
+        with self._lock:
+            values = sorted(self._values.items())
+        for labels, value in values:
+            yield self.name, _format_labels(self.labels, labels), value
+
+class Histogram:
+    """
+    Cumulative fixed-bucket histogram, optionally split by label values
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value, labels=()):
+        index = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                # Per-bucket counts plus +Inf, then the sum
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            series[index] += 1
+            series[-1] += value
+
+    def samples(self):
+        with self._lock:
+            series = sorted((labels, list(values)) for labels, values in self._series.items())
+        for labels, values in series:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), values):
+                cumulative += count
+                le = 'le="' + _format_value(float(bound)) + '"'
+                yield self.name + "_bucket", _format_labels(self.labels, labels, le), cumulative
+            yield self.name + "_sum", _format_labels(self.labels, labels), values[-1]
+            yield self.name + "_count", _format_labels(self.labels, labels), cumulative
+
+class CallbackMetric:
+    """
+    Gauge or counter whose value is read from its owner at scrape time
+    callback() returns a number, or {label values tuple: number}
+    """
+
+    def __init__(self, name, documentation, callback, labels=(), kind="gauge"):
+        self.name = name
+        self.documentation = documentation
+        self.callback = callback
+        self.labels = tuple(labels)
+        self.kind = kind
+
+    def samples(self):
+        values = self.callback()
+        if not isinstance(values, dict):
+            values = {(): values}
+        for labels, value in sorted(values.items()):
+            yield self.name, _format_labels(self.labels, labels), value
+
+class NullMetric:
+    """
+    Stand-in for every metric when instrumentation is switched off
+    """
+
+    def inc(self, amount=1, labels=()):
+        pass
+
+    def observe(self, value, labels=()):
+        pass
+
+NULL_METRIC = NullMetric()
+
+# ============================================================================
+# REGISTRY
+# ============================================================================
+
+class Registry:
+    def __init__(self):
+        self._metrics = {}
+        self._lock = threading.Lock()
+
+    def register(self, metric):
+        with self._lock:
+            self._metrics[metric.name] = metric
+        return metric
+
+    def render(self, include=None, exclude=()):
+        """
+        Registered metrics in Prometheus text exposition format; include
+        and exclude select metric families by name
+        """
+        with self._lock:
+            metrics = [metric for name, metric in self._metrics.items()
+                       if (include is None or name in include) and name not in exclude]
+        lines = []
+        for metric in metrics:
+            try:
+                samples = list(metric.samples())
+            except Exception as e:
+                console.warning(f"⚠️  Metric {metric.name} failed: {e}", "metric_error", metric=metric.name)
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            for name, labels, value in samples:
+                lines.append(f"{name}{labels} {_format_value(value)}")
+        return "\n".join(lines) + "\n"
+
+REGISTRY = Registry()
+
+def counter(name, documentation, labels=()):
+    if not ENABLED:
+        return NULL_METRIC
+    return REGISTRY.register(Counter(name, documentation, labels))
+
+def histogram(name, documentation, labels=(), buckets=DEFAULT_BUCKETS):
+    if not ENABLED:
+        return NULL_METRIC
+    return REGISTRY.register(Histogram(name, documentation, labels, buckets))
+
+def gauge_callback(name, documentation, callback, labels=()):
+    if ENABLED:
+        REGISTRY.register(CallbackMetric(name, documentation, callback, labels))
+
+def counter_callback(name, documentation, callback, labels=()):
+    if ENABLED:
+        REGISTRY.register(CallbackMetric(name, documentation, callback, labels, kind="counter"))
+
+def render(include=None, exclude=()):
+    return REGISTRY.render(include, exclude)
+
+# ============================================================================
+# PER-REQUEST CSV READS
+# ============================================================================
+
+CSV_BYTES_READ = counter("monitor_csv_read_bytes_total", "Bytes read from CSV logs")
+_request_local = threading.local()
+
+def count_bytes_read(count):
+    """
+    Called by the CSV readers; totals per process and per request thread
+    """
+    if ENABLED:
+        CSV_BYTES_READ.inc(count)
+        _request_local.bytes_read = getattr(_request_local, "bytes_read", 0) + count
+
+def take_bytes_read():
+    """
+    Bytes read on this thread since the last call, then reset
+    """
+    count = getattr(_request_local, "bytes_read", 0)
+    _request_local.bytes_read = 0
+    return count
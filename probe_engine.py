@@ -0,0 +1,432 @@
+#!/usr/bin/env python3
+"""
+Multiplexed ICMP probe engine
+Keeps a single ICMP socket open and matches echo replies by id/sequence,
+so thousands of hosts can be pinged without spawning a process per check
+"""
+
+import heapq
+import os
+import platform
+import random
+import select
+import socket
+import struct
+import subprocess
+import threading
+import time
+from concurrent.futures import Future
+
+from latency import jitter
+
+ICMP_ECHO_REQUEST = 8
+ICMP_ECHO_REPLY = 0
+DEFAULT_TIMEOUT = 1.0
+
+# ============================================================================
+# SUBPROCESS BACKEND (FALLBACK)
+# ============================================================================
+
+class SubprocessBackend:
+    """
+    Fallback backend that runs the system `ping` command once per check
+    """
+
+    name = "subprocess"
+
+    def ping(self, address, timeout=DEFAULT_TIMEOUT):
+        """
+        Ping a host once and return the round-trip time in seconds, or None
+        """
+        if platform.system().lower() == "windows":
+            command = ["ping", "-n", "1", "-w", str(int(timeout * 1000)), address]
+        else:
+            command = ["ping", "-c", "1", "-W", str(max(1, int(round(timeout)))), address]
+
+        started = time.perf_counter()
+        result = subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        if result.returncode != 0:
+            return None
+        return time.perf_counter() - started
+
+    def probe_many(self, addresses, timeout=DEFAULT_TIMEOUT):
+        """
+        Ping each address in turn and return {address: rtt or None}
+        """
+        return {address: self.ping(address, timeout) for address in addresses}
+
+    def close(self):
+        pass
+
+# ============================================================================
+# FAKE BACKEND (BENCHMARKS)
+# ============================================================================
+
+class FakeBackend:
+    """
+    Offline backend that sleeps for a random RTT instead of sending packets
+    Latency is normally distributed around `latency_ms`; a `failure_rate`
+    fraction of probes time out. Configured from MONITOR_FAKE_* when created
+    through create_backend("fake").
+    """
+
+    name = "fake"
+
+    def __init__(self, latency_ms=20.0, jitter_ms=5.0, failure_rate=0.0, seed=None):
+        self.latency = latency_ms / 1000
+        self.jitter = jitter_ms / 1000
+        self.failure_rate = failure_rate
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_environment(cls):
+        seed = os.environ.get("MONITOR_FAKE_SEED")
+        return cls(latency_ms=float(os.environ.get("MONITOR_FAKE_LATENCY_MS", "20")),
+                   jitter_ms=float(os.environ.get("MONITOR_FAKE_JITTER_MS", "5")),
+                   failure_rate=float(os.environ.get("MONITOR_FAKE_FAILURE_RATE", "0")),
+                   seed=int(seed) if seed else None)
+
+    def _sample(self):
+        with self._lock:
+            failed = self._random.random() < self.failure_rate
+            rtt = max(0.0, self._random.gauss(self.latency, self.jitter))
+        return failed, rtt
+
+    def ping(self, address, timeout=DEFAULT_TIMEOUT):
+        """
+        Pretend to ping a host; returns the simulated RTT in seconds, or None
+        """
+        failed, rtt = self._sample()
+        if failed or rtt > timeout:
+            time.sleep(timeout)
+            return None
+        time.sleep(rtt)
+        return rtt
+
+    def probe_many(self, addresses, timeout=DEFAULT_TIMEOUT):
+        """
+        Simulate concurrent probes: one sleep for the slowest reply
+        """
+        results = {}
+        longest = 0.0
+        for address in addresses:
+            failed, rtt = self._sample()
+            if failed or rtt > timeout:
+                results[address] = None
+                longest = timeout
+            else:
+                results[address] = rtt
+                longest = max(longest, rtt)
+        time.sleep(longest)
+        return results
+
+    def close(self):
+        pass
+
+# ============================================================================
+# ICMP SOCKET BACKEND
+# ============================================================================
+
+def _checksum(data):
+    """
+    Internet checksum (RFC 1071) over an ICMP header and payload
+    """
+    if len(data) % 2:
+        data += b"\x00"
+    total = sum(struct.unpack(f"!{len(data) // 2}H", data))
+    total = (total >> 16) + (total & 0xFFFF)
+    total += total >> 16
+    return ~total & 0xFFFF
+
+def _open_icmp_socket():
+    """
+    Open an unprivileged ICMP datagram socket if the kernel allows it,
+    otherwise fall back to a raw socket. Returns (socket, is_raw).
+    """
+    try:
+        return socket.socket(socket.AF_INET, socket.SOCK_DGRAM, socket.IPPROTO_ICMP), False
+    except (PermissionError, OSError):
+        pass
+    return socket.socket(socket.AF_INET, socket.SOCK_RAW, socket.IPPROTO_ICMP), True
+
+class IcmpProbeEngine:
+    """
+    Sends echo requests for many hosts over one socket and collects the
+    replies on a background receiver thread. Every probe gets its own
+    deadline; unanswered probes resolve to None when it passes.
+    """
+
+    name = "icmp"
+
+    def __init__(self, max_in_flight=4096, receive_buffer=4 * 1024 * 1024):
+        self.sock, self.is_raw = _open_icmp_socket()
+        try:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, receive_buffer)
+        except OSError:
+            pass
+        self.sock.setblocking(False)
+
+        # Datagram sockets get their identifier rewritten by the kernel, so
+        # replies are matched on (source address, sequence) in both modes
+        self.identifier = os.getpid() & 0xFFFF
+        self._sequence = 0
+        self._pending = {}
+        self._deadlines = []
+        self._lock = threading.Lock()
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._resolved = {}
+        self._running = True
+
+        self._receiver = threading.Thread(target=self._receive_loop, daemon=True)
+        self._receiver.start()
+
+    def _resolve(self, address):
+        """
+        Resolve a hostname once and cache the IPv4 address
+        """
+        ip = self._resolved.get(address)
+        if ip is None:
+            ip = socket.gethostbyname(address)
+            self._resolved[address] = ip
+        return ip
+
+    def submit(self, address, timeout=DEFAULT_TIMEOUT):
+        """
+        Send one echo request and return a Future resolving to the RTT in
+        seconds, or None on timeout/unreachable
+        """
+        future = Future()
+        try:
+            ip = self._resolve(address)
+        except OSError:
+            future.set_result(None)
+            return future
+
+        self._slots.acquire()
+        with self._lock:
+            self._sequence = (self._sequence + 1) & 0xFFFF
+            sequence = self._sequence
+            key = (ip, sequence)
+            # A wrapped sequence still waiting on the same host is dropped
+            stale = self._pending.pop(key, None)
+            sent_at = time.perf_counter()
+            self._pending[key] = (future, sent_at)
+            heapq.heappush(self._deadlines, (sent_at + timeout, key, future))
+
+        if stale is not None:
+            self._finish(stale[0], None)
+
+        header = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0, 0, self.identifier, sequence)
+        payload = struct.pack("!d", sent_at)
+        packet = struct.pack("!BBHHH", ICMP_ECHO_REQUEST, 0,
+                             _checksum(header + payload), self.identifier, sequence) + payload
+        try:
+            self._send(packet, ip)
+        except OSError:
+            with self._lock:
+                entry = self._pending.pop(key, None)
+            if entry is not None:
+                self._finish(future, None)
+        return future
+
+    def _send(self, packet, ip):
+        while True:
+            try:
+                self.sock.sendto(packet, (ip, 0))
+                return
+            except BlockingIOError:
+                select.select([], [self.sock], [], 0.1)
+
+    def _finish(self, future, rtt):
+        if not future.done():
+            future.set_result(rtt)
+            self._slots.release()
+
+    def _receive_loop(self):
+        while self._running:
+            readable, _, _ = select.select([self.sock], [], [], 0.01)
+            if readable:
+                self._drain_socket()
+            self._expire()
+
+    def _drain_socket(self):
+        while True:
+            try:
+                data, (source, _) = self.sock.recvfrom(2048)
+            except (BlockingIOError, InterruptedError):
+                return
+            except OSError:
+                return
+            received_at = time.perf_counter()
+
+            offset = (data[0] & 0x0F) * 4 if self.is_raw else 0
+            if len(data) < offset + 8:
+                continue
+            icmp_type, _, _, identifier, sequence = struct.unpack("!BBHHH", data[offset:offset + 8])
+            if icmp_type != ICMP_ECHO_REPLY:
+                continue
+            if self.is_raw and identifier != self.identifier:
+                continue
+
+            with self._lock:
+                entry = self._pending.pop((source, sequence), None)
+            if entry is not None:
+                future, sent_at = entry
+                self._finish(future, received_at - sent_at)
+
+    def _expire(self):
+        now = time.perf_counter()
+        expired = []
+        with self._lock:
+            while self._deadlines and self._deadlines[0][0] <= now:
+                _, key, future = heapq.heappop(self._deadlines)
+                entry = self._pending.get(key)
+                if entry is not None and entry[0] is future:
+                    del self._pending[key]
+                    expired.append(future)
+        for future in expired:
+            self._finish(future, None)
+
+    def ping(self, address, timeout=DEFAULT_TIMEOUT):
+        """
+        Ping a host once and return the round-trip time in seconds, or None
+        """
+        return self.submit(address, timeout).result()
+
+    def probe_many(self, addresses, timeout=DEFAULT_TIMEOUT):
+        """
+        Ping every address concurrently and return {address: rtt or None}
+        """
+        futures = {address: self.submit(address, timeout) for address in addresses}
+        return {address: future.result() for address, future in futures.items()}
+
+    def close(self):
+        self._running = False
+        self._receiver.join(timeout=1)
+        self.sock.close()
+
+# ============================================================================
+# MULTI-ECHO MEASUREMENT
+# ============================================================================
+
+class ProbeResult:
+    """
+    Outcome of one check: RTT samples (seconds) out of `sent` echoes
+    """
+
+    __slots__ = ("sent", "samples")
+
+    def __init__(self, sent, samples):
+        self.sent = sent
+        self.samples = samples
+
+    @property
+    def is_up(self):
+        return bool(self.samples)
+
+    @property
+    def rtt(self):
+        return sum(self.samples) / len(self.samples) if self.samples else None
+
+    @property
+    def loss_percent(self):
+        return (self.sent - len(self.samples)) / self.sent * 100 if self.sent else 0.0
+
+    @property
+    def jitter(self):
+        return jitter(self.samples)
+
+def echo_series(address, count=1, timeout=DEFAULT_TIMEOUT, interval=0.2, backend=None):
+    """
+    Send `count` echo requests to one host and summarise the replies
+    Backends that multiplex (the ICMP engine) keep all echoes in flight
+    together, spaced by `interval`; others ping one at a time
+    """
+    backend = backend or get_default_backend()
+    if count <= 1:
+        rtt = backend.ping(address, timeout)
+        return ProbeResult(1, [] if rtt is None else [rtt])
+
+    if hasattr(backend, "submit"):
+        futures = []
+        for i in range(count):
+            if i:
+                time.sleep(interval)
+            futures.append(backend.submit(address, timeout))
+        rtts = [future.result() for future in futures]
+    else:
+        rtts = [backend.ping(address, timeout) for _ in range(count)]
+    return ProbeResult(count, [rtt for rtt in rtts if rtt is not None])
+
+# ============================================================================
+# BACKEND SELECTION
+# ============================================================================
+
+_default_backend = None
+_default_backend_lock = threading.Lock()
+
+def create_backend(preferred="auto"):
+    """
+    Create a probe backend. "auto" tries the ICMP socket engine and falls
+    back to the subprocess backend when no ICMP socket can be opened;
+    "fake" simulates probes for offline benchmarks.
+    """
+    if preferred == "subprocess":
+        return SubprocessBackend()
+    if preferred == "fake":
+        return FakeBackend.from_environment()
+    try:
+        return IcmpProbeEngine()
+    except (PermissionError, OSError):
+        if preferred == "icmp":
+            raise
+        return SubprocessBackend()
+
+def get_default_backend():
+    """
+    Return the process-wide probe backend, creating it on first use
+    """
+    global _default_backend
+    with _default_backend_lock:
+        if _default_backend is None:
+            _default_backend = create_backend(os.environ.get("MONITOR_PROBE_BACKEND", "auto"))
+        return _default_backend
+
+# ============================================================================
+# LOOPBACK BENCHMARK
+# ============================================================================
+
+def loopback_targets(count):
+    """
+    Generate distinct 127.x.y.z addresses to stand in for real devices
+    """
+    targets = []
+    for i in range(count):
+        n = i + 1
+        targets.append(f"127.{(n >> 16) & 0xFF}.{(n >> 8) & 0xFF}.{n & 0xFF}")
+    return targets
+
+def benchmark(counts=(1000, 10000, 50000), backend=None, timeout=DEFAULT_TIMEOUT):
+    """
+    Measure probes per second against loopback stand-in targets
+    """
+    backend = backend or create_backend()
+    results = {}
+    for count in counts:
+        targets = loopback_targets(count)
+        started = time.perf_counter()
+        replies = backend.probe_many(targets, timeout)
+        elapsed = time.perf_counter() - started
+        answered = sum(1 for rtt in replies.values() if rtt is not None)
+        results[count] = {
+            "elapsed": elapsed,
+            "probes_per_sec": count / elapsed if elapsed > 0 else 0.0,
+            "answered": answered,
+        }
+        print(f"{backend.name:>10} {count:>6} targets: {count / elapsed:,.0f} probes/sec "
+              f"({answered}/{count} answered in {elapsed:.2f}s)")
+    return results
+
+if __name__ == "__main__":
+    benchmark()
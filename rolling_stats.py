@@ -0,0 +1,289 @@
+#!/usr/bin/env python3
+"""
+Per-device rolling uptime windows
+Bucketed ring counters for 1 min, 1 h, 24 h and 30 d windows, updated in
+O(1) per probe and read without touching the log
+"""
+
+import threading
+import time
+from array import array
+
+from latency import LatencyHistogram
+
+# (name, bucket seconds, bucket count)
+WINDOWS = (
+    ("1m", 10, 6),
+    ("1h", 300, 12),
+    ("24h", 3600, 24),
+    ("30d", 86400, 30),
+)
+
+# Per-bucket histograms use 4 sub-buckets per power of two (about 80
+# counters from 0.01 ms to 10 s), keeping memory per device fixed
+HISTOGRAM_SUB_BUCKET_BITS = 2
+HISTOGRAM_HIGHEST_MS = 10000.0
+
+def new_histogram():
+    return LatencyHistogram(HISTOGRAM_SUB_BUCKET_BITS, highest_ms=HISTOGRAM_HIGHEST_MS)
+
+# ============================================================================
+# RING COUNTERS
+# ============================================================================
+
+class RollingWindow:
+    """
+    Ring of time buckets with running totals; a bucket's counts are
+    subtracted from the totals when it is reused for a newer slot
+    """
+
+    __slots__ = ("bucket_seconds", "buckets", "slots", "up", "down", "rtt_sum",
+                 "histograms", "head", "total_up", "total_down", "total_rtt_sum",
+                 "total_histogram")
+
+    def __init__(self, bucket_seconds, buckets):
+        self.bucket_seconds = bucket_seconds
+        self.buckets = buckets
+        self.slots = array('q', [-1] * buckets)
+        self.up = array('I', [0] * buckets)
+        self.down = array('I', [0] * buckets)
+        self.rtt_sum = array('d', [0.0] * buckets)
+        # Created on first use so idle devices stay small
+        self.histograms = [None] * buckets
+        self.head = -1
+        self.total_up = 0
+        self.total_down = 0
+        self.total_rtt_sum = 0.0
+        self.total_histogram = new_histogram()
+
+    def _clear(self, index):
+        self.total_up -= self.up[index]
+        self.total_down -= self.down[index]
+        self.total_rtt_sum -= self.rtt_sum[index]
+        histogram = self.histograms[index]
+        if histogram is not None and histogram.total:
+            self.total_histogram.subtract(histogram)
+            histogram.reset()
+        self.up[index] = 0
+        self.down[index] = 0
+        self.rtt_sum[index] = 0.0
+        self.slots[index] = -1
+
+    def advance(self, now):
+        """
+        Expire buckets that have fallen out of the window; amortized O(1)
+        """
+        slot = int(now // self.bucket_seconds)
+        if slot <= self.head:
+            return
+        first = max(self.head + 1, slot - self.buckets + 1)
+        for s in range(first, slot + 1):
+            index = s % self.buckets
+            if self.slots[index] != -1:
+                self._clear(index)
+        self.head = slot
+
+    def record(self, now, is_up, rtts_ms=()):
+        self.advance(now)
+        slot = int(now // self.bucket_seconds)
+        if slot <= self.head - self.buckets:
+            return  # older than the window
+        index = slot % self.buckets
+        self.slots[index] = slot
+        if is_up:
+            self.up[index] += 1
+            self.total_up += 1
+        else:
+            self.down[index] += 1
+            self.total_down += 1
+        if rtts_ms:
+            histogram = self.histograms[index]
+            if histogram is None:
+                histogram = self.histograms[index] = new_histogram()
+            for rtt_ms in rtts_ms:
+                self.rtt_sum[index] += rtt_ms
+                histogram.record(rtt_ms)
+                self.total_rtt_sum += rtt_ms
+                self.total_histogram.record(rtt_ms)
+
+    def summary(self):
+        total = self.total_up + self.total_down
+        samples = self.total_histogram.total
+        mean = self.total_rtt_sum / samples if samples else None
+        percentiles = self.total_histogram.percentiles((0.5, 0.95, 0.99))
+
+        def ms(value):
+            return round(value, 3) if value is not None else None
+
+        return {
+            "up": self.total_up,
+            "down": self.total_down,
+            "uptime_percent": round(self.total_up / total * 100, 3) if total else None,
+            "mean_rtt_ms": ms(mean),
+            "p50_rtt_ms": ms(percentiles[0.5]),
+            "p95_rtt_ms": ms(percentiles[0.95]),
+            "p99_rtt_ms": ms(percentiles[0.99]),
+        }
+
+# ============================================================================
+# PER-DEVICE TABLE
+# ============================================================================
+
+class RollingStatsTable:
+    """
+    Rolling windows for every device
+    """
+
+    def __init__(self, windows=WINDOWS):
+        self.windows = windows
+        self._devices = {}
+        self._changed = set()
+        self._lock = threading.Lock()
+        self.loaded = False
+
+    def record(self, device, is_up, rtt=None, now=None, samples=None):
+        """
+        Apply one probe result; rtt is in seconds. When a check sent several
+        echoes, pass every reply time as `samples` so the percentiles see them
+        """
+        now = time.time() if now is None else now
+        if samples is None:
+            samples = () if rtt is None else (rtt,)
+        rtts_ms = [sample * 1000 for sample in samples]
+        with self._lock:
+            windows = self._devices.get(device)
+            if windows is None:
+                windows = [RollingWindow(seconds, count) for _, seconds, count in self.windows]
+                self._devices[device] = windows
+            for window in windows:
+                window.record(now, is_up, rtts_ms)
+            self._changed.add(device)
+
+    def load(self, tail_reader, max_rows=100000):
+        """
+        Seed the windows from the end of the log once after a restart
+        """
+        if self.loaded:
+            return
+        self.loaded = True
+        parsed = (None, 0)
+        for _, row in tail_reader(max_rows):
+            if len(row) < 4:
+                continue
+            if row[0] != parsed[0]:
+                try:
+                    parsed = (row[0], time.mktime(time.strptime(row[0], '%Y-%m-%d %H:%M:%S')))
+                except ValueError:
+                    continue
+            rtt = None
+            if len(row) > 4 and row[4]:
+                try:
+                    rtt = float(row[4]) / 1000
+                except ValueError:
+                    pass
+            self.record(row[1], row[3].upper() == "UP", rtt, parsed[1])
+
+    def summary(self, device, now=None):
+        now = time.time() if now is None else now
+        with self._lock:
+            windows = self._devices.get(device)
+            if windows is None:
+                return None
+            result = {}
+            for (name, _, _), window in zip(self.windows, windows):
+                window.advance(now)
+                result[name] = window.summary()
+            return result
+
+    def snapshot(self, devices=None, now=None):
+        names = devices if devices is not None else self.devices()
+        return {name: summary for name in names
+                if (summary := self.summary(name, now)) is not None}
+
+    def worst(self, count, window="24h", now=None):
+        """
+        Devices with the lowest uptime in one window, worst first
+        """
+        now = time.time() if now is None else now
+        position = [name for name, _, _ in self.windows].index(window)
+        ranked = []
+        with self._lock:
+            for device, windows in self._devices.items():
+                current = windows[position]
+                current.advance(now)
+                total = current.total_up + current.total_down
+                if total:
+                    ranked.append((current.total_up / total, device))
+        ranked.sort()
+        return [device for _, device in ranked[:count]]
+
+    def forget(self, device):
+        """
+        Drop a device that is no longer monitored, with its windows
+        """
+        with self._lock:
+            if self._devices.pop(device, None) is None:
+                return False
+            # Reported as changed so summary caches drop it too
+            self._changed.add(device)
+            return True
+
+    def take_changed(self):
+        """
+        Devices recorded or forgotten since the previous call
+        """
+        with self._lock:
+            changed, self._changed = self._changed, set()
+        return changed
+
+    def devices(self):
+        with self._lock:
+            return list(self._devices)
+
+# ============================================================================
+# PUBLISHED SUMMARIES
+# ============================================================================
+
+class SummaryCache:
+    """
+    Summaries of every device in a table, refreshed at most every
+    `refresh_seconds` and only for devices recorded since the last refresh;
+    take_pending() returns what was refreshed since it was last called, with
+    None for devices forgotten by the table
+    """
+
+    def __init__(self, table, refresh_seconds):
+        self.table = table
+        self.refresh_seconds = refresh_seconds
+        self.summaries = {}
+        self.ranked = []
+        self.refreshed_at = 0.0
+        self._pending = {}
+        self._ranked_changed = False
+
+    def refresh(self, now=None):
+        now = time.time() if now is None else now
+        if now - self.refreshed_at < self.refresh_seconds:
+            return
+        self.refreshed_at = now
+        changed = self.table.take_changed()
+        summaries = self.table.snapshot(changed, now=now)
+        self.summaries.update(summaries)
+        self._pending.update(summaries)
+        for device in changed - summaries.keys():
+            self.summaries.pop(device, None)
+            self._pending[device] = None
+        ranked = self.table.worst(len(self.summaries), now=now)
+        if ranked != self.ranked:
+            self.ranked = ranked
+            self._ranked_changed = True
+
+    def take_pending(self):
+        """
+        ({device: summary or None if forgotten} refreshed since the last
+        call, the new ranking or None if it did not change)
+        """
+        pending, self._pending = self._pending, {}
+        ranked = self.ranked if self._ranked_changed else None
+        self._ranked_changed = False
+        return pending, ranked
@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""
+Central check scheduler
+One dispatcher thread keeps every device's next deadline in a heap and hands
+due checks to a bounded worker pool, so thousands of devices share a fixed
+number of threads
+"""
+
+import heapq
+import itertools
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import console
+
+# ============================================================================
+# JOBS
+# ============================================================================
+
+class Job:
+    """
+    A periodic check with a fixed-rate deadline
+    """
+
+    def __init__(self, key, interval, callback, args):
+        self.key = key
+        self.interval = interval
+        self.callback = callback
+        self.args = args
+        self.deadline = 0.0
+        self.running = False
+        self.cancelled = False
+        self.runs = 0
+        self.skipped = 0
+        self.last_lateness = 0.0
+        self.max_lateness = 0.0
+
+# ============================================================================
+# SCHEDULER
+# ============================================================================
+
+class Scheduler:
+    """
+    Heap-based scheduler dispatching due jobs to a ThreadPoolExecutor
+
+    Deadlines advance by exactly one interval from the previous deadline
+    (not from when the check finished), so probe time never accumulates as
+    drift. New jobs start at a random offset within their first interval.
+    """
+
+    def __init__(self, workers=32):
+        self.workers = workers
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="check")
+        self._heap = []
+        self._jobs = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._running = False
+        self._thread = None
+        self._listeners = []
+
+        # Lateness of each check's start relative to its deadline
+        self.checks_run = 0
+        self.checks_skipped = 0
+        self.total_lateness = 0.0
+        self.max_lateness = 0.0
+
+    def add_listener(self, callback):
+        """
+        Register callback(key, lateness) to be called as each check starts,
+        with its lateness in seconds
+        """
+        self._listeners.append(callback)
+
+    def add(self, key, interval, callback, *args, jitter=True):
+        """
+        Schedule callback(*args) every `interval` seconds under `key`,
+        replacing any existing job with the same key
+        """
+        job = Job(key, interval, callback, args)
+        offset = random.uniform(0, interval) if jitter else 0.0
+        job.deadline = time.monotonic() + offset
+        with self._condition:
+            previous = self._jobs.get(key)
+            if previous is not None:
+                previous.cancelled = True
+            self._jobs[key] = job
+            heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+            self._condition.notify()
+        return job
+
+    def remove(self, key):
+        """
+        Cancel the job registered under `key`, if any
+        """
+        with self._condition:
+            job = self._jobs.pop(key, None)
+            if job is not None:
+                job.cancelled = True
+            return job is not None
+
+    def reschedule(self, key, interval):
+        """
+        Change a job's interval. The next check moves to one new interval
+        after the previous one (or now, if that has already passed)
+        """
+        with self._condition:
+            job = self._jobs.get(key)
+            if job is None:
+                return False
+            if interval == job.interval:
+                return True
+            previous = job.deadline - job.interval
+            job.interval = interval
+            job.deadline = max(time.monotonic(), previous + interval)
+            heapq.heappush(self._heap, (job.deadline, next(self._counter), job))
+            self._condition.notify()
+            return True
+
+    def jobs(self):
+        with self._condition:
+            return dict(self._jobs)
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        self._thread = threading.Thread(target=self._dispatch_loop, name="scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, wait=True):
+        with self._condition:
+            self._running = False
+            self._condition.notify()
+        if self._thread is not None:
+            self._thread.join()
+        self._pool.shutdown(wait=wait)
+
+    def _dispatch_loop(self):
+        while True:
+            with self._condition:
+                if not self._running:
+                    return
+                if not self._heap:
+                    self._condition.wait()
+                    continue
+                deadline, _, job = self._heap[0]
+                now = time.monotonic()
+                if deadline > now:
+                    self._condition.wait(deadline - now)
+                    continue
+                heapq.heappop(self._heap)
+                if job.cancelled or deadline != job.deadline:
+                    continue  # removed, or superseded by reschedule()
+
+                # Next deadline stays on the fixed-rate grid; whole intervals
+                # that were missed entirely are skipped instead of bursting
+                next_deadline = deadline + job.interval
+                if next_deadline <= now:
+                    missed = int((now - next_deadline) // job.interval) + 1
+                    next_deadline += missed * job.interval
+                job.deadline = next_deadline
+                heapq.heappush(self._heap, (next_deadline, next(self._counter), job))
+
+                if job.running:
+                    # Previous check still in flight; don't stack another one
+                    job.skipped += 1
+                    self.checks_skipped += 1
+                    continue
+                job.running = True
+
+            self._pool.submit(self._run, job, deadline)
+
+    def _run(self, job, deadline):
+        try:
+            lateness = max(0.0, time.monotonic() - deadline)
+            job.last_lateness = lateness
+            job.max_lateness = max(job.max_lateness, lateness)
+            with self._condition:
+                self.checks_run += 1
+                self.total_lateness += lateness
+                self.max_lateness = max(self.max_lateness, lateness)
+            for listener in self._listeners:
+                try:
+                    listener(job.key, lateness)
+                except Exception as e:
+                    console.warning(f"⚠️  Lateness listener error: {e}", "listener_error", key=job.key)
+            try:
+                job.callback(*job.args)
+            except Exception as e:
+                console.warning(f"⚠️  Scheduled check {job.key} failed: {e}", "check_failed", key=job.key)
+        finally:
+            # Otherwise the job is never dispatched again
+            job.runs += 1
+            job.running = False
+
+    def stats(self):
+        """
+        Summary of dispatch counts and lateness in seconds
+        """
+        with self._condition:
+            return {
+                "jobs": len(self._jobs),
+                "workers": self.workers,
+                "checks_run": self.checks_run,
+                "checks_skipped": self.checks_skipped,
+                "mean_lateness": self.total_lateness / self.checks_run if self.checks_run else 0.0,
+                "max_lateness": self.max_lateness,
+            }
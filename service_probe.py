@@ -0,0 +1,755 @@
+#!/usr/bin/env python3
+"""
+Multiplexed service probes
+TCP connect and HTTP(S) GET checks run on non-blocking sockets driven by one
+selector thread, so thousands of service checks share a single thread.
+HTTP connections are kept alive between checks and reused when the server
+allows it. Each result carries a timing breakdown: connect and first byte.
+"""
+
+import asyncio
+import errno
+import heapq
+import itertools
+import os
+import selectors
+import socket
+import ssl
+import threading
+import time
+from collections import deque
+from concurrent.futures import Future
+from urllib.parse import urlsplit
+
+import console
+from probe_engine import ProbeResult, echo_series
+
+DEFAULT_TIMEOUT = float(os.environ.get("MONITOR_SERVICE_TIMEOUT", "2"))
+# Idle kept-alive connections are closed after this long, or when the server closes them
+IDLE_SECONDS = 50.0
+MAX_IDLE_PER_HOST = 4
+MAX_HEADER_BYTES = 65536
+PRUNE_SECONDS = 1.0
+USER_AGENT = "live-network-monitor"
+
+# ============================================================================
+# CHECK SPECIFICATIONS
+# ============================================================================
+
+class CheckSpec:
+    """
+    One service check: a TCP connect ("tcp"), or an HTTP GET ("http", over
+    TLS when `tls` is set) that must answer with the `expect` status
+    """
+
+    __slots__ = ("kind", "host", "port", "path", "tls", "expect", "timeout", "verify")
+
+    def __init__(self, kind, host, port, path="/", tls=False, expect=200, timeout=DEFAULT_TIMEOUT, verify=True):
+        if kind not in ("tcp", "http"):
+            raise ValueError(f"Unknown check type: {kind}")
+        if timeout <= 0:
+            raise ValueError("Check timeout must be positive")
+        self.kind = kind
+        self.host = host
+        self.port = port
+        self.path = path
+        self.tls = tls
+        self.expect = expect
+        self.timeout = timeout
+        self.verify = verify
+
+    @property
+    def scheme(self):
+        if self.kind == "tcp":
+            return "tcp"
+        return "https" if self.tls else "http"
+
+    def netloc(self, default_port=None):
+        host = f"[{self.host}]" if ":" in self.host else self.host
+        return host if self.port == default_port else f"{host}:{self.port}"
+
+    def _key(self):
+        return (self.kind, self.host, self.port, self.path, self.tls, self.expect, self.timeout, self.verify)
+
+    def __eq__(self, other):
+        return isinstance(other, CheckSpec) and self._key() == other._key()
+
+    def __hash__(self):
+        return hash(self._key())
+
+    def __str__(self):
+        if self.kind == "tcp":
+            return f"tcp://{self.netloc()}"
+        return f"{self.scheme}://{self.netloc(443 if self.tls else 80)}{self.path}"
+
+    def __repr__(self):
+        return f"CheckSpec({str(self)!r}, expect={self.expect}, timeout={self.timeout})"
+
+def _flag(value):
+    if isinstance(value, bool):
+        return value
+    return str(value).strip().lower() not in ("0", "off", "false", "no")
+
+def parse_check(value, ip, expect=None, timeout=None, verify=None):
+    """
+    Service check for one target, or None for ICMP. `value` is "icmp",
+    "tcp:PORT", "tcp://host:port", "http" / "https" (GET / on the target's
+    address) or an http(s) URL, in which {ip} stands for the target's address
+    """
+    if value is None:
+        return None
+    value = str(value).strip()
+    lowered = value.lower()
+    if lowered in ("", "icmp", "ping"):
+        return None
+    options = {}
+    if timeout not in (None, ""):
+        options["timeout"] = float(timeout)
+
+    address = f"[{ip}]" if ":" in ip else ip
+    if lowered in ("http", "https"):
+        value = f"{lowered}://{address}/"
+    elif lowered.startswith("tcp:") and not lowered.startswith("tcp://"):
+        value = f"tcp://{address}:{value[4:]}"
+    parts = urlsplit(value.replace("{ip}", address))
+    scheme = parts.scheme.lower()
+    try:
+        port = parts.port
+    except ValueError:
+        raise ValueError(f"Bad port in check: {value}")
+    if not parts.hostname:
+        raise ValueError(f"Check needs a host: {value}")
+
+    if scheme == "tcp":
+        if port is None:
+            raise ValueError(f"TCP check needs a port: {value}")
+        return CheckSpec("tcp", parts.hostname, port, **options)
+    if scheme in ("http", "https"):
+        tls = scheme == "https"
+        if expect not in (None, ""):
+            options["expect"] = int(expect)
+        if verify not in (None, ""):
+            options["verify"] = _flag(verify)
+        path = (parts.path or "/") + (f"?{parts.query}" if parts.query else "")
+        return CheckSpec("http", parts.hostname, port or (443 if tls else 80), path, tls, **options)
+    raise ValueError(f"Unknown check type: {value}")
+
+# ============================================================================
+# RESULTS
+# ============================================================================
+
+def _ms(seconds):
+    return round(seconds * 1000, 3) if seconds is not None else None
+
+def check_detail(check, connect, first_byte, status_code=None, error=None):
+    """
+    Timing breakdown of a service check for the live state, in milliseconds
+    """
+    return {"check": str(check), "connect_ms": _ms(connect), "first_byte_ms": _ms(first_byte),
+            "http_status": status_code, "error": error}
+
+class ServiceResult(ProbeResult):
+    """
+    Outcome of a service check: samples hold the time to a successful
+    connect (TCP) or response (HTTP). connect is None when a kept-alive
+    connection was reused; first_byte is HTTP only. Both are seconds since
+    the check started.
+    """
+
+    __slots__ = ("check", "connect", "first_byte", "status_code", "error", "reused")
+
+    def __init__(self, check, sent, samples, connect=None, first_byte=None, status_code=None, error=None,
+                 reused=False):
+        super().__init__(sent, samples)
+        self.check = check
+        self.connect = connect
+        self.first_byte = first_byte
+        self.status_code = status_code
+        self.error = error
+        self.reused = reused
+
+    def detail(self):
+        return check_detail(self.check, self.connect, self.first_byte, self.status_code, self.error)
+
+# ============================================================================
+# SELECTOR ENGINE
+# ============================================================================
+
+PHASES = {"connect": "connect", "handshake": "TLS handshake", "send": "request",
+          "headers": "response", "drain": "response body"}
+
+class _Check:
+    """
+    State of one check in flight, owned by the engine thread
+    """
+
+    __slots__ = ("spec", "address", "future", "started", "sock", "state", "pool_key", "request", "sent",
+                 "buffer", "connect", "first_byte", "status_code", "reused", "keep_alive", "chunked",
+                 "trailer", "remaining")
+
+    def __init__(self, spec, address, future):
+        self.spec = spec
+        self.address = address
+        self.future = future
+        self.started = time.perf_counter()
+        self.sock = None
+        self.state = "queued"
+        self.pool_key = (address, spec.tls, spec.host, spec.verify)
+        self.request = None
+        self.sent = 0
+        self.buffer = bytearray()
+        self.connect = None
+        self.first_byte = None
+        self.status_code = None
+        self.reused = False
+        self.keep_alive = True
+        self.chunked = False
+        self.trailer = False
+        self.remaining = 0
+
+class ServiceProbeEngine:
+    """
+    Runs TCP and HTTP(S) checks on one selector thread. Every check gets
+    its own deadline; HTTP connections go back to a per-host idle pool when
+    the response allows keep-alive, and a reused connection that turns out
+    to be closed is retried once on a fresh one.
+    """
+
+    name = "service"
+
+    def __init__(self, max_in_flight=4096, idle_seconds=IDLE_SECONDS, max_idle=MAX_IDLE_PER_HOST):
+        self.idle_seconds = idle_seconds
+        self.max_idle = max_idle
+        self._selector = selectors.DefaultSelector()
+        self._wake_recv, self._wake_send = socket.socketpair()
+        self._wake_recv.setblocking(False)
+        self._wake_send.setblocking(False)
+        self._selector.register(self._wake_recv, selectors.EVENT_READ)
+        self._incoming = deque()
+        self._deadlines = []
+        self._counter = itertools.count()
+        self._idle = {}
+        self._slots = threading.BoundedSemaphore(max_in_flight)
+        self._resolved = {}
+        self._tls = {}
+        self._pruned = time.monotonic()
+        self.checks = 0
+        self.connections_opened = 0
+        self.connections_reused = 0
+        self.idle_connections = 0
+        self._running = True
+
+        self._thread = threading.Thread(target=self._loop, name="service-probes", daemon=True)
+        self._thread.start()
+
+    def _resolve(self, host, port):
+        """
+        Resolve a host once and cache (family, sockaddr)
+        """
+        address = self._resolved.get((host, port))
+        if address is None:
+            family, _, _, _, sockaddr = socket.getaddrinfo(host, port, type=socket.SOCK_STREAM)[0]
+            address = self._resolved[(host, port)] = (family, sockaddr)
+        return address
+
+    def submit(self, spec):
+        """
+        Start one check and return a Future resolving to a ServiceResult
+        """
+        future = Future()
+        try:
+            address = self._resolve(spec.host, spec.port)
+        except OSError as e:
+            future.set_result(ServiceResult(spec, 1, [], error=f"resolve failed: {e}"))
+            return future
+
+        self._slots.acquire()
+        self._incoming.append(_Check(spec, address, future))
+        try:
+            self._wake_send.send(b"\0")
+        except OSError:
+            pass  # a wake-up is already pending
+        return future
+
+    def check(self, spec):
+        """
+        Run one check and return its ServiceResult
+        """
+        return self.submit(spec).result()
+
+    # ------------------------------------------------------------------
+    # Event loop
+    # ------------------------------------------------------------------
+
+    def _loop(self):
+        while self._running:
+            try:
+                self._run_once()
+            except Exception as e:
+                # Checks caught up in this keep their deadlines and time out
+                console.warning(f"⚠️  Service probe loop error: {e}", "service_probe_error")
+
+    def _run_once(self):
+        timeout = 0.5
+        if self._deadlines:
+            timeout = min(timeout, max(0.0, self._deadlines[0][0] - time.perf_counter()))
+        for key, _ in self._selector.select(timeout):
+            if key.fileobj is self._wake_recv:
+                try:
+                    while self._wake_recv.recv(4096):
+                        pass
+                except OSError:
+                    pass
+            elif isinstance(key.data, _Check):
+                self._advance(key.data)
+            else:
+                self._idle_readable(key.fileobj, key.data)
+        while self._incoming:
+            self._start(self._incoming.popleft())
+        self._expire()
+        if time.monotonic() - self._pruned >= PRUNE_SECONDS:
+            self._prune_idle()
+
+    def _start(self, check):
+        heapq.heappush(self._deadlines, (check.started + check.spec.timeout, next(self._counter), check))
+        try:
+            if check.spec.kind == "http":
+                check.request = self._request(check.spec)
+                pool = self._idle.get(check.pool_key)
+                if pool:
+                    sock, _ = pool.pop()
+                    self.idle_connections -= 1
+                    self.connections_reused += 1
+                    check.sock, check.reused, check.state = sock, True, "send"
+                    self._selector.modify(sock, selectors.EVENT_WRITE, check)
+                    return
+            self._connect(check)
+        except OSError as e:
+            self._fail(check, _describe(e))
+
+    def _request(self, spec):
+        return (f"GET {spec.path} HTTP/1.1\r\nHost: {spec.netloc(443 if spec.tls else 80)}\r\n"
+                f"User-Agent: {USER_AGENT}\r\nAccept: */*\r\nConnection: keep-alive\r\n\r\n").encode()
+
+    def _connect(self, check):
+        family, sockaddr = check.address
+        sock = socket.socket(family, socket.SOCK_STREAM)
+        sock.setblocking(False)
+        sock.setsockopt(socket.IPPROTO_TCP, socket.TCP_NODELAY, 1)
+        error = sock.connect_ex(sockaddr)
+        if error not in (0, errno.EINPROGRESS, errno.EWOULDBLOCK, errno.EAGAIN):
+            sock.close()
+            raise OSError(error, os.strerror(error))
+        self.connections_opened += 1
+        check.sock, check.reused, check.state = sock, False, "connect"
+        self._selector.register(sock, selectors.EVENT_WRITE, check)
+
+    def _advance(self, check):
+        """
+        Run one check as far as its socket allows without blocking
+        """
+        if check.state == "done":
+            return
+        try:
+            self._step(check)
+        except (OSError, ValueError) as e:
+            if check.reused and check.state in ("send", "headers") and check.first_byte is None:
+                # The server closed the kept-alive connection; try again on a new one
+                self._retry(check)
+            else:
+                self._fail(check, _describe(e))
+
+    def _retry(self, check):
+        self._close(check)
+        check.sent = 0
+        check.buffer = bytearray()
+        try:
+            self._connect(check)
+        except OSError as e:
+            self._fail(check, _describe(e))
+
+    def _step(self, check):
+        spec = check.spec
+        if check.state == "connect":
+            error = check.sock.getsockopt(socket.SOL_SOCKET, socket.SO_ERROR)
+            if error:
+                raise OSError(error, os.strerror(error))
+            check.connect = time.perf_counter() - check.started
+            if spec.kind == "tcp":
+                self._settle(check, check.connect)
+                self._close(check)
+                return
+            if spec.tls:
+                self._selector.unregister(check.sock)
+                check.sock = self._tls_context(spec.verify).wrap_socket(
+                    check.sock, server_hostname=spec.host, do_handshake_on_connect=False)
+                self._selector.register(check.sock, selectors.EVENT_WRITE, check)
+                check.state = "handshake"
+            else:
+                check.state = "send"
+
+        if check.state == "handshake":
+            try:
+                check.sock.do_handshake()
+            except ssl.SSLWantReadError:
+                return self._watch(check, selectors.EVENT_READ)
+            except ssl.SSLWantWriteError:
+                return self._watch(check, selectors.EVENT_WRITE)
+            check.state = "send"
+
+        if check.state == "send":
+            try:
+                check.sent += check.sock.send(check.request[check.sent:])
+            except (BlockingIOError, ssl.SSLWantWriteError):
+                return self._watch(check, selectors.EVENT_WRITE)
+            except ssl.SSLWantReadError:
+                return self._watch(check, selectors.EVENT_READ)
+            if check.sent < len(check.request):
+                return self._watch(check, selectors.EVENT_WRITE)
+            check.state = "headers"
+            return self._watch(check, selectors.EVENT_READ)
+
+        self._receive(check)
+
+    def _watch(self, check, events):
+        self._selector.modify(check.sock, events, check)
+
+    def _receive(self, check):
+        # TLS sockets can hold decrypted data the selector won't report, so
+        # read until the socket would block
+        while True:
+            try:
+                data = check.sock.recv(65536)
+            except (BlockingIOError, ssl.SSLWantReadError, ssl.SSLWantWriteError):
+                return
+            if not data:
+                if check.state == "headers":
+                    raise ConnectionResetError("connection closed before the response")
+                return self._close(check)  # body framed by the close
+
+            if check.first_byte is None:
+                check.first_byte = time.perf_counter() - check.started
+            if check.state == "headers":
+                check.buffer += data
+                end = check.buffer.find(b"\r\n\r\n")
+                if end < 0:
+                    if len(check.buffer) > MAX_HEADER_BYTES:
+                        raise ValueError("response headers too large")
+                    continue
+                head, data = bytes(check.buffer[:end]), bytes(check.buffer[end + 4:])
+                check.buffer = bytearray()
+                self._respond(check, head)
+                if check.state != "drain":
+                    return
+            if self._consume(check, data):
+                return self._release(check)
+
+    def _respond(self, check, head):
+        """
+        Settle the check from the status line and pick how the body is framed
+        """
+        lines = head.decode("latin-1").split("\r\n")
+        parts = lines[0].split(" ", 2)
+        if len(parts) < 2 or not parts[0].startswith("HTTP/") or not parts[1].isdigit():
+            raise ValueError("malformed response")
+        status = check.status_code = int(parts[1])
+        headers = {}
+        for line in lines[1:]:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip().lower()
+
+        if status == check.spec.expect:
+            self._settle(check, time.perf_counter() - check.started)
+        else:
+            self._settle(check, None, f"HTTP {status}, expected {check.spec.expect}")
+
+        connection = headers.get("connection", "")
+        check.keep_alive = "close" not in connection and (parts[0] != "HTTP/1.0" or "keep-alive" in connection)
+        if status in (204, 304):
+            check.remaining = 0
+        elif "chunked" in headers.get("transfer-encoding", ""):
+            check.chunked = True
+        elif headers.get("content-length", "").isdigit():
+            check.remaining = int(headers["content-length"])
+        else:
+            check.keep_alive = False  # body runs to the close; not worth reading
+        if not check.keep_alive or 100 <= status < 200:
+            return self._close(check)
+        check.state = "drain"
+
+    def _consume(self, check, data):
+        """
+        Discard body bytes; True once the whole body has been read
+        """
+        if not check.chunked:
+            check.remaining -= len(data)
+            if check.remaining < 0:
+                check.keep_alive = False  # more than the body; don't trust the connection
+            return check.remaining <= 0
+        buffer = check.buffer
+        buffer += data
+        while True:
+            if check.remaining:
+                skip = min(check.remaining, len(buffer))
+                del buffer[:skip]
+                check.remaining -= skip
+                if check.remaining:
+                    return False
+            if check.trailer:
+                if buffer.startswith(b"\r\n") or buffer.find(b"\r\n\r\n") >= 0:
+                    return True
+                if len(buffer) > MAX_HEADER_BYTES:
+                    raise ValueError("chunk trailer too large")
+                return False
+            end = buffer.find(b"\r\n")
+            if end < 0:
+                if len(buffer) > 1024:
+                    raise ValueError("malformed chunk")
+                return False
+            size = int(bytes(buffer[:end]).split(b";")[0].strip(), 16)
+            del buffer[:end + 2]
+            if size == 0:
+                check.trailer = True
+            else:
+                check.remaining = size + 2  # chunk data and its CRLF
+
+    def _release(self, check):
+        """
+        Response fully read: park the connection for the next check to the same host
+        """
+        pool = self._idle.setdefault(check.pool_key, [])
+        if not check.keep_alive or len(pool) >= self.max_idle:
+            return self._close(check)
+        self._selector.modify(check.sock, selectors.EVENT_READ, check.pool_key)
+        pool.append((check.sock, time.monotonic()))
+        self.idle_connections += 1
+        check.sock, check.state = None, "done"
+
+    def _idle_readable(self, sock, pool_key):
+        """
+        An idle connection became readable: closed by the server, or sent
+        something unasked for. Either way it can't be reused.
+        """
+        try:
+            sock.recv(1)
+        except (BlockingIOError, ssl.SSLWantReadError):
+            return  # TLS session tickets and the like; still usable
+        except OSError:
+            pass
+        self._drop_idle(pool_key, sock)
+
+    def _drop_idle(self, pool_key, sock):
+        pool = self._idle.get(pool_key, [])
+        for index, (pooled, _) in enumerate(pool):
+            if pooled is sock:
+                del pool[index]
+                self.idle_connections -= 1
+                break
+        self._selector.unregister(sock)
+        sock.close()
+
+    def _prune_idle(self):
+        self._pruned = now = time.monotonic()
+        for pool_key, pool in list(self._idle.items()):
+            for sock, since in [entry for entry in pool if now - entry[1] >= self.idle_seconds]:
+                self._drop_idle(pool_key, sock)
+            if not pool:
+                del self._idle[pool_key]
+
+    def _expire(self):
+        now = time.perf_counter()
+        while self._deadlines and self._deadlines[0][0] <= now:
+            _, _, check = heapq.heappop(self._deadlines)
+            if check.state != "done":
+                self._fail(check, f"timeout ({PHASES.get(check.state, check.state)})")
+
+    def _settle(self, check, elapsed, error=None):
+        """
+        Resolve the caller's future; a body may still be read afterwards
+        """
+        if check.future.done():
+            return
+        check.future.set_result(ServiceResult(
+            check.spec, 1, [] if elapsed is None else [elapsed], check.connect, check.first_byte,
+            check.status_code, error, check.reused))
+        self.checks += 1
+        self._slots.release()
+
+    def _fail(self, check, error):
+        self._settle(check, None, error)
+        self._close(check)
+
+    def _close(self, check):
+        if check.sock is not None:
+            try:
+                self._selector.unregister(check.sock)
+            except (KeyError, ValueError):
+                pass
+            check.sock.close()
+            check.sock = None
+        check.state = "done"
+
+    def _tls_context(self, verify):
+        context = self._tls.get(verify)
+        if context is None:
+            context = ssl.create_default_context()
+            if not verify:
+                context.check_hostname = False
+                context.verify_mode = ssl.CERT_NONE
+            self._tls[verify] = context
+        return context
+
+    def stats(self):
+        return {"checks": self.checks, "connections_opened": self.connections_opened,
+                "connections_reused": self.connections_reused, "idle_connections": self.idle_connections}
+
+    def close(self):
+        self._running = False
+        try:
+            self._wake_send.send(b"\0")
+        except OSError:
+            pass
+        self._thread.join(timeout=1)
+        while self._incoming:
+            self._fail(self._incoming.popleft(), "engine closed")
+        for _, _, check in self._deadlines:
+            if check.state != "done":
+                self._fail(check, "engine closed")
+        for pool_key, pool in list(self._idle.items()):
+            for sock, _ in list(pool):
+                self._drop_idle(pool_key, sock)
+        self._selector.close()
+        self._wake_recv.close()
+        self._wake_send.close()
+
+def _describe(error):
+    if isinstance(error, ssl.SSLCertVerificationError):
+        return f"certificate: {error.verify_message}"
+    if isinstance(error, OSError) and error.strerror:
+        return error.strerror
+    return str(error) or type(error).__name__
+
+# ============================================================================
+# CHECK SERIES AND ENGINE SELECTION
+# ============================================================================
+
+_default_engine = None
+_default_engine_lock = threading.Lock()
+
+def get_default_engine():
+    """
+    Return the process-wide service probe engine, creating it on first use
+    """
+    global _default_engine
+    with _default_engine_lock:
+        if _default_engine is None:
+            _default_engine = ServiceProbeEngine()
+        return _default_engine
+
+def engine_stats():
+    """
+    Stats of the process-wide engine, or None before the first service check
+    """
+    return _default_engine.stats() if _default_engine is not None else None
+
+def check_series(check, count=1, interval=0.2, engine=None):
+    """
+    Run a service check `count` times, spaced by `interval`, and summarise
+    them like echo_series; the timing breakdown is that of the last one
+    """
+    engine = engine or get_default_engine()
+    futures = []
+    for i in range(count):
+        if i:
+            time.sleep(interval)
+        futures.append(engine.submit(check))
+    if count <= 1:
+        return futures[0].result()
+    results = [future.result() for future in futures]
+    last = results[-1]
+    return ServiceResult(check, count, [sample for result in results for sample in result.samples],
+                         last.connect, last.first_byte, last.status_code, last.error, last.reused)
+
+def probe_series(target, count=1, interval=0.2, backend=None, engine=None):
+    """
+    check_series for a CheckSpec, echo_series for an address
+    """
+    if isinstance(target, CheckSpec):
+        return check_series(target, count, interval, engine)
+    return echo_series(target, count, interval=interval, backend=backend)
+
+# ============================================================================
+# LOOPBACK BENCHMARK
+# ============================================================================
+
+def serve_stand_in(host="127.0.0.1"):
+    """
+    Local keep-alive HTTP listener that answers every request with 200 OK,
+    standing in for real services. Returns (port, stop)
+    """
+    loop = asyncio.new_event_loop()
+    writers = set()
+
+    async def handle(reader, writer):
+        writers.add(writer)
+        try:
+            while True:
+                await reader.readuntil(b"\r\n\r\n")
+                writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/plain\r\nContent-Length: 2\r\n\r\nok")
+                await writer.drain()
+        except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, ConnectionError):
+            pass
+        finally:
+            writers.discard(writer)
+            writer.close()
+
+    async def shutdown():
+        # Closing each connection ends its handler, so none is left pending
+        server.close()
+        handlers = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for writer in list(writers):
+            writer.close()
+        await asyncio.gather(*handlers, return_exceptions=True)
+        loop.stop()
+
+    def stop():
+        asyncio.run_coroutine_threadsafe(shutdown(), loop)
+        thread.join()
+        loop.close()
+
+    server = loop.run_until_complete(asyncio.start_server(handle, host, 0, backlog=4096))
+    thread = threading.Thread(target=loop.run_forever, name="stand-in", daemon=True)
+    thread.start()
+    return server.sockets[0].getsockname()[1], stop
+
+def benchmark(counts=(1000, 5000)):
+    """
+    Measure TCP and HTTP checks per second against a local stand-in; HTTP
+    runs twice per count, on fresh and then on kept-alive connections
+    """
+    port, stop = serve_stand_in()
+    engine = ServiceProbeEngine(max_idle=max(counts))
+    checks = (("tcp", parse_check(f"tcp:{port}", "127.0.0.1")),
+              ("http", parse_check(f"http://{{ip}}:{port}/health", "127.0.0.1")),
+              ("http", parse_check(f"http://{{ip}}:{port}/health", "127.0.0.1")))
+    results = {}
+    try:
+        for count in counts:
+            for kind, check in checks:
+                reused = engine.connections_reused
+                started = time.perf_counter()
+                replies = [future.result() for future in [engine.submit(check) for _ in range(count)]]
+                elapsed = time.perf_counter() - started
+                up = sum(1 for result in replies if result.is_up)
+                reused = engine.connections_reused - reused
+                results.setdefault(count, []).append({"kind": kind, "checks_per_sec": count / elapsed,
+                                                      "up": up, "reused": reused})
+                print(f"{kind:>10} {count:>6} checks: {count / elapsed:,.0f} checks/sec "
+                      f"({up}/{count} up in {elapsed:.2f}s, {reused} reused connections)")
+    finally:
+        engine.close()
+        stop()
+    return results
+
+if __name__ == "__main__":
+    benchmark()
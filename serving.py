@@ -0,0 +1,662 @@
+#!/usr/bin/env python3
+"""
+Production serving mode
+A threaded HTTP/1.1 server with keep-alive and gzip. With web worker
+processes, the probe process publishes a snapshot of its live state into
+shared memory and each worker serves the dashboard and APIs from it, so
+page loads never wait on probes and probe bursts never wait on page loads.
+"""
+
+import gzip
+import json
+import multiprocessing
+import signal
+import struct
+import threading
+import time
+from collections import deque
+from multiprocessing import shared_memory
+
+from werkzeug.exceptions import InternalServerError
+from werkzeug.serving import WSGIRequestHandler, make_server as werkzeug_server
+
+import console
+
+# Idle keep-alive connections are closed after this many seconds
+KEEPALIVE_SECONDS = 30
+
+GZIP_MIN_BYTES = 512
+GZIP_LEVEL = 5
+GZIP_TYPES = ("text/html", "text/css", "text/plain", "text/csv", "application/json",
+              "application/javascript", "text/javascript")
+
+# sequence (odd while a write is in progress), payload length
+SNAPSHOT_HEADER = struct.Struct("<QI")
+# followed by a counter web workers bump to ask for a full snapshot
+FULL_REQUESTS = struct.Struct("<I")
+PAYLOAD_OFFSET = SNAPSHOT_HEADER.size + FULL_REQUESTS.size
+SNAPSHOT_BYTES = 64 * 1024 * 1024
+PUBLISH_SECONDS = 0.5
+# Each payload repeats this many recent sets of changes, so a worker that
+# misses a few publishes still catches up without a full snapshot
+DELTA_WINDOW = 8
+FOLLOW_SECONDS = 0.25
+READ_ATTEMPTS = 50
+WATCH_SECONDS = 0.5
+
+# ============================================================================
+# HTTP SERVER
+# ============================================================================
+
+class KeepAliveRequestHandler(WSGIRequestHandler):
+    """
+    HTTP/1.1 with keep-alive, so browsers and API clients reuse one
+    connection; responses without a length are sent chunked.
+
+    Werkzeug's own handler closes every connection and then drains the
+    socket, which would swallow the next request on a reused connection.
+    Requests with a body are still answered with Connection: close, so an
+    unread body is never mistaken for the next request line. run_wsgi is
+    not a public hook, so requirements.txt pins Werkzeug to the releases
+    this was checked against.
+    """
+
+    protocol_version = "HTTP/1.1"
+    timeout = KEEPALIVE_SECONDS
+    # Headers and body are separate writes; don't let the body wait for an ACK
+    disable_nagle_algorithm = True
+
+    def run_wsgi(self):
+        if self.headers.get("Expect", "").lower().strip() == "100-continue":
+            self.wfile.write(b"HTTP/1.1 100 Continue\r\n\r\n")
+
+        self.environ = environ = self.make_environ()
+        has_body = (environ.get("CONTENT_LENGTH", "") not in ("", "0")
+                    or "chunked" in environ.get("HTTP_TRANSFER_ENCODING", "").lower())
+        response = {"status": None, "headers": None, "sent": False, "chunked": False}
+
+        def write(data):
+            if not response["sent"]:
+                response["sent"] = True
+                code, _, message = response["status"].partition(" ")
+                code = int(code)
+                self.send_response(code, message)
+                keys = set()
+                for key, value in response["headers"]:
+                    self.send_header(key, value)
+                    keys.add(key.lower())
+                if not ("content-length" in keys or environ["REQUEST_METHOD"] == "HEAD"
+                        or 100 <= code < 200 or code in (204, 304)):
+                    response["chunked"] = True
+                    self.send_header("Transfer-Encoding", "chunked")
+                if has_body or self.close_connection:
+                    self.send_header("Connection", "close")
+                self.end_headers()
+            if data:
+                if response["chunked"]:
+                    self.wfile.write(b"%x\r\n%s\r\n" % (len(data), data))
+                else:
+                    self.wfile.write(data)
+            self.wfile.flush()
+
+        def start_response(status, headers, exc_info=None):
+            if exc_info and response["sent"]:
+                raise exc_info[1].with_traceback(exc_info[2])
+            response["status"], response["headers"] = status, headers
+            return write
+
+        def execute(app):
+            body = app(environ, start_response)
+            try:
+                for data in body:
+                    write(data)
+                if not response["sent"]:
+                    write(b"")
+                if response["chunked"]:
+                    self.wfile.write(b"0\r\n\r\n")
+                    self.wfile.flush()
+            finally:
+                if hasattr(body, "close"):
+                    body.close()
+
+        try:
+            execute(self.server.app)
+        except (ConnectionError, TimeoutError):
+            self.close_connection = True
+        except Exception as e:
+            self.close_connection = True
+            if not response["sent"]:
+                try:
+                    execute(InternalServerError())
+                except Exception:
+                    pass
+            self.server.log("error", f"Error on request {self.path}: {e!r}")
+
+    def log_request(self, code="-", size="-"):
+        pass  # per-request access logging costs more than most responses
+
+def make_server(app, host, port, fd=None):
+    """
+    Thread-per-connection WSGI server; pass `fd` to serve a socket that was
+    bound by a parent process
+    """
+    return werkzeug_server(host, port, app, threaded=True, request_handler=KeepAliveRequestHandler, fd=fd)
+
+def compress(response, accept_encoding):
+    """
+    Gzip a buffered text response when the client accepts it. Streams
+    (SSE, CSV exports) are left alone, and a strong ETag becomes weak so
+    conditional requests still match the uncompressed representation.
+    """
+    if (response.direct_passthrough or response.is_streamed or response.status_code != 200
+            or "gzip" not in accept_encoding or "Content-Encoding" in response.headers
+            or response.mimetype not in GZIP_TYPES):
+        return response
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    if len(body) < GZIP_MIN_BYTES:
+        return response
+    response.set_data(gzip.compress(body, GZIP_LEVEL))
+    response.headers["Content-Encoding"] = "gzip"
+    etag, weak = response.get_etag()
+    if etag and not weak:
+        response.set_etag(etag, weak=True)
+    return response
+
+# ============================================================================
+# SHARED-MEMORY SNAPSHOT
+# ============================================================================
+
+class SnapshotWriter:
+    """
+    Single writer of a seqlock-protected payload in shared memory. Readers
+    copy the payload and retry if the sequence moved while they read.
+    """
+
+    def __init__(self, size=SNAPSHOT_BYTES):
+        self.shm = shared_memory.SharedMemory(create=True, size=size)
+        self.sequence = 0
+        self.published = 0
+        self.oversized = 0
+        SNAPSHOT_HEADER.pack_into(self.shm.buf, 0, 0, 0)
+        FULL_REQUESTS.pack_into(self.shm.buf, SNAPSHOT_HEADER.size, 0)
+
+    @property
+    def name(self):
+        return self.shm.name
+
+    def publish(self, payload):
+        """
+        Replace the snapshot; returns False if it does not fit
+        """
+        end = PAYLOAD_OFFSET + len(payload)
+        if end > self.shm.size:
+            self.oversized += 1
+            return False
+        buf = self.shm.buf
+        self.sequence += 1
+        SNAPSHOT_HEADER.pack_into(buf, 0, self.sequence, len(payload))
+        buf[PAYLOAD_OFFSET:end] = payload
+        self.sequence += 1
+        SNAPSHOT_HEADER.pack_into(buf, 0, self.sequence, len(payload))
+        self.published += 1
+        return True
+
+    def requests(self):
+        """
+        How many times readers have asked for a full snapshot
+        """
+        return FULL_REQUESTS.unpack_from(self.shm.buf, SNAPSHOT_HEADER.size)[0]
+
+    def close(self):
+        self.shm.close()
+        self.shm.unlink()
+
+class SnapshotReader:
+    """
+    Attaches to a SnapshotWriter's block from another process
+    """
+
+    def __init__(self, name):
+        self.shm = shared_memory.SharedMemory(name=name)
+        self.sequence = 0
+
+    def read(self):
+        """
+        The latest payload, or None if it has not changed since the last
+        read (or a write was in progress on every attempt)
+        """
+        buf = self.shm.buf
+        for _ in range(READ_ATTEMPTS):
+            sequence, length = SNAPSHOT_HEADER.unpack_from(buf, 0)
+            if sequence == self.sequence:
+                return None
+            if sequence & 1:
+                time.sleep(0.001)
+                continue
+            payload = bytes(buf[PAYLOAD_OFFSET:PAYLOAD_OFFSET + length])
+            if SNAPSHOT_HEADER.unpack_from(buf, 0)[0] == sequence:
+                self.sequence = sequence
+                return payload
+        return None
+
+    def request_full(self):
+        """
+        Ask the writer to include a full snapshot in its next payload.
+        Two readers asking at once may count as one, which is all they need.
+        """
+        buf = self.shm.buf
+        requests = FULL_REQUESTS.unpack_from(buf, SNAPSHOT_HEADER.size)[0]
+        FULL_REQUESTS.pack_into(buf, SNAPSHOT_HEADER.size, (requests + 1) & 0xFFFFFFFF)
+
+    def close(self):
+        self.shm.close()
+
+class SnapshotPublisher:
+    """
+    Probe-process thread that publishes every PUBLISH_SECONDS while
+    version() keeps changing. A payload carries the last DELTA_WINDOW
+    results of changes(); the full state from build() is only serialized
+    into the first payload and when a reader asks for it.
+    """
+
+    def __init__(self, writer, build, changes, version, interval=PUBLISH_SECONDS, window=DELTA_WINDOW):
+        self.writer = writer
+        self.build = build
+        self.changes = changes
+        self.version = version
+        self.interval = interval
+        self.build_seconds = 0.0
+        self.full_builds = 0
+        self.sequence = 0
+        self._deltas = deque(maxlen=window)
+        self._stopping = threading.Event()
+        self._thread = None
+
+    def start(self):
+        self._thread = threading.Thread(target=self._run, name="snapshot-publisher", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        published = None
+        served = 0
+        while not self._stopping.is_set():
+            version = self.version()
+            requests = self.writer.requests()
+            if version != published or requests != served:
+                started = time.perf_counter()
+                full = self.sequence == 0 or requests != served
+                try:
+                    payload = self._payload(full)
+                except Exception as e:
+                    console.warning(f"⚠️  Snapshot failed: {e}", "snapshot_error")
+                    payload = None
+                if payload is not None and self.writer.publish(payload):
+                    published = version
+                    if full:
+                        served = requests
+                elif payload is not None and self.writer.oversized == 1:
+                    console.warning(f"⚠️  Snapshot of {len(payload)} bytes does not fit in {self.writer.shm.size}",
+                                    "snapshot_error", size=len(payload))
+                self.build_seconds = time.perf_counter() - started
+            self._stopping.wait(self.interval)
+
+    def _payload(self, full):
+        """
+        {"seq": n, "full": build() if full, "deltas": [changes, ...]}; each
+        set of changes is serialized once and reused while in the window
+        """
+        changes = self.changes()
+        self.sequence += 1
+        if self.sequence > 1:
+            changes["seq"] = self.sequence
+            self._deltas.append(json.dumps(changes, separators=(",", ":")).encode("utf-8"))
+        parts = [b'{"seq":%d' % self.sequence]
+        if full:
+            self.full_builds += 1
+            parts.append(b',"full":' + json.dumps(self.build(), separators=(",", ":")).encode("utf-8"))
+        parts.append(b',"deltas":[' + b",".join(self._deltas) + b"]}")
+        return b"".join(parts)
+
+    def stop(self):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join()
+
+# ============================================================================
+# WEB WORKER VIEWS
+# ============================================================================
+
+class SnapshotStates:
+    """
+    Read-only stand-in for DeviceStateTable backed by the latest snapshot
+    """
+
+    loaded = True
+
+    def __init__(self):
+        self.states = {}
+        self.counts = {"devices": 0, "up": 0, "down": 0}
+        self.latest_device = None
+
+    def load(self, tail_reader, max_rows=None, values=None):
+        pass
+
+    def get(self, device):
+        return self.states.get(device)
+
+    def latest(self):
+        return self.states.get(self.latest_device)
+
+    def snapshot(self, devices=None):
+        states = self.states
+        if devices is None:
+            return dict(states)
+        return {name: states[name] for name in devices if name in states}
+
+    def summary(self):
+        return dict(self.counts)
+
+    def __len__(self):
+        return len(self.states)
+
+class SnapshotUptime:
+    """
+    Read-only stand-in for RollingStatsTable backed by the latest snapshot
+    """
+
+    loaded = True
+
+    def __init__(self):
+        self.windows = []
+        self.devices = {}
+        self.ranked = []
+
+    def load(self, tail_reader, max_rows=None):
+        pass
+
+    def summary(self, device):
+        return self.devices.get(device)
+
+    def snapshot(self, devices=None):
+        summaries = self.devices
+        if devices is None:
+            return dict(summaries)
+        return {name: summaries[name] for name in devices if name in summaries}
+
+    def worst(self, count):
+        return self.ranked[:count]
+
+class SnapshotEvents:
+    """
+    Read-only stand-in for TransitionLog backed by the latest snapshot
+    """
+
+    loaded = True
+    capacity = 1000
+
+    def __init__(self):
+        self.changes = []
+        self.counts = {}
+
+    def load(self, tail_reader, max_rows=None):
+        pass
+
+    def recent(self, devices=None, limit=100):
+        changes = self.changes
+        if devices:
+            wanted = set(devices)
+            changes = [change for change in changes if change["device"] in wanted]
+        return changes[:limit]
+
+    def stats(self):
+        return dict(self.counts)
+
+class SnapshotView:
+    """
+    Everything a web worker serves, kept current from the published
+    payloads: one full snapshot, then each set of changes in order. A
+    follower thread polls the shared block, hands rows newer than the
+    last one seen to on_rows(rows, cursors), turns status and flapping
+    changes into on_event(event, data) calls for /stream, and passes the
+    names of devices no longer monitored to on_removed(names).
+    """
+
+    # Fields applied to the tables; everything else is served through get()
+    TABLE_FIELDS = ("seq", "rows", "cursor", "after", "states", "removed", "summary", "latest",
+                    "windows", "uptime", "worst", "events", "event_stats")
+
+    def __init__(self, name, on_rows=None, on_event=None, backfill=None, on_removed=None):
+        self.reader = SnapshotReader(name)
+        self.on_rows = on_rows
+        self.on_event = on_event
+        self.on_removed = on_removed
+        self.backfill = backfill
+        self.states = SnapshotStates()
+        self.uptime = SnapshotUptime()
+        self.events = SnapshotEvents()
+        self.data = {}
+        self.sequence = 0
+        self.cursor = 0
+        self.initial_cursor = 0
+        self.initial_rows = []
+        self.full_requests = 0
+        self.updated = threading.Event()
+        self._behind = False
+        self._thread = None
+
+    def groups(self):
+        return self.data.get("groups", {})
+
+    def get(self, key, default=None):
+        """
+        A scalar snapshot field (generation, log_modified, metrics, ...)
+        """
+        return self.data.get(key, default)
+
+    def load(self, timeout=None):
+        """
+        Apply the first full snapshot on this thread; False if none was
+        published within `timeout` seconds
+        """
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while not self.updated.is_set():
+            payload = self.reader.read()
+            if payload is not None:
+                self.apply(json.loads(payload))
+            elif deadline is not None and time.monotonic() >= deadline:
+                return False
+            else:
+                time.sleep(FOLLOW_SECONDS)
+        return True
+
+    def start(self):
+        """
+        Follow later payloads on a background thread
+        """
+        self._thread = threading.Thread(target=self._follow, name="snapshot-follower", daemon=True)
+        self._thread.start()
+
+    def _follow(self):
+        while True:
+            payload = self.reader.read()
+            if payload is not None:
+                try:
+                    self.apply(json.loads(payload))
+                except Exception as e:
+                    console.warning(f"⚠️  Snapshot update failed: {e}", "snapshot_error")
+            time.sleep(FOLLOW_SECONDS)
+
+    def apply(self, payload):
+        """
+        Apply one payload: its full snapshot if this view has none yet or
+        missed changes, then every set of changes newer than the last applied
+        """
+        full = payload.get("full")
+        if full is not None and (self.sequence == 0 or self._behind):
+            self._apply_full(full, payload["seq"])
+        if self.sequence == 0 or self._behind:
+            self._request_full()
+            return
+        deltas = [delta for delta in payload["deltas"] if delta["seq"] > self.sequence]
+        if deltas and deltas[0]["seq"] != self.sequence + 1:
+            # Missed more publishes than the window repeats
+            self._behind = True
+            self._request_full()
+            return
+        for delta in deltas:
+            self._apply_delta(delta)
+
+    def _request_full(self):
+        self.full_requests += 1
+        self.reader.request_full()
+
+    def _apply_full(self, data, sequence):
+        previous = self.states.states
+        first = not self.updated.is_set()
+
+        # Each table's fields are swapped in place, so app globals bound to
+        # these objects see the new snapshot
+        self.states.states, self.states.counts, self.states.latest_device = (
+            data["states"], data["summary"], data["latest"])
+        self.uptime.windows, self.uptime.devices, self.uptime.ranked = data["windows"], data["uptime"], data["worst"]
+        self.events.changes, self.events.counts = data["events"], data["event_stats"]
+
+        if first:
+            # Rows up to this cursor are seeded from here or loaded from disk
+            self.initial_rows = [tuple(record) for record in data["rows"]]
+            self.initial_cursor = self.cursor = data["cursor"]
+        else:
+            self._deliver_rows(data["rows"], data["cursor"])
+            self._deliver_changes(previous, self.states.states)
+            self._deliver_removed([name for name in previous if name not in self.states.states])
+        self.data = {key: value for key, value in data.items() if key not in self.TABLE_FIELDS}
+        self.sequence = sequence
+        self._behind = False
+        self.updated.set()
+
+    def _apply_delta(self, delta):
+        previous = self.states.states
+        if delta["states"] or delta["removed"]:
+            states = dict(previous)
+            states.update(delta["states"])
+            for name in delta["removed"]:
+                states.pop(name, None)
+            self.states.states = states
+        self.states.counts, self.states.latest_device = delta["summary"], delta["latest"]
+        if "uptime" in delta:
+            devices = dict(self.uptime.devices)
+            for name, summary in delta["uptime"].items():
+                if summary is None:
+                    devices.pop(name, None)
+                else:
+                    devices[name] = summary
+            self.uptime.devices = devices
+        if "worst" in delta:
+            self.uptime.ranked = delta["worst"]
+        if "events" in delta:
+            self.events.changes = (delta["events"] + self.events.changes)[:self.events.capacity]
+        self.events.counts = delta["event_stats"]
+
+        self._deliver_rows(delta["rows"], delta["cursor"], delta["after"])
+        self._deliver_changes(previous, delta["states"])
+        self._deliver_removed(delta["removed"])
+        data = dict(self.data)
+        data.update((key, value) for key, value in delta.items() if key not in self.TABLE_FIELDS)
+        self.data = data
+        self.sequence = delta["seq"]
+
+    def _deliver_rows(self, records, cursor, after=None):
+        if (records and records[0][0] > self.cursor and after != self.cursor
+                and self.backfill is not None):
+            # More rows arrived between two reads than the snapshot carries
+            records = self.backfill(self.cursor, records[0][0]) + records
+        fresh = [record for record in records if record[0] > self.cursor]
+        if fresh and self.on_rows is not None:
+            self.on_rows([row for _, row in fresh], [offset for offset, _ in fresh])
+        self.cursor = max(self.cursor, cursor)
+
+    def _deliver_removed(self, names):
+        if names and self.on_removed is not None:
+            self.on_removed(names)
+
+    def _deliver_changes(self, previous, current):
+        if self.on_event is None:
+            return
+        for name, state in current.items():
+            before = previous.get(name)
+            if before is None:
+                continue
+            if before["status"] != state["status"]:
+                self.on_event("transition", {
+                    "device": name, "ip": state["ip"], "timestamp": state["timestamp"],
+                    "previous": before["status"], "status": state["status"], "flapping": state["flapping"]
+                })
+            if before["flapping"] != state["flapping"]:
+                self.on_event("flapping", {
+                    "device": name, "ip": state["ip"], "timestamp": state["timestamp"],
+                    "flapping": state["flapping"]
+                })
+
+# ============================================================================
+# WEB WORKER PROCESSES
+# ============================================================================
+
+def _worker_entry(target, index, sock, snapshot_name):
+    # Ctrl+C reaches the whole process group; the parent decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    target(index, sock, snapshot_name)
+
+class WebWorkers:
+    """
+    `processes` copies of target(index, sock, snapshot_name), all accepting
+    on one listening socket bound here. A worker that exits is restarted.
+    """
+
+    def __init__(self, processes, target, sock, snapshot_name):
+        if processes < 1:
+            raise ValueError("Web serving needs at least one worker process")
+        self.target = target
+        self.sock = sock
+        self.snapshot_name = snapshot_name
+        self.processes = [None] * processes
+        self.restarts = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._running = False
+        self._watcher = None
+
+    def start(self):
+        self._running = True
+        for index in range(len(self.processes)):
+            self._spawn(index)
+        self._watcher = threading.Thread(target=self._watch, name="web-watcher", daemon=True)
+        self._watcher.start()
+
+    def _spawn(self, index):
+        process = self._context.Process(target=_worker_entry, name=f"web-{index}", daemon=True,
+                                        args=(self.target, index, self.sock, self.snapshot_name))
+        process.start()
+        self.processes[index] = process
+
+    def _watch(self):
+        while self._running:
+            time.sleep(WATCH_SECONDS)
+            for index, process in enumerate(self.processes):
+                if self._running and process is not None and not process.is_alive():
+                    console.warning(f"⚠️  Web worker {index} exited ({process.exitcode}); restarting", "web_worker_exit",
+                                    worker=index, exitcode=process.exitcode)
+                    self.restarts += 1
+                    self._spawn(index)
+
+    def alive(self):
+        return sum(1 for process in self.processes if process is not None and process.is_alive())
+
+    def stop(self, timeout=5.0):
+        self._running = False
+        for process in self.processes:
+            if process is not None and process.is_alive():
+                process.terminate()
+        deadline = time.monotonic() + timeout
+        for process in self.processes:
+            if process is not None:
+                process.join(max(0.0, deadline - time.monotonic()))
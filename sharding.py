@@ -0,0 +1,363 @@
+#!/usr/bin/env python3
+"""
+Multi-process sharded probing
+Devices are partitioned across worker processes, each running its own
+scheduler and probe backend. Workers stream fixed-width result records over
+a local pipe to a collector in the main process, which owns storage and the
+web state. A worker that dies is restarted with its shard; the others keep
+running.
+"""
+
+import math
+import multiprocessing
+import pickle
+import signal
+import struct
+import threading
+import time
+import zlib
+
+import cadence
+import console
+from probe_engine import get_default_backend
+from scheduler import Scheduler
+from service_probe import check_detail, probe_series
+
+# device id, epoch seconds, rtt (s), loss (%), jitter (s), flags, check
+# interval (s), service connect and first byte (s), HTTP status (0 for none);
+# NaN marks a missing measurement
+RESULT = struct.Struct("<IdfffBfffH")
+FLAG_UP = 1
+FLAG_FLAPPING = 2
+
+# Result batches are tagged; other messages are pickled by Connection.send
+MESSAGE_RESULTS = b"R"
+
+BATCH_SECONDS = 0.05
+MAX_BATCH = 4096
+STATS_SECONDS = 5.0
+WATCH_SECONDS = 0.5
+
+def shard_for(name, shards):
+    """
+    Stable shard for a device, so a restart keeps the same partition
+    """
+    return zlib.crc32(name.encode("utf-8")) % shards
+
+def _encode(values):
+    return [math.nan if value is None else value for value in values]
+
+def _decode(value):
+    return None if math.isnan(value) else value
+
+def _decode_interval(value):
+    # float32 on the wire; round off the representation error
+    return None if math.isnan(value) else round(value, 3)
+
+def decode_results(payload):
+    """
+    Unpack a results message into (device_id, epoch, is_up, rtt, loss,
+    jitter, flapping, interval, connect, first_byte, status_code)
+    """
+    return [(device_id, epoch, bool(flags & FLAG_UP), _decode(rtt), _decode(loss), _decode(jitter),
+             bool(flags & FLAG_FLAPPING), _decode_interval(interval), _decode(connect), _decode(first_byte),
+             status_code or None)
+            for device_id, epoch, rtt, loss, jitter, flags, interval, connect, first_byte, status_code
+            in RESULT.iter_unpack(payload)]
+
+# ============================================================================
+# WORKER PROCESS
+# ============================================================================
+
+def worker_main(shard, conn, threads, echoes):
+    """
+    Probe loop of one shard. Control messages arrive on `conn` as
+    ("add", [(device_id, ip, interval, check), ...]), ("remove", [device_id, ...])
+    or ("stop",); results go back in batches every BATCH_SECONDS. check is
+    a service_probe.CheckSpec, or None to ping.
+    """
+    # Ctrl+C reaches the whole process group; the collector decides when to stop
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+
+    backend = get_default_backend()
+    scheduler = Scheduler(workers=threads)
+    pending = []
+    pending_lock = threading.Lock()
+    stopping = threading.Event()
+    # MONITOR_ADAPTIVE is inherited from the parent, so each shard adapts its own devices
+    adaptive = None
+    if cadence.ADAPTIVE:
+        adaptive = cadence.AdaptiveCadence(
+            cadence.CadencePolicy.from_environment(),
+            lambda target, count, spacing: probe_series(target, count, spacing, backend))
+
+    def check(device_id, ip, spec):
+        # Service checks run once per interval; MONITOR_ECHOES applies to pings
+        target = spec or ip
+        result = probe_series(target, 1 if spec else echoes, backend=backend)
+        is_up, flags, interval = result.is_up, 0, None
+        if adaptive is not None:
+            decision = adaptive.observe(device_id, target, result)
+            result, is_up, interval = decision.result, decision.is_up, decision.interval
+            flags = FLAG_FLAPPING if decision.flapping else 0
+        loss = result.loss_percent if result.sent > 1 else None
+        if is_up:
+            flags |= FLAG_UP
+        timing = (result.connect, result.first_byte) if spec else (None, None)
+        record = RESULT.pack(device_id, time.time(), *_encode((result.rtt, loss, result.jitter)), flags,
+                             *_encode((interval,) + timing), (result.status_code or 0) if spec else 0)
+        with pending_lock:
+            pending.append(record)
+
+    def control():
+        while True:
+            try:
+                message = conn.recv()
+            except (EOFError, OSError):
+                break  # collector went away
+            if message[0] == "add":
+                for device_id, ip, interval, spec in message[1]:
+                    scheduler.add(device_id, interval, check, device_id, ip, spec)
+                    if adaptive is not None:
+                        adaptive.register(device_id, interval,
+                                          lambda interval, key=device_id: scheduler.reschedule(key, interval))
+            elif message[0] == "remove":
+                for device_id in message[1]:
+                    scheduler.remove(device_id)
+                    if adaptive is not None:
+                        adaptive.forget(device_id)
+            elif message[0] == "stop":
+                break
+        stopping.set()
+
+    threading.Thread(target=control, name=f"shard-{shard}-control", daemon=True).start()
+    scheduler.start()
+
+    def flush():
+        nonlocal pending
+        with pending_lock:
+            batch, pending = pending, []
+        for start in range(0, len(batch), MAX_BATCH):
+            conn.send_bytes(MESSAGE_RESULTS + b"".join(batch[start:start + MAX_BATCH]))
+
+    def stats():
+        values = scheduler.stats()
+        if adaptive is not None:
+            values["cadence"] = adaptive.stats()
+        return values
+
+    last_stats = time.monotonic()
+    try:
+        while not stopping.wait(BATCH_SECONDS):
+            flush()
+            if time.monotonic() - last_stats >= STATS_SECONDS:
+                last_stats = time.monotonic()
+                conn.send(stats())
+        flush()
+        conn.send(stats())
+    except OSError:
+        pass  # pipe closed; the collector restarts or stops us
+    finally:
+        scheduler.stop(wait=False)
+
+# ============================================================================
+# COLLECTOR
+# ============================================================================
+
+class ProbeShard:
+    """
+    One worker process and the devices assigned to it
+    """
+
+    def __init__(self, index):
+        self.index = index
+        self.devices = {}
+        self.process = None
+        self.conn = None
+        self.lock = threading.Lock()
+        self.collector = None
+        self.restarts = 0
+        self.stats = {}
+
+    def send(self, message):
+        with self.lock:
+            if self.conn is None:
+                return
+            try:
+                self.conn.send(message)
+            except OSError:
+                pass  # worker died; the watcher restarts it with the full shard
+
+class ShardedProbing:
+    """
+    Runs device checks in `processes` worker processes and hands each result
+    to on_result(name, ip, epoch, is_up, rtt, loss_percent, jitter, flapping,
+    interval, detail) on a collector thread in this process; detail is the
+    service check timing breakdown, or None for pings
+    """
+
+    def __init__(self, processes, on_result, threads_per_process=32, echoes=1):
+        if processes < 1:
+            raise ValueError("Sharded probing needs at least one worker process")
+        self.on_result = on_result
+        self.threads = threads_per_process
+        self.echoes = echoes
+        self.shards = [ProbeShard(index) for index in range(processes)]
+        self.results_received = 0
+        self.results_discarded = 0
+        self._context = multiprocessing.get_context("spawn")
+        self._devices = {}
+        self._ids = {}
+        self._next_id = 0
+        self._lock = threading.Lock()
+        self._running = False
+        self._watcher = None
+
+    def add(self, name, ip, interval, check=None):
+        """
+        Start checking a device every `interval` seconds, replacing any
+        existing entry with the same name; check is a CheckSpec for service
+        checks, or None to ping
+        """
+        # Sent under the lock, so a worker being spawned either has the
+        # device in its snapshot or receives this message after it
+        with self._lock:
+            device_id = self._ids.get(name)
+            if device_id is None:
+                device_id = self._next_id
+                self._next_id += 1
+                self._ids[name] = device_id
+            self._devices[device_id] = (name, ip, check)
+            shard = self.shards[shard_for(name, len(self.shards))]
+            shard.devices[device_id] = (ip, interval, check)
+            shard.send(("add", [(device_id, ip, interval, check)]))
+
+    def remove(self, name):
+        """
+        Stop checking a device; results already in flight for it are discarded
+        """
+        with self._lock:
+            device_id = self._ids.pop(name, None)
+            if device_id is None:
+                return False
+            self._devices.pop(device_id, None)
+            shard = self.shards[shard_for(name, len(self.shards))]
+            shard.devices.pop(device_id, None)
+            shard.send(("remove", [device_id]))
+        return True
+
+    def start(self):
+        if self._running:
+            return
+        self._running = True
+        for shard in self.shards:
+            self._spawn(shard)
+        self._watcher = threading.Thread(target=self._watch, name="shard-watcher", daemon=True)
+        self._watcher.start()
+
+    def _spawn(self, shard):
+        parent, child = self._context.Pipe(duplex=True)
+        process = self._context.Process(target=worker_main, name=f"probe-shard-{shard.index}",
+                                        args=(shard.index, child, self.threads, self.echoes), daemon=True)
+        process.start()
+        child.close()
+        # Snapshot and connect together: add() and remove() send under the
+        # same lock, so nothing registered meanwhile is missed
+        with self._lock:
+            devices = [(device_id,) + device for device_id, device in shard.devices.items()]
+            with shard.lock:
+                shard.process = process
+                shard.conn = parent
+            shard.send(("add", devices))
+        shard.collector = threading.Thread(target=self._collect, args=(shard, parent),
+                                           name=f"shard-{shard.index}-collector", daemon=True)
+        shard.collector.start()
+
+    def _collect(self, shard, conn):
+        """
+        Decode result batches from one worker until its pipe closes
+        """
+        while True:
+            try:
+                payload = conn.recv_bytes()
+            except (EOFError, OSError):
+                return
+            if payload[:1] != MESSAGE_RESULTS:
+                # Anything else is a pickled scheduler stats dict
+                shard.stats = pickle.loads(payload)
+                continue
+            results = decode_results(payload[1:])
+            self.results_received += len(results)
+            for (device_id, epoch, is_up, rtt, loss, jitter, flapping, interval,
+                 connect, first_byte, status_code) in results:
+                device = self._devices.get(device_id)
+                if device is None:
+                    # Removed after the worker ran the check
+                    self.results_discarded += 1
+                    continue
+                name, ip, check = device
+                detail = None
+                if check is not None:
+                    # Only an unexpected HTTP status can be explained from the record
+                    error = f"HTTP {status_code}, expected {check.expect}" if status_code and not is_up else None
+                    detail = check_detail(check, connect, first_byte, status_code, error)
+                try:
+                    self.on_result(name, ip, epoch, is_up, rtt, loss, jitter, flapping, interval, detail)
+                except Exception as e:
+                    console.warning(f"⚠️  Result for {name} failed: {e}", "result_failed", device=name)
+
+    def _watch(self):
+        while self._running:
+            time.sleep(WATCH_SECONDS)
+            for shard in self.shards:
+                process = shard.process
+                if self._running and process is not None and not process.is_alive():
+                    console.warning(f"⚠️  Probe worker {shard.index} exited ({process.exitcode}); restarting",
+                                    "probe_worker_restart", worker=shard.index, exitcode=process.exitcode)
+                    with shard.lock:
+                        if shard.conn is not None:
+                            shard.conn.close()
+                            shard.conn = None
+                    shard.restarts += 1
+                    self._spawn(shard)
+
+    def stop(self, timeout=5.0):
+        if not self._running:
+            return
+        self._running = False
+        for shard in self.shards:
+            shard.send(("stop",))
+        deadline = time.monotonic() + timeout
+        for shard in self.shards:
+            if shard.process is not None:
+                shard.process.join(max(0.0, deadline - time.monotonic()))
+                if shard.process.is_alive():
+                    shard.process.terminate()
+                    shard.process.join()
+            # Deliver whatever the worker flushed before exiting
+            if shard.collector is not None:
+                shard.collector.join(max(0.0, deadline - time.monotonic()))
+
+    def stats(self):
+        """
+        Restarts and the latest scheduler stats reported by each worker
+        """
+        shards = []
+        for shard in self.shards:
+            shards.append({
+                "index": shard.index,
+                "devices": len(shard.devices),
+                "alive": shard.process is not None and shard.process.is_alive(),
+                "restarts": shard.restarts,
+                "scheduler": shard.stats,
+            })
+        return {
+            "processes": len(self.shards),
+            "results_received": self.results_received,
+            "results_discarded": self.results_discarded,
+            "restarts": sum(shard.restarts for shard in self.shards),
+            "checks_run": sum(shard.stats.get("checks_run", 0) for shard in self.shards),
+            "checks_skipped": sum(shard.stats.get("checks_skipped", 0) for shard in self.shards),
+            "max_lateness": max((shard.stats.get("max_lateness", 0.0) for shard in self.shards), default=0.0),
+            "shards": shards,
+        }
@@ -0,0 +1,176 @@
+// Real-time updates for the network monitor dashboard
+// Page-specific values are passed as data attributes on <body>
+const maxRows = parseInt(document.body.dataset.maxRows, 10);
+let lastModified = parseFloat(document.body.dataset.lastModified);
+// Log cursor just past the newest row shown; /rows?since= resumes from it
+let cursor = parseInt(document.body.dataset.cursor, 10) || 0;
+let checkInterval;
+let eventSource;
+// Stream batches that arrive while a backfill is in flight
+let pendingBatches = null;
+
+function setIndicator(color, text) {
+    const indicator = document.getElementById('realtimeStatus');
+    indicator.style.backgroundColor = color;
+    indicator.innerHTML = text;
+}
+
+function buildRow(row) {
+    const tr = document.createElement('tr');
+    tr.className = 'new-entry';
+    row.forEach((cell, j) => {
+        const td = document.createElement('td');
+        const status = cell.toUpperCase();
+        if (j === 3 && status === 'UP') {
+            td.className = 'status-up';
+            td.style.textAlign = 'center';
+            td.textContent = '✅ ' + cell;
+        } else if (j === 3 && status === 'DOWN') {
+            td.className = 'status-down';
+            td.style.textAlign = 'center';
+            td.textContent = '❌ ' + cell;
+        } else {
+            if (j === 1) {
+                td.style.fontWeight = 'bold';
+                td.style.color = '#007bff';
+            }
+            td.textContent = cell;
+        }
+        tr.appendChild(td);
+    });
+    return tr;
+}
+
+function updateCounters() {
+    // Recount from the rows currently shown, same as the server render
+    const table = document.getElementById('logTable');
+    let up = 0, down = 0;
+    for (let i = 1; i < table.rows.length; i++) {
+        const cell = table.rows[i].cells[3];
+        if (!cell) continue;
+        if (cell.classList.contains('status-up')) up++;
+        else if (cell.classList.contains('status-down')) down++;
+    }
+    const total = up + down;
+    document.getElementById('upCount').textContent = up;
+    document.getElementById('downCount').textContent = down;
+    document.getElementById('totalChecks').textContent = total;
+    document.getElementById('uptimePercent').textContent =
+        (total > 0 ? Math.round(up / total * 10000) / 100 : 0) + '%';
+    document.getElementById('dashboardUpdated').textContent = new Date().toLocaleString();
+}
+
+function applyRows(rows) {
+    const table = document.getElementById('logTable');
+    const header = table.rows[0];
+    rows.forEach(row => {
+        header.parentNode.insertBefore(buildRow(row), header.nextSibling);
+    });
+    while (table.rows.length > maxRows + 1) {
+        table.deleteRow(table.rows.length - 1);
+    }
+    const newest = rows[rows.length - 1];
+    if (newest && newest.length > 3) {
+        const status = document.getElementById('currentStatus');
+        const value = newest[3].toUpperCase();
+        status.textContent = newest[3];
+        status.style.color = value === 'UP' ? 'green' : value === 'DOWN' ? 'red' : 'orange';
+    }
+    updateCounters();
+}
+
+function applyBatch(batch) {
+    // Batches end on the cursor of their last row, so one already
+    // covered by a backfill is skipped whole
+    if (batch.cursor <= cursor) return;
+    cursor = batch.cursor;
+    applyRows(batch.rows);
+}
+
+function backfill() {
+    // Fetch the rows written while the stream was down, keeping only what
+    // the table can show, then replay batches that arrived meanwhile
+    let rows = [];
+    const fetchPage = () => fetch('/rows?since=' + cursor + '&limit=1000')
+        .then(response => response.json())
+        .then(data => {
+            rows = rows.concat(data.rows).slice(-maxRows);
+            cursor = Math.max(cursor, data.next);
+            return data.more ? fetchPage() : rows;
+        });
+    pendingBatches = pendingBatches || [];
+    fetchPage()
+        .then(rows => {
+            if (rows.length) applyRows(rows);
+        })
+        .catch(error => console.log('Backfill failed:', error))
+        .finally(() => {
+            const batches = pendingBatches;
+            pendingBatches = null;
+            batches.forEach(applyBatch);
+        });
+}
+
+function startEventStream() {
+    eventSource = new EventSource('/stream');
+    eventSource.addEventListener('rows', event => {
+        const batch = JSON.parse(event.data);
+        if (pendingBatches) {
+            pendingBatches.push(batch);
+        } else {
+            applyBatch(batch);
+        }
+    });
+    eventSource.addEventListener('transition', event => {
+        const data = JSON.parse(event.data);
+        console.log(data.device + ' changed ' + data.previous + ' -> ' + data.status);
+    });
+    eventSource.onopen = () => {
+        setIndicator('#28a745', '🟢 Live Updates');
+        // Also covers rows written between the page render and the first connect
+        backfill();
+    };
+    eventSource.onerror = () => setIndicator('#dc3545', '🔴 Reconnecting...');
+}
+
+function startPolling() {
+    // Fallback for browsers without EventSource
+    checkInterval = setInterval(function() {
+        fetch('/check_updates?last_check=' + lastModified)
+            .then(response => response.json())
+            .then(data => {
+                if (data.updated) {
+                    setIndicator('#ffc107', '🔄 Updating...');
+                    setTimeout(() => {
+                        location.reload();
+                    }, 500);
+                }
+                lastModified = data.last_modified;
+            })
+            .catch(error => {
+                console.log('Update check failed:', error);
+                setIndicator('#dc3545', '🔴 Connection Error');
+            });
+    }, 25000);
+}
+
+// Start real-time updates when page loads
+window.onload = function() {
+    if (window.EventSource) {
+        startEventStream();
+    } else {
+        startPolling();
+    }
+    console.log('Real-time monitoring started');
+    setIndicator('#28a745', '🟢 Live Updates');
+};
+
+// Stop updates when page unloads
+window.onbeforeunload = function() {
+    if (eventSource) {
+        eventSource.close();
+    }
+    if (checkInterval) {
+        clearInterval(checkInterval);
+    }
+};
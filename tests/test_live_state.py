@@ -0,0 +1,44 @@
+"""
+Cursor reads of the CSV log
+"""
+
+from live_state import LOG_HEADERS, read_records_from
+
+ROWS = [
+    ["2026-10-16 10:00:00", "Device A", "10.0.0.1", "UP", "12.000", "", ""],
+    ["2026-10-16 10:00:30", "Device B", "10.0.0.2", "DOWN", "", "", ""],
+    ["2026-10-16 10:01:00", "Device A", "10.0.0.1", "UP", "11.500", "", ""],
+]
+
+def write_log(path):
+    lines = [",".join(LOG_HEADERS)] + [",".join(row) for row in ROWS]
+    data = "".join(line + "\r\n" for line in lines).encode("utf-8")
+    path.write_bytes(data)
+    return data
+
+def test_reads_from_start_without_the_header(tmp_path):
+    path = tmp_path / "log.csv"
+    write_log(path)
+    assert [row for _, row in read_records_from(str(path), 0, 10)] == ROWS
+
+def test_cursor_on_a_row_boundary_resumes_after_it(tmp_path):
+    path = tmp_path / "log.csv"
+    write_log(path)
+    records = read_records_from(str(path), 0, 10)
+    assert [row for _, row in read_records_from(str(path), records[0][0], 10)] == ROWS[1:]
+
+def test_cursor_inside_a_row_skips_to_the_next_row(tmp_path):
+    path = tmp_path / "log.csv"
+    data = write_log(path)
+    header_end = data.index(b"\n") + 1
+    for cursor in (7, header_end + 20, len(data) - 3):
+        records = read_records_from(str(path), cursor, 10)
+        assert all(row in ROWS for _, row in records)
+        assert all(data[end - 1:end] == b"\n" for end, _ in records)
+    assert [row for _, row in read_records_from(str(path), 7, 10)] == ROWS
+    assert read_records_from(str(path), len(data) - 3, 10) == []
+
+def test_cursor_past_the_end_reads_nothing(tmp_path):
+    path = tmp_path / "log.csv"
+    data = write_log(path)
+    assert read_records_from(str(path), len(data) + 100, 10) == []
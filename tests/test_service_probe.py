@@ -0,0 +1,238 @@
+"""
+Service checks against local listeners: the stand-in HTTP server and
+small scripted socket servers
+"""
+
+import socket
+import threading
+import time
+
+import pytest
+
+from service_probe import CheckSpec, ServiceProbeEngine, parse_check, serve_stand_in
+
+# ============================================================================
+# FIXTURES
+# ============================================================================
+
+class ScriptedServer:
+    """
+    Loopback listener that runs handler(conn, index) on its own thread for
+    each accepted connection, index counting connections from 0
+    """
+
+    def __init__(self, handler):
+        self.handler = handler
+        self.connections = 0
+        self.sock = socket.create_server(("127.0.0.1", 0))
+        self.port = self.sock.getsockname()[1]
+        self._open = []
+        threading.Thread(target=self._accept, daemon=True).start()
+
+    def _accept(self):
+        while True:
+            try:
+                conn, _ = self.sock.accept()
+            except OSError:
+                return
+            index = self.connections
+            self.connections += 1
+            self._open.append(conn)
+            threading.Thread(target=self._serve, args=(conn, index), daemon=True).start()
+
+    def _serve(self, conn, index):
+        try:
+            self.handler(conn, index)
+        except OSError:
+            pass
+
+    def close(self):
+        self.sock.close()
+        for conn in self._open:
+            conn.close()
+
+def read_request(conn):
+    """
+    Read one request head; b"" once the client has closed
+    """
+    data = b""
+    while b"\r\n\r\n" not in data:
+        chunk = conn.recv(4096)
+        if not chunk:
+            return b""
+        data += chunk
+    return data
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() >= deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+@pytest.fixture
+def engine():
+    engine = ServiceProbeEngine()
+    yield engine
+    engine.close()
+
+@pytest.fixture
+def serve():
+    servers = []
+
+    def start(handler):
+        server = ScriptedServer(handler)
+        servers.append(server)
+        return server
+
+    yield start
+    for server in servers:
+        server.close()
+
+def http_check(port, **options):
+    return CheckSpec("http", "127.0.0.1", port, "/health", **options)
+
+# ============================================================================
+# CHECK PARSING
+# ============================================================================
+
+def test_parse_check_forms():
+    assert parse_check(None, "10.0.0.1") is None
+    assert parse_check("icmp", "10.0.0.1") is None
+    assert str(parse_check("tcp:22", "10.0.0.1")) == "tcp://10.0.0.1:22"
+    assert str(parse_check("https", "10.0.0.1")) == "https://10.0.0.1/"
+    check = parse_check("http://{ip}:8080/health?deep=1", "fe80::1", expect="204", timeout="0.5")
+    assert (check.host, check.port, check.path, check.expect, check.timeout) == ("fe80::1", 8080, "/health?deep=1", 204, 0.5)
+
+@pytest.mark.parametrize("value", ["tcp://10.0.0.1", "ftp://10.0.0.1/", "http://:80/", "tcp:notaport"])
+def test_parse_check_rejects(value):
+    with pytest.raises(ValueError):
+        parse_check(value, "10.0.0.1")
+
+# ============================================================================
+# TCP
+# ============================================================================
+
+def test_tcp_connect(engine):
+    port, stop = serve_stand_in()
+    try:
+        result = engine.check(CheckSpec("tcp", "127.0.0.1", port))
+    finally:
+        stop()
+    assert result.is_up
+    assert result.error is None
+    assert result.connect is not None and result.samples == [result.connect]
+
+def test_tcp_refused(engine):
+    # Bind and close a listener so the port is known to be free
+    sock = socket.create_server(("127.0.0.1", 0))
+    port = sock.getsockname()[1]
+    sock.close()
+    result = engine.check(CheckSpec("tcp", "127.0.0.1", port, timeout=1.0))
+    assert not result.is_up
+    assert result.error == "Connection refused"
+
+# ============================================================================
+# HTTP
+# ============================================================================
+
+def test_http_ok_and_keep_alive(engine):
+    port, stop = serve_stand_in()
+    try:
+        first = engine.check(http_check(port))
+        assert wait_for(lambda: engine.stats()["idle_connections"] == 1)
+        second = engine.check(http_check(port))
+    finally:
+        stop()
+    assert first.is_up and first.status_code == 200 and not first.reused
+    assert first.first_byte is not None
+    assert second.is_up and second.reused and second.connect is None
+    assert engine.stats()["connections_opened"] == 1
+
+def test_http_status_mismatch(engine, serve):
+    def handler(conn, index):
+        read_request(conn)
+        conn.sendall(b"HTTP/1.1 503 Service Unavailable\r\nContent-Length: 4\r\n\r\nbusy")
+
+    server = serve(handler)
+    result = engine.check(http_check(server.port))
+    assert not result.is_up
+    assert result.status_code == 503
+    assert result.error == "HTTP 503, expected 200"
+    assert result.detail()["http_status"] == 503
+
+def test_http_expected_status(engine, serve):
+    def handler(conn, index):
+        read_request(conn)
+        conn.sendall(b"HTTP/1.1 204 No Content\r\n\r\n")
+
+    server = serve(handler)
+    assert engine.check(http_check(server.port, expect=204)).is_up
+
+def test_http_chunked_body_then_reuse(engine, serve):
+    def handler(conn, index):
+        while read_request(conn):
+            # Chunks, a chunk extension and a trailer, split across writes
+            conn.sendall(b"HTTP/1.1 200 OK\r\nTransfer-Encoding: chunked\r\n\r\n5\r\nhel")
+            time.sleep(0.02)
+            conn.sendall(b"lo\r\n3;ext=1\r\n wo\r\n")
+            time.sleep(0.02)
+            conn.sendall(b"0\r\nX-Trailer: 1\r\n\r\n")
+
+    server = serve(handler)
+    first = engine.check(http_check(server.port))
+    # The body is drained after the check settles; only then is the connection idle
+    assert wait_for(lambda: engine.stats()["idle_connections"] == 1)
+    second = engine.check(http_check(server.port))
+    assert first.is_up and second.is_up
+    assert second.reused
+    assert server.connections == 1
+
+def test_http_timeout(engine, serve):
+    def handler(conn, index):
+        read_request(conn)
+        time.sleep(2)
+
+    server = serve(handler)
+    started = time.perf_counter()
+    result = engine.check(http_check(server.port, timeout=0.3))
+    assert time.perf_counter() - started < 1.5
+    assert not result.is_up
+    assert result.error == "timeout (response)"
+
+def test_stale_pooled_connection_is_retried(engine, serve):
+    def handler(conn, index):
+        read_request(conn)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        if index == 0:
+            # Keep the first connection open until the next request arrives,
+            # then close it without answering, as a server whose keep-alive
+            # timer fired at the same moment would
+            read_request(conn)
+            conn.close()
+            return
+        while read_request(conn):
+            conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+
+    server = serve(handler)
+    assert engine.check(http_check(server.port)).is_up
+    assert wait_for(lambda: engine.stats()["idle_connections"] == 1)
+    result = engine.check(http_check(server.port))
+    assert result.is_up
+    assert not result.reused
+    assert server.connections == 2
+
+def test_idle_connection_closed_by_server_is_dropped(engine, serve):
+    def handler(conn, index):
+        read_request(conn)
+        conn.sendall(b"HTTP/1.1 200 OK\r\nContent-Length: 2\r\n\r\nok")
+        time.sleep(0.05)
+        conn.close()
+
+    server = serve(handler)
+    assert engine.check(http_check(server.port)).is_up
+    assert wait_for(lambda: engine.stats()["idle_connections"] == 0 and server.connections == 1)
+    result = engine.check(http_check(server.port))
+    assert result.is_up and not result.reused
+    assert engine.stats()["connections_reused"] == 0